@@ -1,7 +1,10 @@
 import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 
 def _default_db_dir() -> Path:
@@ -17,14 +20,282 @@ DEFAULT_DB_DIR = _default_db_dir()
 DEFAULT_DB_NAME = os.environ.get("RESTAURANTE_DB_NAME", "restaurante.db")
 DB_PATH = Path(os.environ.get("RESTAURANTE_DB_PATH", DEFAULT_DB_DIR / DEFAULT_DB_NAME))
 
+# Perfis de desempenho aplicados a cada conexão aberta. ``cache_size``
+# negativo é em KiB; ``mmap_size`` em bytes.
+#  - durable: nenhum commit confirmado se perde, nem em queda de energia;
+#  - balanced: WAL + synchronous=NORMAL, só os últimos commits podem se perder
+#    numa queda de energia, sem risco de corromper o arquivo;
+#  - fast: sem fsync; indicado apenas para testes, cargas e benchmarks.
+PERFIS_SQLITE: Dict[str, Dict[str, object]] = {
+    "durable": {
+        "journal_mode": "wal",
+        "synchronous": "FULL",
+        "cache_size": -8000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+    },
+    "balanced": {
+        "journal_mode": "wal",
+        "synchronous": "NORMAL",
+        "cache_size": -32000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    "fast": {
+        "journal_mode": "wal",
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+DB_PROFILE = os.environ.get("RESTAURANTE_DB_PROFILE", "balanced")
+
+
+def aplicar_perfil(conn: sqlite3.Connection, perfil: Optional[str] = None) -> None:
+    """Aplica os PRAGMAs do perfil (padrão: ``RESTAURANTE_DB_PROFILE``)."""
+    nome = perfil or DB_PROFILE
+    if nome not in PERFIS_SQLITE:
+        raise ValueError(f"Perfil SQLite desconhecido: {nome} (use {', '.join(PERFIS_SQLITE)})")
+    for pragma, valor in PERFIS_SQLITE[nome].items():
+        conn.execute(f"PRAGMA {pragma} = {valor}")
+
+
+def configuracao_ativa(conn: sqlite3.Connection, perfil: Optional[str] = None) -> Dict[str, object]:
+    """Lê de volta os PRAGMAs de desempenho em vigor na conexão."""
+    ativa: Dict[str, object] = {"perfil": perfil or DB_PROFILE}
+    for pragma in ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store"):
+        row = conn.execute(f"PRAGMA {pragma}").fetchone()
+        ativa[pragma] = row[0] if row else None
+    return ativa
+
+
+class PoolEsgotadoError(sqlite3.OperationalError):
+    """Nenhuma conexão livre dentro do tempo de espera do pool."""
+
+
+class ConnectionPool:
+    """Pool limitado de conexões SQLite para um único arquivo.
+
+    Conexões emprestadas com ``conexao()``/``acquire()`` voltam ao pool ao
+    final do uso e são limitadas a ``max_size``. ``conexao_da_thread()``
+    mantém uma conexão fixa por thread para o código legado que chama
+    ``get_connection()`` sem fechar; essas não entram no limite (cada thread
+    sempre recebe a sua, como antes do pool) e, quando a thread dona termina,
+    têm a transação pendente desfeita e voltam ao pool ou são fechadas.
+    """
+
+    def __init__(
+        self, path: Path, max_size: int = 16, timeout: float = 5.0, perfil: Optional[str] = None
+    ) -> None:
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.perfil = perfil
+        self._livres: List[sqlite3.Connection] = []
+        self._por_thread: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._abertas = 0
+        self._cond = threading.Condition()
+
+    def _criar(self) -> sqlite3.Connection:
+        if not self.path.parent.exists():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        aplicar_perfil(conn, self.perfil)
+        return conn
+
+    @staticmethod
+    def _saudavel(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+        except sqlite3.Error:
+            return False
+        return True
+
+    @staticmethod
+    def _fechar(conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _descartar(self, conn: sqlite3.Connection) -> None:
+        self._fechar(conn)
+        self._abertas -= 1
+
+    def _recuperar_threads_encerradas(self) -> None:
+        # chamado com ``_cond``; a thread pode ter terminado no meio de uma transação
+        for thread in [t for t in self._por_thread if not t.is_alive()]:
+            conn = self._por_thread.pop(thread)
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                self._fechar(conn)
+                continue
+            if self._abertas < self.max_size:
+                self._livres.append(conn)
+                self._abertas += 1
+                self._cond.notify()
+            else:
+                self._fechar(conn)
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._cond:
+            limite = time.monotonic() + self.timeout
+            while True:
+                while self._livres:
+                    conn = self._livres.pop()
+                    if self._saudavel(conn):
+                        return conn
+                    self._descartar(conn)
+                if self._abertas < self.max_size:
+                    conn = self._criar()
+                    self._abertas += 1
+                    return conn
+                self._recuperar_threads_encerradas()
+                if self._livres:
+                    continue
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise PoolEsgotadoError(f"Pool de conexões esgotado para {self.path}")
+                self._cond.wait(restante)
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        with self._cond:
+            if conn.in_transaction:
+                conn.rollback()
+            self._livres.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def conexao(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def conexao_da_thread(self) -> sqlite3.Connection:
+        thread = threading.current_thread()
+        conn = self._por_thread.get(thread)
+        if conn is not None:
+            try:
+                conn.total_changes  # levanta ProgrammingError se a conexão foi fechada
+                return conn
+            except sqlite3.ProgrammingError:
+                with self._cond:
+                    self._por_thread.pop(thread, None)
+        with self._cond:
+            self._recuperar_threads_encerradas()
+            conn = None
+            while self._livres and conn is None:
+                # sai da contagem do pool: conexões de thread não ocupam vaga
+                conn = self._livres.pop()
+                self._abertas -= 1
+                if not self._saudavel(conn):
+                    self._fechar(conn)
+                    conn = None
+            if conn is None:
+                conn = self._criar()
+            self._por_thread[thread] = conn
+        return conn
+
+    def close(self) -> None:
+        with self._cond:
+            conexoes = self._livres + list(self._por_thread.values())
+            self._livres = []
+            self._por_thread = {}
+            for conn in conexoes:
+                self._fechar(conn)
+            self._abertas = 0
+            self._cond.notify_all()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+POOL_MAX_SIZE = int(os.environ.get("RESTAURANTE_DB_POOL_SIZE", "16"))
+
+
+def get_pool(path: Optional[Path] = None) -> ConnectionPool:
+    database = Path(path) if path else DB_PATH
+    chave = os.path.abspath(database)
+    with _pools_lock:
+        pool = _pools.get(chave)
+        if pool is None:
+            pool = ConnectionPool(database, max_size=POOL_MAX_SIZE)
+            _pools[chave] = pool
+        return pool
+
 
 def get_connection(path: Optional[Path] = None) -> sqlite3.Connection:
+    """Conexão reaproveitada da thread atual para o banco informado.
+
+    Não feche a conexão devolvida; para uso com escopo definido prefira
+    ``conexao()``, que devolve a conexão ao pool ao sair do bloco.
+    """
+    return get_pool(path).conexao_da_thread()
+
+
+@contextmanager
+def conexao(path: Optional[Path] = None) -> Iterator[sqlite3.Connection]:
+    """Empresta uma conexão do pool durante o bloco ``with``."""
+    with get_pool(path).conexao() as conn:
+        yield conn
+
+
+def close_pool(path: Optional[Path] = None) -> None:
+    """Fecha todas as conexões abertas para o banco (ex.: antes de apagá-lo)."""
     database = Path(path) if path else DB_PATH
-    if not database.parent.exists():
-        database.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(database)
-    conn.row_factory = sqlite3.Row
-    return conn
+    with _pools_lock:
+        pool = _pools.pop(os.path.abspath(database), None)
+    if pool is not None:
+        pool.close()
+
+
+_transacoes = threading.local()
+
+
+@contextmanager
+def transacao(path: Optional[Path] = None) -> Iterator[sqlite3.Connection]:
+    """Unidade de trabalho: tudo o que é gravado no bloco sai em um único commit.
+
+    Usa a conexão da thread (a mesma devolvida por ``get_connection``), então
+    funções chamadas dentro do bloco enxergam e participam da transação.
+    Blocos aninhados não fazem commit próprio; apenas o mais externo grava ou,
+    em caso de exceção, desfaz tudo. ``BEGIN IMMEDIATE`` reserva a escrita no
+    início para evitar ``database is locked`` ao promover uma leitura.
+    """
+    conn = get_connection(path)
+    niveis = getattr(_transacoes, "niveis", None)
+    if niveis is None:
+        niveis = _transacoes.niveis = {}
+    chave = id(conn)
+    externo = chave not in niveis
+    if externo:
+        niveis[chave] = 0
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+    niveis[chave] += 1
+    try:
+        yield conn
+    except BaseException:
+        if externo:
+            conn.rollback()
+        raise
+    else:
+        if externo:
+            conn.commit()
+    finally:
+        niveis[chave] -= 1
+        if externo:
+            del niveis[chave]
+
+
+def em_transacao(path: Optional[Path] = None) -> bool:
+    """Indica se a thread atual está dentro de ``transacao()`` para o banco."""
+    niveis = getattr(_transacoes, "niveis", None)
+    return bool(niveis) and id(get_connection(path)) in niveis
 
 
 def _execute_script(conn: sqlite3.Connection, script: str) -> None:
@@ -146,9 +417,148 @@ def init_db(path: Optional[Path] = None) -> None:
     );
     """
     _execute_script(conn, schema)
+    migrar(conn)
+    instalar_busca_textual(conn)
     _seed_default_data(conn)
 
 
+# Migrações versionadas do esquema, aplicadas em ordem conforme
+# ``PRAGMA user_version``. Nunca altere uma migração já publicada: crie outra.
+MIGRACOES: List[Tuple[int, str]] = [
+    (
+        1,
+        """
+        CREATE INDEX IF NOT EXISTS idx_itens_comanda_comanda ON itens_comanda (comanda_id);
+        CREATE INDEX IF NOT EXISTS idx_lotes_produto_criado ON lotes_producao (produto_id, criado_em, id);
+        -- lotes com saldo: usado pelo consumo FIFO, fica pequeno mesmo com muito histórico
+        CREATE INDEX IF NOT EXISTS idx_lotes_abertos ON lotes_producao (produto_id, criado_em, id)
+            WHERE consumido_porcoes < quantidade AND consumido_kg < quantidade;
+        CREATE INDEX IF NOT EXISTS idx_logs_criado_em ON logs (criado_em);
+        CREATE INDEX IF NOT EXISTS idx_produtos_nome ON produtos (nome COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS idx_comandas_mesa_status ON comandas (mesa_id, status);
+        CREATE INDEX IF NOT EXISTS idx_movimentos_caixa_caixa ON movimentos_caixa (caixa_id);
+        CREATE INDEX IF NOT EXISTS idx_perdas_estoque_produto ON perdas_estoque (produto_id);
+        """,
+    ),
+    (
+        2,
+        """
+        -- contador de mudanças no cadastro de produtos, lido pelos índices de busca em memória
+        CREATE TABLE IF NOT EXISTS produtos_versao (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            versao INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO produtos_versao (id, versao) VALUES (1, 0);
+        CREATE TRIGGER IF NOT EXISTS produtos_versao_ai AFTER INSERT ON produtos BEGIN
+            UPDATE produtos_versao SET versao = versao + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS produtos_versao_ad AFTER DELETE ON produtos BEGIN
+            UPDATE produtos_versao SET versao = versao + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS produtos_versao_au AFTER UPDATE OF id, nome, ativo ON produtos BEGIN
+            UPDATE produtos_versao SET versao = versao + 1;
+        END;
+        """,
+    ),
+    (
+        3,
+        """
+        -- a busca também casa pela categoria
+        DROP TRIGGER IF EXISTS produtos_versao_au;
+        CREATE TRIGGER produtos_versao_au AFTER UPDATE OF id, nome, categoria, ativo ON produtos BEGIN
+            UPDATE produtos_versao SET versao = versao + 1;
+        END;
+        """,
+    ),
+]
+
+
+def versao_esquema(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrar(conn: sqlite3.Connection) -> int:
+    """Aplica as migrações pendentes, cada uma em sua própria transação."""
+    atual = versao_esquema(conn)
+    for versao, script in MIGRACOES:
+        if versao <= atual:
+            continue
+        conn.executescript(f"BEGIN; {script} PRAGMA user_version = {versao}; COMMIT;")
+        atual = versao
+    return atual
+
+
+# Busca textual (FTS5) opcional: tabelas de conteúdo externo espelhando
+# ``produtos`` e ``logs``, mantidas por triggers. Fica fora das migrações
+# porque depende do SQLite ter sido compilado com FTS5; sem ele as buscas
+# caem no ``LIKE``.
+_BUSCA_TEXTUAL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS produtos_fts USING fts5(
+    nome, categoria, content='produtos', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS produtos_fts_ai AFTER INSERT ON produtos BEGIN
+    INSERT INTO produtos_fts(rowid, nome, categoria) VALUES (new.id, new.nome, new.categoria);
+END;
+CREATE TRIGGER IF NOT EXISTS produtos_fts_ad AFTER DELETE ON produtos BEGIN
+    INSERT INTO produtos_fts(produtos_fts, rowid, nome, categoria) VALUES ('delete', old.id, old.nome, old.categoria);
+END;
+CREATE TRIGGER IF NOT EXISTS produtos_fts_au AFTER UPDATE OF nome, categoria ON produtos BEGIN
+    INSERT INTO produtos_fts(produtos_fts, rowid, nome, categoria) VALUES ('delete', old.id, old.nome, old.categoria);
+    INSERT INTO produtos_fts(rowid, nome, categoria) VALUES (new.id, new.nome, new.categoria);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
+    acao, detalhes, content='logs', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS logs_fts_ai AFTER INSERT ON logs BEGIN
+    INSERT INTO logs_fts(rowid, acao, detalhes) VALUES (new.id, new.acao, new.detalhes);
+END;
+CREATE TRIGGER IF NOT EXISTS logs_fts_ad AFTER DELETE ON logs BEGIN
+    INSERT INTO logs_fts(logs_fts, rowid, acao, detalhes) VALUES ('delete', old.id, old.acao, old.detalhes);
+END;
+"""
+
+
+def instalar_busca_textual(conn: sqlite3.Connection) -> bool:
+    """Cria as tabelas FTS5 e seus triggers; devolve ``False`` se não houver FTS5.
+
+    Na primeira instalação os índices são reconstruídos a partir das linhas
+    já existentes.
+    """
+    if tem_busca_textual(conn):
+        return True
+    try:
+        conn.executescript(
+            f"BEGIN; {_BUSCA_TEXTUAL}"
+            " INSERT INTO produtos_fts(produtos_fts) VALUES ('rebuild');"
+            " INSERT INTO logs_fts(logs_fts) VALUES ('rebuild');"
+            " COMMIT;"
+        )
+    except sqlite3.OperationalError:
+        # "no such module: fts5"
+        if conn.in_transaction:
+            conn.rollback()
+        return False
+    return True
+
+
+def tem_busca_textual(conn: sqlite3.Connection) -> bool:
+    return (
+        conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs_fts'").fetchone()
+        is not None
+    )
+
+
+def expressao_fts(texto: str) -> str:
+    """Converte o texto digitado em uma consulta FTS5 segura.
+
+    Cada palavra vira um termo entre aspas com busca por prefixo, e todas
+    precisam aparecer (``pao qu`` -> ``"pao"* "qu"*``).
+    """
+    palavras = texto.split()
+    return " ".join('"{}"*'.format(palavra.replace('"', '""')) for palavra in palavras)
+
+
 def _seed_default_data(conn: sqlite3.Connection) -> None:
     cursor = conn.cursor()
     # Seed mesas
@@ -175,9 +585,31 @@ def _seed_default_data(conn: sqlite3.Connection) -> None:
 
 def reset_database(path: Optional[Path] = None) -> None:
     database = Path(path) if path else DB_PATH
-    if database.exists():
-        database.unlink()
+    close_pool(database)
+    for arquivo in (database, Path(f"{database}-wal"), Path(f"{database}-shm")):
+        if arquivo.exists():
+            arquivo.unlink()
     init_db(database)
 
 
-__all__ = ["get_connection", "init_db", "reset_database", "DB_PATH"]
+__all__ = [
+    "ConnectionPool",
+    "PERFIS_SQLITE",
+    "PoolEsgotadoError",
+    "aplicar_perfil",
+    "configuracao_ativa",
+    "close_pool",
+    "conexao",
+    "em_transacao",
+    "expressao_fts",
+    "get_connection",
+    "get_pool",
+    "init_db",
+    "instalar_busca_textual",
+    "migrar",
+    "reset_database",
+    "tem_busca_textual",
+    "transacao",
+    "versao_esquema",
+    "DB_PATH",
+]
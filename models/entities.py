@@ -3,13 +3,18 @@
 
 As estruturas são simples e mantidas em memória, facilitando a troca
 posterior por um banco de dados relacional.
+
+Os registros de alto volume (itens, movimentos de caixa, logs, descontos e
+perdas) usam ``slots=True``: sem ``__dict__`` por instância, ocupam bem menos
+memória quando o histórico inteiro é carregado. Não aceitam atributos fora
+dos campos declarados. ``tools/bench_memoria.py`` mede a diferença.
 """
 from __future__ import annotations
 
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Iterable, Optional
 from models.enums import UserRole
 
 
@@ -47,7 +52,7 @@ class MotivoPerda:
     descricao: str
 
 
-@dataclass
+@dataclass(slots=True)
 class DescontoLog:
     id: int
     comanda_id: int
@@ -58,7 +63,7 @@ class DescontoLog:
     criado_em: datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class PerdaEstoque:
     id: int
     produto_codigo: str
@@ -69,7 +74,7 @@ class PerdaEstoque:
     criado_em: datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class LogEntry:
     id: int
     acao: str
@@ -78,7 +83,7 @@ class LogEntry:
     criado_em: datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class ItemComanda:
     id: int
     comanda_id: int
@@ -87,6 +92,7 @@ class ItemComanda:
     preco_unitario: float
     cancelado: bool = False
     desconto: float = 0.0
+    criado_em: Optional[datetime] = None
 
     @property
     def total_bruto(self) -> float:
@@ -105,13 +111,24 @@ class Comanda:
     itens: list[int] = field(default_factory=list)
     desconto_total: float = 0.0
 
-    def total_bruto(self, itens: list[ItemComanda]) -> float:
-        return sum(i.total_bruto for i in itens if i.id in self.itens and not i.cancelado)
+    def total_bruto(self, itens: Iterable[ItemComanda]) -> float:
+        """Soma os itens ativos da comanda presentes em ``itens``.
+
+        Prefira passar só os itens da comanda (``db.itens_da_comanda``): o
+        custo passa a depender do tamanho da comanda, não do histórico.
+        """
+        ids = set(self.itens)
+        return sum(i.total_bruto for i in itens if i.id in ids and not i.cancelado)
 
-    def total_liquido(self, itens: list[ItemComanda]) -> float:
-        return max(0.0, self.total_bruto(itens) - self.desconto_total - sum(
-            i.desconto for i in itens if i.id in self.itens and not i.cancelado
-        ))
+    def total_liquido(self, itens: Iterable[ItemComanda]) -> float:
+        ids = set(self.itens)
+        bruto = 0.0
+        descontos = 0.0
+        for item in itens:
+            if item.id in ids and not item.cancelado:
+                bruto += item.total_bruto
+                descontos += item.desconto
+        return max(0.0, bruto - self.desconto_total - descontos)
 
 
 @dataclass
@@ -182,7 +199,7 @@ class TipoMovimento(str, Enum):
     AJUSTE = "ajuste"
 
 
-@dataclass
+@dataclass(slots=True)
 class MovimentoCaixa:
     id: int
     caixa_id: int
@@ -0,0 +1,288 @@
+"""Armazém colunar para os relatórios do PDV.
+
+Os relatórios de vendas, descontos e perdas somam valores agrupados por
+produto, motivo, usuário ou forma de pagamento. Percorrer listas de objetos
+para isso custa caro quando há um ano de histórico em memória; aqui cada
+registro vira uma linha em colunas ``array`` (valores ``float`` e códigos
+inteiros), com produtos, usuários e motivos codificados por dicionário.
+
+Com NumPy instalado as somas por grupo usam ``bincount`` sobre as próprias
+``array`` (sem cópia); sem NumPy o mesmo cálculo é feito com
+``itertools.compress`` sobre as colunas, ainda sem tocar nos objetos.
+
+O armazém é mantido pelo ``MemoryDB`` (``ativar_analitico``) a partir dos
+mesmos avisos que atualizam os índices, então itens cancelados ou com
+desconto depois de lançados são refletidos na hora.
+"""
+from __future__ import annotations
+
+import math
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from itertools import compress
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from models import DescontoLog, ItemComanda, MovimentoCaixa, PerdaEstoque, TipoMovimento
+
+try:  # NumPy é opcional
+    import numpy as np
+except ImportError:  # pragma: no cover - depende do ambiente
+    np = None
+
+_SEM_DATA = math.nan
+
+
+def _tempo(data: Optional[datetime]) -> float:
+    return data.timestamp() if data is not None else _SEM_DATA
+
+
+class Dicionario:
+    """Codifica valores repetidos (códigos de produto, usuários) em inteiros."""
+
+    def __init__(self) -> None:
+        self.valores: List[Hashable] = []
+        self._codigos: Dict[Hashable, int] = {}
+
+    def codificar(self, valor: Hashable) -> int:
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def __len__(self) -> int:
+        return len(self.valores)
+
+
+class TabelaColunar:
+    """Linhas guardadas por coluna, com data, indicador de ativa e chave.
+
+    Alterar uma linha existente (mesma chave) reescreve as colunas no lugar;
+    remover só desliga ``ativa``. As datas ficam em segundos (``nan`` quando
+    ausentes); enquanto chegam em ordem, filtros por período usam busca
+    binária em vez de varrer a tabela.
+    """
+
+    def __init__(self, numericas: Sequence[str], categoricas: Sequence[str]) -> None:
+        self.tempos = array("d")
+        self.ativas = array("b")
+        self.numericas: Dict[str, array] = {nome: array("d") for nome in numericas}
+        self.categoricas: Dict[str, array] = {nome: array("q") for nome in categoricas}
+        self.dicionarios: Dict[str, Dicionario] = {nome: Dicionario() for nome in categoricas}
+        self.posicao: Dict[Hashable, int] = {}
+        self.ordenada = True
+
+    def __len__(self) -> int:
+        return len(self.posicao)
+
+    def gravar(
+        self,
+        chave: Hashable,
+        data: Optional[datetime],
+        ativa: bool,
+        numericos: Mapping[str, float],
+        categoricos: Mapping[str, Hashable],
+    ) -> None:
+        tempo = _tempo(data)
+        linha = self.posicao.get(chave)
+        if linha is None:
+            if math.isnan(tempo) or (self.tempos and not self.tempos[-1] <= tempo):
+                self.ordenada = False
+            self.posicao[chave] = len(self.tempos)
+            self.tempos.append(tempo)
+            self.ativas.append(ativa)
+            for nome, coluna in self.numericas.items():
+                coluna.append(numericos[nome])
+            for nome, coluna in self.categoricas.items():
+                coluna.append(self.dicionarios[nome].codificar(categoricos[nome]))
+            return
+        if self.tempos[linha] != tempo:
+            self.ordenada = False
+        self.tempos[linha] = tempo
+        self.ativas[linha] = ativa
+        for nome, coluna in self.numericas.items():
+            coluna[linha] = numericos[nome]
+        for nome, coluna in self.categoricas.items():
+            coluna[linha] = self.dicionarios[nome].codificar(categoricos[nome])
+
+    def remover(self, chave: Hashable) -> None:
+        linha = self.posicao.pop(chave, None)
+        if linha is not None:
+            self.ativas[linha] = False
+
+    def limpar(self) -> None:
+        self.tempos = array("d")
+        self.ativas = array("b")
+        self.numericas = {nome: array("d") for nome in self.numericas}
+        self.categoricas = {nome: array("q") for nome in self.categoricas}
+        self.dicionarios = {nome: Dicionario() for nome in self.categoricas}
+        self.posicao.clear()
+        self.ordenada = True
+
+    # Consulta -------------------------------------------------------------
+    def _faixa(self, inicio: Optional[datetime], fim: Optional[datetime]) -> Tuple[int, int, bool]:
+        """Linhas ``[lo, hi)`` a considerar e se ainda é preciso filtrar por data."""
+        if inicio is None and fim is None:
+            return 0, len(self.tempos), False
+        if not self.ordenada:
+            return 0, len(self.tempos), True
+        lo = bisect_left(self.tempos, inicio.timestamp()) if inicio is not None else 0
+        hi = bisect_left(self.tempos, fim.timestamp()) if fim is not None else len(self.tempos)
+        return lo, hi, False
+
+    def _mascara(self, inicio: Optional[datetime], fim: Optional[datetime]) -> Tuple[int, int, Any]:
+        lo, hi, filtrar = self._faixa(inicio, fim)
+        if np is not None:
+            mascara = np.frombuffer(self.ativas, dtype=np.int8)[lo:hi] != 0
+            if filtrar:
+                tempos = np.frombuffer(self.tempos, dtype=np.float64)[lo:hi]
+                if inicio is not None:
+                    mascara &= tempos >= inicio.timestamp()
+                if fim is not None:
+                    mascara &= tempos < fim.timestamp()
+            return lo, hi, mascara
+        mascara = self.ativas[lo:hi]
+        if filtrar:
+            a = inicio.timestamp() if inicio is not None else -math.inf
+            b = fim.timestamp() if fim is not None else math.inf
+            mascara = [ativa and a <= t < b for ativa, t in zip(mascara, self.tempos[lo:hi])]
+        return lo, hi, mascara
+
+    def somar(
+        self,
+        valores: Iterable[str],
+        por: Optional[str] = None,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """Soma as colunas ``valores`` das linhas ativas em ``[inicio, fim)``.
+
+        Sem ``por`` devolve ``{coluna: total}``; com ``por`` devolve
+        ``{coluna: {grupo: total}}``, só com os grupos que têm linhas.
+        """
+        valores = list(valores)
+        if not self.tempos:
+            return {nome: ({} if por else 0.0) for nome in valores}
+        lo, hi, mascara = self._mascara(inicio, fim)
+        if np is not None:
+            return self._somar_numpy(valores, por, lo, hi, mascara)
+        if por is None:
+            return {nome: float(sum(compress(self.numericas[nome][lo:hi], mascara))) for nome in valores}
+        dicionario = self.dicionarios[por]
+        codigos = list(compress(self.categoricas[por][lo:hi], mascara))
+        resultado = {}
+        for nome in valores:
+            somas = [0.0] * len(dicionario)
+            for codigo, valor in zip(codigos, compress(self.numericas[nome][lo:hi], mascara)):
+                somas[codigo] += valor
+            resultado[nome] = {dicionario.valores[codigo]: somas[codigo] for codigo in dict.fromkeys(codigos)}
+        return resultado
+
+    def _somar_numpy(self, valores: List[str], por: Optional[str], lo: int, hi: int, mascara: Any) -> Dict[str, Any]:
+        colunas = {nome: np.frombuffer(self.numericas[nome], dtype=np.float64)[lo:hi][mascara] for nome in valores}
+        if por is None:
+            return {nome: float(coluna.sum()) for nome, coluna in colunas.items()}
+        dicionario = self.dicionarios[por]
+        codigos = np.frombuffer(self.categoricas[por], dtype=np.int64)[lo:hi][mascara]
+        presentes = np.flatnonzero(np.bincount(codigos, minlength=len(dicionario)))
+        resultado = {}
+        for nome, coluna in colunas.items():
+            somas = np.bincount(codigos, weights=coluna, minlength=len(dicionario))
+            resultado[nome] = {dicionario.valores[c]: float(somas[c]) for c in presentes}
+        return resultado
+
+
+class ArmazemAnalitico:
+    """Colunas de itens, vendas, descontos e perdas usadas pelos relatórios."""
+
+    def __init__(self) -> None:
+        self.itens = TabelaColunar(("bruto", "desconto", "liquido"), ("produto",))
+        self.vendas = TabelaColunar(("valor",), ("forma",))
+        self.descontos = TabelaColunar(("valor",), ("motivo", "usuario"))
+        self.perdas = TabelaColunar(("valor",), ("produto", "motivo"))
+        self._tabelas = {
+            "itens": self.itens,
+            "movimentos_caixa": self.vendas,
+            "descontos_log": self.descontos,
+            "perdas_estoque": self.perdas,
+        }
+
+    # Manutenção (chamada pelo ``MemoryDB``) --------------------------------
+    def indexar(self, tabela: str, entidade: Any) -> None:
+        if tabela == "itens":
+            self._gravar_item(entidade)
+        elif tabela == "movimentos_caixa":
+            self._gravar_movimento(entidade)
+        elif tabela == "descontos_log":
+            self._gravar_desconto(entidade)
+        elif tabela == "perdas_estoque":
+            self._gravar_perda(entidade)
+
+    def desindexar(self, tabela: str, entidade: Any) -> None:
+        colunas = self._tabelas.get(tabela)
+        if colunas is not None:
+            colunas.remover(entidade.id)
+
+    def reconstruir(self, tabela: str, entidades: Iterable[Any]) -> None:
+        colunas = self._tabelas.get(tabela)
+        if colunas is None:
+            return
+        colunas.limpar()
+        for entidade in entidades:
+            self.indexar(tabela, entidade)
+
+    def _gravar_item(self, item: ItemComanda) -> None:
+        bruto = item.total_bruto
+        self.itens.gravar(
+            item.id,
+            item.criado_em,
+            not item.cancelado,
+            {"bruto": bruto, "desconto": item.desconto, "liquido": max(0.0, bruto - item.desconto)},
+            {"produto": item.produto_codigo},
+        )
+
+    def _gravar_movimento(self, mov: MovimentoCaixa) -> None:
+        if mov.tipo == TipoMovimento.VENDA:
+            self.vendas.gravar(mov.id, mov.criado_em, True, {"valor": mov.valor}, {"forma": mov.forma_pagamento or ""})
+
+    def _gravar_desconto(self, log: DescontoLog) -> None:
+        self.descontos.gravar(
+            log.id, log.criado_em, True, {"valor": log.valor}, {"motivo": log.motivo_id, "usuario": log.usuario}
+        )
+
+    def _gravar_perda(self, perda: PerdaEstoque) -> None:
+        self.perdas.gravar(
+            perda.id,
+            perda.criado_em,
+            True,
+            {"valor": perda.valor_total},
+            {"produto": perda.produto_codigo, "motivo": perda.motivo_id},
+        )
+
+    # Relatórios (mesmo formato de ``PdvService``) --------------------------
+    def relatorio_vendas(self, inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> dict:
+        totais = self.itens.somar(("bruto", "desconto"), inicio=inicio, fim=fim)
+        return {
+            "total_bruto": totais["bruto"],
+            "total_descontos": totais["desconto"],
+            "total_liquido": totais["bruto"] - totais["desconto"],
+            "por_forma": self.vendas.somar(("valor",), "forma", inicio, fim)["valor"],
+            "por_produto": self.itens.somar(("liquido",), "produto", inicio, fim)["liquido"],
+        }
+
+    def relatorio_descontos(self, inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> dict:
+        return {
+            "por_motivo": self.descontos.somar(("valor",), "motivo", inicio, fim)["valor"],
+            "por_usuario": self.descontos.somar(("valor",), "usuario", inicio, fim)["valor"],
+        }
+
+    def relatorio_perdas(self, inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> dict:
+        return {
+            "por_produto": self.perdas.somar(("valor",), "produto", inicio, fim)["valor"],
+            "por_motivo": self.perdas.somar(("valor",), "motivo", inicio, fim)["valor"],
+            "total": self.perdas.somar(("valor",), inicio=inicio, fim=fim)["valor"],
+        }
+
+
+__all__ = ["ArmazemAnalitico", "Dicionario", "TabelaColunar"]
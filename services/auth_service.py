@@ -1,7 +1,7 @@
 import hashlib
 from typing import Optional
 
-from core.db import get_connection
+from core.db import get_connection, transacao
 from models.enums import UserRole
 from services import logging_service
 
@@ -13,13 +13,12 @@ def verify_password(password: str, password_hash: str) -> bool:
     return hash_password(password) == password_hash
 
 def create_user(username: str, password: str, role: UserRole, actor: str) -> int:
-    conn = get_connection()
-    cursor = conn.execute(
-        "INSERT INTO usuarios(username, password_hash, role) VALUES (?, ?, ?)",
-        (username, hash_password(password), role.value),
-    )
-    conn.commit()
-    logging_service.registrar("CRIAR_USUARIO", actor, f"Usuario {username} criado com papel {role.value}")
+    with transacao() as conn:
+        cursor = conn.execute(
+            "INSERT INTO usuarios(username, password_hash, role) VALUES (?, ?, ?)",
+            (username, hash_password(password), role.value),
+        )
+        logging_service.registrar("CRIAR_USUARIO", actor, f"Usuario {username} criado com papel {role.value}")
     return cursor.lastrowid
 
 
@@ -0,0 +1,206 @@
+"""Índice de busca de produtos por código e descrição.
+
+Usado pelas sugestões do PDV (a cada tecla) e por ``product_service``. A
+busca ignora acentos e maiúsculas e aceita várias palavras (todas precisam
+aparecer), em qualquer posição do código ou da descrição, como um ``LIKE
+'%termo%'``. Cada entrada é indexada pelos seus trechos de uma, duas e três
+letras: palavras de até três letras saem direto desse mapa e as maiores
+pela interseção dos seus trigramas, conferida no texto.
+
+Ordem do resultado: código exato, código começando pelo termo, descrição
+começando pelo termo, descrição com palavra começando pelo termo e, por fim,
+o termo no meio do texto. Dentro
+de cada faixa vale a ordem informada em ``adicionar`` (por padrão o código).
+"""
+from __future__ import annotations
+
+import heapq
+import unicodedata
+from typing import AbstractSet, Any, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
+
+
+def normalizar(texto: str) -> str:
+    """Remove acentos e normaliza maiúsculas (``"Pão"`` -> ``"pao"``)."""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold().strip()
+
+
+def _trigramas(texto: str) -> Set[str]:
+    return {texto[i : i + 3] for i in range(len(texto) - 2)}
+
+
+def _gramas(texto: str) -> Set[str]:
+    """Trechos de uma, duas e três letras de ``texto``."""
+    return {texto[i : i + n] for n in (1, 2, 3) for i in range(len(texto) - n + 1)}
+
+
+def _prefixos(palavra: str) -> Iterable[str]:
+    return (palavra[:n] for n in range(1, len(palavra) + 1))
+
+
+_VAZIO: FrozenSet[Hashable] = frozenset()
+_GRAMA, _PREFIXO, _PREFIXO_CODIGO, _PREFIXO_DESCRICAO = range(4)
+
+
+class IndiceBusca:
+    """Índice invertido em memória: trechos curtos do texto e prefixos das palavras.
+
+    Os prefixos (das palavras e do código) dão as faixas de relevância direto
+    por operações de conjunto, sem conferir candidato a candidato, e a ordem
+    global das chaves fica em cache para cortar em ``limite`` sem ordenar
+    todos os resultados.
+    """
+
+    def __init__(self) -> None:
+        # chave -> (código normalizado, descrição normalizada, texto completo, ordem)
+        self._entradas: Dict[Hashable, Tuple[str, str, str, Any]] = {}
+        self._por_codigo: Dict[str, Hashable] = {}
+        # trecho de uma a três letras -> chaves que o contêm
+        self._gramas: Dict[str, Set[Hashable]] = {}
+        self._prefixos: Dict[str, Set[Hashable]] = {}
+        self._prefixos_codigo: Dict[str, Set[Hashable]] = {}
+        self._prefixos_descricao: Dict[str, Set[Hashable]] = {}
+        self._ordenadas: Optional[List[Hashable]] = None
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def __contains__(self, chave: Hashable) -> bool:
+        return chave in self._entradas
+
+    @staticmethod
+    def _termos(codigo: str, descricao: str, texto: str):
+        yield from ((_GRAMA, g) for g in _gramas(texto))
+        yield from ((_PREFIXO, p) for palavra in set(texto.split()) for p in _prefixos(palavra))
+        yield from ((_PREFIXO_CODIGO, p) for p in _prefixos(codigo))
+        yield from ((_PREFIXO_DESCRICAO, p) for p in _prefixos(descricao))
+
+    def _postings(self, tipo: int) -> Dict[str, Set[Hashable]]:
+        return (self._gramas, self._prefixos, self._prefixos_codigo, self._prefixos_descricao)[tipo]
+
+    def adicionar(self, chave: Hashable, codigo: str, descricao: str, ordem: Any = None) -> None:
+        """Indexa (ou reindexa) ``chave``."""
+        if chave in self._entradas:
+            self.remover(chave)
+        codigo_norm = normalizar(codigo)
+        descricao_norm = " ".join(normalizar(descricao).split())
+        texto = f"{codigo_norm} {descricao_norm}"
+        self._entradas[chave] = (codigo_norm, descricao_norm, texto, codigo_norm if ordem is None else ordem)
+        self._por_codigo[codigo_norm] = chave
+        for tipo, termo in self._termos(codigo_norm, descricao_norm, texto):
+            self._postings(tipo).setdefault(termo, set()).add(chave)
+        self._ordenadas = None
+
+    def remover(self, chave: Hashable) -> None:
+        entrada = self._entradas.pop(chave, None)
+        if entrada is None:
+            return
+        codigo, descricao, texto, _ordem = entrada
+        if self._por_codigo.get(codigo) == chave:
+            del self._por_codigo[codigo]
+        for tipo, termo in self._termos(codigo, descricao, texto):
+            postings = self._postings(tipo)
+            chaves = postings.get(termo)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del postings[termo]
+        self._ordenadas = None
+
+    def limpar(self) -> None:
+        self._entradas.clear()
+        self._por_codigo.clear()
+        self._gramas.clear()
+        self._prefixos.clear()
+        self._prefixos_codigo.clear()
+        self._prefixos_descricao.clear()
+        self._ordenadas = None
+
+    def _candidatos(self, palavra: str) -> AbstractSet[Hashable]:
+        if len(palavra) <= 3:
+            return self._gramas.get(palavra, _VAZIO)
+        conjuntos = sorted((self._gramas.get(t, _VAZIO) for t in _trigramas(palavra)), key=len)
+        if not conjuntos[0]:
+            return _VAZIO
+        # trigramas em comum não garantem a sequência; confere no texto
+        return {c for c in conjuntos[0].intersection(*conjuntos[1:]) if palavra in self._entradas[c][2]}
+
+    def _em_ordem(self, chaves: AbstractSet[Hashable], limite: Optional[int]) -> List[Hashable]:
+        if limite is None or len(chaves) <= 4 * limite:
+            ordenadas = sorted(chaves, key=lambda c: self._entradas[c][3])
+            return ordenadas if limite is None else ordenadas[:limite]
+        if self._ordenadas is None:
+            self._ordenadas = sorted(self._entradas, key=lambda c: self._entradas[c][3])
+        resultado = []
+        for chave in self._ordenadas:
+            if chave in chaves:
+                resultado.append(chave)
+                if len(resultado) == limite:
+                    break
+        return resultado
+
+    def _faixas(self, palavras: List[str]) -> List[AbstractSet[Hashable]]:
+        """Candidatos de cada faixa de relevância, da mais relevante para a menos."""
+        if not palavras:
+            return [self._entradas.keys()]
+        candidatos: Optional[AbstractSet[Hashable]] = None
+        # das palavras maiores (conjuntos menores) para as menores
+        for palavra in sorted(set(palavras), key=len, reverse=True):
+            encontrados = self._candidatos(palavra)
+            candidatos = encontrados if candidatos is None else candidatos & encontrados
+            if not candidatos:
+                return []
+
+        termo = " ".join(palavras)
+        exata = self._por_codigo.get(termo)
+        faixas: List[AbstractSet[Hashable]] = [{exata} if exata in candidatos else set()]
+        for postings, chave in (
+            (self._prefixos_codigo, termo),
+            (self._prefixos_descricao, termo),
+            (self._prefixos, palavras[0]),
+        ):
+            faixas.append(postings.get(chave, _VAZIO) & candidatos)
+        faixas.append(candidatos)
+        return faixas
+
+    def buscar(
+        self,
+        termo: str,
+        limite: Optional[int] = None,
+        sobreposto: Optional["IndiceBusca"] = None,
+        ocultar: AbstractSet[Hashable] = _VAZIO,
+    ) -> List[Hashable]:
+        """Chaves que casam com ``termo``, da mais relevante para a menos.
+
+        ``ocultar`` tira chaves deste índice do resultado e as entradas de
+        ``sobreposto`` (um índice pequeno com a mesma ``ordem``) entram junto
+        com as deste, faixa a faixa: é como buscar num índice com essas
+        mudanças aplicadas, sem alterá-lo.
+        """
+        palavras = normalizar(termo).split()
+        camadas = [(self, self._faixas(palavras), ocultar)]
+        if sobreposto is not None:
+            camadas.append((sobreposto, sobreposto._faixas(palavras), _VAZIO))
+
+        resultado: List[Hashable] = []
+        vistos: Set[Hashable] = set()
+        for nivel in range(max(len(camada[1]) for camada in camadas)):
+            falta = None if limite is None else limite - len(resultado)
+            if falta == 0:
+                break
+            partes = []
+            for indice, faixas, escondidas in camadas:
+                if nivel < len(faixas):
+                    faixa = faixas[nivel] - vistos - escondidas
+                    if faixa:
+                        vistos.update(faixa)
+                        partes.append([(indice._entradas[c][3], c) for c in indice._em_ordem(faixa, falta)])
+            if len(partes) == 1:
+                resultado.extend(c for _ordem, c in partes[0])
+            elif partes:
+                intercaladas = heapq.merge(*partes, key=lambda par: par[0])
+                resultado.extend(c for _ordem, c in list(intercaladas)[:falta])
+        return resultado
+
+
+__all__ = ["IndiceBusca", "normalizar"]
@@ -8,8 +8,9 @@ from __future__ import annotations
 from datetime import date, datetime
 from typing import Dict, Optional
 
-from models import Caixa, DescontoLog, MovimentoCaixa, StatusCaixa, TipoMovimento
+from models import Caixa, MovimentoCaixa, StatusCaixa, TipoMovimento
 from services.database import MemoryDB
+from services.metricas import cronometrar_classe
 
 
 class CaixaError(RuntimeError):
@@ -32,6 +33,7 @@ class PagamentoInsuficienteError(CaixaError):
     pass
 
 
+@cronometrar_classe
 class CaixaService:
     def __init__(self, db: MemoryDB, usuario: str = "operador") -> None:
         self.db = db
@@ -43,7 +45,7 @@ class CaixaService:
 
     # --- helpers ---------------------------------------------------------
     def _caixa_por_id(self, caixa_id: int) -> Caixa:
-        caixa = next((c for c in self.db.caixas if c.id == caixa_id), None)
+        caixa = self.db.caixa_por_id(caixa_id)
         if not caixa:
             raise CaixaNaoEncontradoError(f"Caixa {caixa_id} não encontrado")
         return caixa
@@ -155,8 +157,7 @@ class CaixaService:
     # --- Cálculos --------------------------------------------------------
     def calcular_saldo_dinheiro(self, caixa_id: int) -> float:
         caixa = self._caixa_por_id(caixa_id)
-        soma_movimentos = sum(m.valor_dinheiro_impacto for m in self.db.movimentos_caixa if m.caixa_id == caixa.id)
-        return caixa.valor_inicial_dinheiro + soma_movimentos
+        return caixa.valor_inicial_dinheiro + self.db.totais_caixa(caixa.id).impacto_dinheiro
 
     # --- Fechamento ------------------------------------------------------
     def fechar_caixa(self, valor_contado_dinheiro_fechamento: float, usuario_fechamento_id: Optional[str] = None) -> Caixa:
@@ -168,6 +169,7 @@ class CaixaService:
         caixa.status = StatusCaixa.FECHADO
         caixa.usuario_fechamento_id = usuario_fechamento_id or self.usuario
         caixa.data_hora_fechamento = datetime.now()
+        self.db.marcar_alterado(caixa)
         self.db.log(
             "fechar_caixa",
             (
@@ -184,44 +186,19 @@ class CaixaService:
     # --- Relatórios ------------------------------------------------------
     def totais_por_pagamento(self, caixa_id: int) -> Dict[str, float]:
         self._caixa_por_id(caixa_id)
-        totais: Dict[str, float] = {"DINHEIRO": 0.0, "DEBITO": 0.0, "CREDITO": 0.0, "PIX": 0.0}
-        for mov in self.db.movimentos_caixa:
-            if mov.caixa_id != caixa_id:
-                continue
-            if mov.tipo == TipoMovimento.VENDA_DINHEIRO:
-                totais["DINHEIRO"] += mov.valor
-            elif mov.tipo == TipoMovimento.VENDA_DEBITO:
-                totais["DEBITO"] += mov.valor
-            elif mov.tipo == TipoMovimento.VENDA_CREDITO:
-                totais["CREDITO"] += mov.valor
-            elif mov.tipo == TipoMovimento.VENDA_PIX:
-                totais["PIX"] += mov.valor
-        return totais
+        return dict(self.db.totais_caixa(caixa_id).por_pagamento)
 
     def totais_extras(self, caixa_id: int) -> Dict[str, float]:
         self._caixa_por_id(caixa_id)
-        suprimentos = 0.0
-        sangrias = 0.0
-        for mov in self.db.movimentos_caixa:
-            if mov.caixa_id != caixa_id:
-                continue
-            if mov.tipo == TipoMovimento.SUPRIMENTO:
-                suprimentos += mov.valor
-            elif mov.tipo == TipoMovimento.SANGRIA:
-                sangrias += mov.valor
-        return {"suprimentos": suprimentos, "sangrias": sangrias}
+        totais = self.db.totais_caixa(caixa_id)
+        return {"suprimentos": totais.suprimentos, "sangrias": totais.sangrias}
 
     def _total_descontos_do_periodo(self, caixa: Caixa) -> float:
         """Soma descontos aplicados durante o período do caixa."""
 
         inicio = caixa.data_hora_abertura
         fim = caixa.data_hora_fechamento or datetime.now()
-        total = 0.0
-        for log in self.db.descontos_log:
-            if isinstance(log, DescontoLog) and log.criado_em:
-                if inicio <= log.criado_em <= fim:
-                    total += log.valor
-        return total
+        return sum(log.valor for log in self.db.descontos_no_periodo(inicio, fim))
 
     def _resumo_caixa(self, caixa: Caixa) -> Dict[str, float]:
         esperado_registrado = caixa.valor_esperado_dinheiro_fechamento
@@ -229,9 +206,9 @@ class CaixaService:
         totais_pagamento = self.totais_por_pagamento(caixa.id)
         extras = self.totais_extras(caixa.id)
         total_descontos = self._total_descontos_do_periodo(caixa)
-        impactos = [m.valor_dinheiro_impacto for m in self.db.movimentos_caixa if m.caixa_id == caixa.id]
-        total_positivo = sum(v for v in impactos if v > 0)
-        total_negativo = sum(v for v in impactos if v < 0)
+        totais = self.db.totais_caixa(caixa.id)
+        total_positivo = totais.impacto_positivo
+        total_negativo = totais.impacto_negativo
         # valor contado pode estar ausente em caixas antigos; nesse caso, reconstrói
         if caixa.valor_contado_dinheiro_fechamento is not None:
             valor_contado = caixa.valor_contado_dinheiro_fechamento
@@ -274,12 +251,7 @@ class CaixaService:
         return self._resumo_caixa(caixa)
 
     def fechamentos_por_data(self, data_referencia: date) -> list[Dict[str, float]]:
-        fechados = [
-            c
-            for c in self.db.caixas
-            if (c.data_hora_fechamento or c.data_hora_abertura).date() == data_referencia
-            and c.status == StatusCaixa.FECHADO
-        ]
+        fechados = [c for c in self.db.caixas_do_dia(data_referencia) if c.status == StatusCaixa.FECHADO]
         return [self._resumo_caixa(caixa) for caixa in fechados]
 
     def movimentos_do_dia(self, data_referencia: date) -> Dict[str, object]:
@@ -290,12 +262,7 @@ class CaixaService:
         caixa existente.
         """
 
-        movimentos = [
-            m
-            for m in self.db.movimentos_caixa
-            if isinstance(m.criado_em, datetime) and m.criado_em.date() == data_referencia
-        ]
-        movimentos.sort(key=lambda m: m.criado_em)
+        movimentos = self.db.movimentos_do_dia(data_referencia)
         total_valor = sum(m.valor for m in movimentos)
         total_positivo = sum(m.valor_dinheiro_impacto for m in movimentos if m.valor_dinheiro_impacto > 0)
         total_negativo = sum(m.valor_dinheiro_impacto for m in movimentos if m.valor_dinheiro_impacto < 0)
@@ -1,8 +1,8 @@
-from typing import Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
-from core.db import get_connection
+from core.db import get_connection, transacao
 from models.enums import CategoriaProduto, StatusComanda, UnidadeProducao
-from services import logging_service, production_service
+from services import logging_service, metricas, production_service
 from services.product_service import obter
 
 
@@ -11,20 +11,19 @@ class ComandaFechadaError(Exception):
 
 
 def abrir_comanda(mesa_numero: int, usuario: str) -> int:
-    conn = get_connection()
-    mesa = conn.execute("SELECT id FROM mesas WHERE numero = ?", (mesa_numero,)).fetchone()
-    if not mesa:
-        raise ValueError("Mesa inexistente")
-    cursor = conn.execute(
-        "INSERT INTO comandas(mesa_id, aberta_por, status) VALUES (?, ?, ?)",
-        (mesa["id"], usuario, StatusComanda.ABERTA.value),
-    )
-    conn.execute(
-        "UPDATE mesas SET status = 'OCUPADA' WHERE id = ?",
-        (mesa["id"],),
-    )
-    conn.commit()
-    logging_service.registrar("ABRIR_COMANDA", usuario, f"Mesa {mesa_numero} aberta")
+    with transacao() as conn:
+        mesa = conn.execute("SELECT id FROM mesas WHERE numero = ?", (mesa_numero,)).fetchone()
+        if not mesa:
+            raise ValueError("Mesa inexistente")
+        cursor = conn.execute(
+            "INSERT INTO comandas(mesa_id, aberta_por, status) VALUES (?, ?, ?)",
+            (mesa["id"], usuario, StatusComanda.ABERTA.value),
+        )
+        conn.execute(
+            "UPDATE mesas SET status = 'OCUPADA' WHERE id = ?",
+            (mesa["id"],),
+        )
+        logging_service.registrar("ABRIR_COMANDA", usuario, f"Mesa {mesa_numero} aberta")
     return cursor.lastrowid
 
 
@@ -36,32 +35,36 @@ def _validar_aberta(conn, comanda_id: int) -> None:
         raise ComandaFechadaError("Comanda fechada ou inexistente")
 
 
-def adicionar_item(
-    comanda_id: int,
-    produto_id: int,
-    quantidade: float,
-    usuario: str,
-    peso_gramas: Optional[float] = None,
-    desconto: float = 0.0,
-    motivo_desconto: Optional[str] = None,
-    autorizado_por: Optional[str] = None,
-) -> int:
-    conn = get_connection()
-    _validar_aberta(conn, comanda_id)
-    produto = obter(produto_id)
-    if not produto:
-        raise ValueError("Produto inexistente")
-
-    preco_unitario = produto["preco"]
-    if produto["categoria"] in {
-        CategoriaProduto.SOBREMESA_PESO.value,
-        CategoriaProduto.OPCIONAL_PESO.value,
-    }:
+_CATEGORIAS_PESO = {CategoriaProduto.SOBREMESA_PESO.value, CategoriaProduto.OPCIONAL_PESO.value}
+
+
+def _preparar_item(
+    produto, quantidade: float, peso_gramas: Optional[float]
+) -> Tuple[float, float, float, UnidadeProducao]:
+    """Devolve ``(quantidade, preco_unitario, consumo, unidade)`` de um item.
+
+    Itens por quilo exigem ``peso_gramas``, contam como uma unidade e baixam
+    o peso (em kg) dos lotes; os demais baixam porções.
+    """
+    if produto["categoria"] in _CATEGORIAS_PESO:
         if peso_gramas is None:
             raise ValueError("Peso obrigatorio para itens por quilo")
         preco_unitario = (produto["preco_por_kg"] or produto["preco"]) * (peso_gramas / 1000)
-        quantidade = 1
+        return 1, preco_unitario, peso_gramas / 1000, UnidadeProducao.KG
+    return quantidade, produto["preco"], quantidade, UnidadeProducao.PORCAO
 
+
+def _inserir_item(
+    conn,
+    comanda_id: int,
+    produto_id: int,
+    quantidade: float,
+    peso_gramas: Optional[float],
+    preco_unitario: float,
+    desconto: float,
+    motivo_desconto: Optional[str],
+    autorizado_por: Optional[str],
+) -> int:
     cursor = conn.execute(
         """
         INSERT INTO itens_comanda(
@@ -80,24 +83,107 @@ def adicionar_item(
             autorizado_por,
         ),
     )
-    conn.commit()
-    logging_service.registrar(
-        "ADICIONAR_ITEM",
-        usuario,
-        f"Item {produto_id} adicionado na comanda {comanda_id} peso={peso_gramas} desconto={desconto}",
-    )
-
-    unidade = (
-        UnidadeProducao.KG
-        if produto["categoria"]
-        in {CategoriaProduto.OPCIONAL_PESO.value, CategoriaProduto.SOBREMESA_PESO.value}
-        else UnidadeProducao.PORCAO
-    )
-    consumo = peso_gramas / 1000 if unidade == UnidadeProducao.KG and peso_gramas else quantidade
-    production_service.registrar_consumo_venda(produto_id, consumo, unidade)
     return cursor.lastrowid
 
 
+def adicionar_item(
+    comanda_id: int,
+    produto_id: int,
+    quantidade: float,
+    usuario: str,
+    peso_gramas: Optional[float] = None,
+    desconto: float = 0.0,
+    motivo_desconto: Optional[str] = None,
+    autorizado_por: Optional[str] = None,
+) -> int:
+    """Lança o item, baixa o estoque e registra o log em um único commit.
+
+    Se qualquer etapa falhar nada é gravado: não sobra item sem baixa de
+    estoque nem log de um item que não existe.
+    """
+    with transacao() as conn:
+        _validar_aberta(conn, comanda_id)
+        produto = obter(produto_id)
+        if not produto:
+            raise ValueError("Produto inexistente")
+
+        quantidade, preco_unitario, consumo, unidade = _preparar_item(produto, quantidade, peso_gramas)
+        item_id = _inserir_item(
+            conn,
+            comanda_id,
+            produto_id,
+            quantidade,
+            peso_gramas,
+            preco_unitario,
+            desconto,
+            motivo_desconto,
+            autorizado_por,
+        )
+        logging_service.registrar(
+            "ADICIONAR_ITEM",
+            usuario,
+            f"Item {produto_id} adicionado na comanda {comanda_id} peso={peso_gramas} desconto={desconto}",
+        )
+        production_service.registrar_consumo_venda(produto_id, consumo, unidade)
+    return item_id
+
+
+def adicionar_itens(comanda_id: int, linhas: Iterable[Mapping[str, Any]], usuario: str) -> List[int]:
+    """Lança vários itens (um pedido inteiro) em um único commit.
+
+    Cada linha é um dicionário com ``produto_id`` e ``quantidade`` e,
+    opcionalmente, os demais argumentos de ``adicionar_item`` (``peso_gramas``,
+    ``desconto``, ``motivo_desconto``, ``autorizado_por``). Todas as linhas são
+    validadas antes de qualquer gravação; o log é um só para o pedido e a
+    baixa de lotes é feita uma vez por produto. Devolve os ids na ordem das
+    linhas.
+    """
+    linhas = list(linhas)
+    if not linhas:
+        return []
+    with transacao() as conn:
+        _validar_aberta(conn, comanda_id)
+        produtos: Dict[int, Any] = {}
+        preparados = []
+        for linha in linhas:
+            produto_id = linha["produto_id"]
+            if produto_id not in produtos:
+                produtos[produto_id] = obter(produto_id)
+            produto = produtos[produto_id]
+            if not produto:
+                raise ValueError(f"Produto inexistente: {produto_id}")
+            peso_gramas = linha.get("peso_gramas")
+            preparados.append((linha, produto_id, peso_gramas, *_preparar_item(produto, linha["quantidade"], peso_gramas)))
+
+        ids = [
+            _inserir_item(
+                conn,
+                comanda_id,
+                produto_id,
+                quantidade,
+                peso_gramas,
+                preco_unitario,
+                linha.get("desconto", 0.0),
+                linha.get("motivo_desconto"),
+                linha.get("autorizado_por"),
+            )
+            for linha, produto_id, peso_gramas, quantidade, preco_unitario, _consumo, _unidade in preparados
+        ]
+        resumo = ", ".join(
+            f"{produto_id}x{quantidade:g}" if peso_gramas is None else f"{produto_id} peso={peso_gramas}"
+            for _linha, produto_id, peso_gramas, quantidade, *_resto in preparados
+        )
+        logging_service.registrar(
+            "ADICIONAR_ITENS",
+            usuario,
+            f"{len(ids)} itens adicionados na comanda {comanda_id}: {resumo}",
+        )
+        production_service.registrar_consumo_vendas(
+            (produto_id, consumo, unidade) for _linha, produto_id, _peso, _qtd, _preco, consumo, unidade in preparados
+        )
+    return ids
+
+
 def aplicar_desconto_comanda(
     comanda_id: int,
     valor: float,
@@ -105,27 +191,25 @@ def aplicar_desconto_comanda(
     motivo: str,
     autorizado_por: str,
 ) -> None:
-    conn = get_connection()
-    _validar_aberta(conn, comanda_id)
-    conn.execute(
-        "UPDATE comandas SET desconto_total = ?, motivo_desconto = ?, autorizador = ? WHERE id = ?",
-        (valor, motivo, autorizado_por, comanda_id),
-    )
-    conn.commit()
-    logging_service.registrar(
-        "DESCONTO_COMANDA", usuario, f"Desconto {valor} aplicado na comanda {comanda_id} motivo {motivo}",
-    )
+    with transacao() as conn:
+        _validar_aberta(conn, comanda_id)
+        conn.execute(
+            "UPDATE comandas SET desconto_total = ?, motivo_desconto = ?, autorizador = ? WHERE id = ?",
+            (valor, motivo, autorizado_por, comanda_id),
+        )
+        logging_service.registrar(
+            "DESCONTO_COMANDA", usuario, f"Desconto {valor} aplicado na comanda {comanda_id} motivo {motivo}",
+        )
 
 
 def fechar_comanda(comanda_id: int, usuario: str) -> None:
-    conn = get_connection()
-    _validar_aberta(conn, comanda_id)
-    conn.execute(
-        "UPDATE comandas SET status = ?, fechado_em = datetime('now') WHERE id = ?",
-        (StatusComanda.FECHADA.value, comanda_id),
-    )
-    conn.commit()
-    logging_service.registrar("FECHAR_COMANDA", usuario, f"Comanda {comanda_id} fechada")
+    with transacao() as conn:
+        _validar_aberta(conn, comanda_id)
+        conn.execute(
+            "UPDATE comandas SET status = ?, fechado_em = datetime('now') WHERE id = ?",
+            (StatusComanda.FECHADA.value, comanda_id),
+        )
+        logging_service.registrar("FECHAR_COMANDA", usuario, f"Comanda {comanda_id} fechada")
 
 
 def totalizar(comanda_id: int) -> float:
@@ -144,21 +228,23 @@ def totalizar(comanda_id: int) -> float:
 
 
 def registrar_envio_cozinha(item_id: int, usuario: str) -> None:
-    conn = get_connection()
-    conn.execute(
-        "UPDATE itens_comanda SET enviado_cozinha = 1 WHERE id = ?",
-        (item_id,),
-    )
-    conn.commit()
-    logging_service.registrar("ENVIAR_COZINHA", usuario, f"Item {item_id} enviado para cozinha")
+    with transacao() as conn:
+        conn.execute(
+            "UPDATE itens_comanda SET enviado_cozinha = 1 WHERE id = ?",
+            (item_id,),
+        )
+        logging_service.registrar("ENVIAR_COZINHA", usuario, f"Item {item_id} enviado para cozinha")
 
 
 __all__ = [
     "abrir_comanda",
     "adicionar_item",
+    "adicionar_itens",
     "aplicar_desconto_comanda",
     "fechar_comanda",
     "totalizar",
     "registrar_envio_cozinha",
     "ComandaFechadaError",
 ]
+
+metricas.instrumentar_modulo(globals())
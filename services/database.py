@@ -10,11 +10,13 @@ from __future__ import annotations
 import json
 import sqlite3
 import hashlib
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import date, datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
 from models.enums import UserRole
 
+from core.db import aplicar_perfil, configuracao_ativa
 from models import (
     Caixa,
     Comanda,
@@ -32,10 +34,135 @@ from models import (
     TipoMovimento,
     User,
 )
+from services.analitico import ArmazemAnalitico
+from services.busca import IndiceBusca
+from services.indice_tempo import IndiceTemporal
+from services.tracking import ChangeSet, TrackedDict, TrackedList, TrackedRing
+
+
+# Coleções monitoradas do ``MemoryDB`` e o atributo usado como chave primária.
+_TABELAS_LISTA = (
+    "motivos_desconto",
+    "motivos_perda",
+    "mesas",
+    "itens",
+    "descontos_log",
+    "perdas_estoque",
+    "caixas",
+    "movimentos_caixa",
+    "logs",
+)
+_TABELAS_DICT = ("users", "produtos", "comandas")
+# Tabelas append-only: a memória guarda só as entradas recentes e o disco é o
+# arquivo completo, então a gravação nunca apaga linhas delas.
+_TABELAS_ARQUIVO = ("logs",)
+_CHAVES: Dict[str, str] = {"produtos": "codigo", "mesas": "numero"}
+_TABELA_POR_TIPO: Dict[type, str] = {
+    User: "users",
+    Produto: "produtos",
+    MotivoDesconto: "motivos_desconto",
+    MotivoPerda: "motivos_perda",
+    Mesa: "mesas",
+    Comanda: "comandas",
+    ItemComanda: "itens",
+    DescontoLog: "descontos_log",
+    PerdaEstoque: "perdas_estoque",
+    Caixa: "caixas",
+    MovimentoCaixa: "movimentos_caixa",
+    LogEntry: "logs",
+}
+
+
+_PAGAMENTO_POR_TIPO: Dict[TipoMovimento, str] = {
+    TipoMovimento.VENDA_DINHEIRO: "DINHEIRO",
+    TipoMovimento.VENDA_DEBITO: "DEBITO",
+    TipoMovimento.VENDA_CREDITO: "CREDITO",
+    TipoMovimento.VENDA_PIX: "PIX",
+}
+
+
+@dataclass
+class LoteGravacao:
+    """Mudanças já serializadas em linhas (formato de ``_COLUNAS``).
+
+    É montado na thread que alterou os dados e pode ser gravado em outra
+    (ver ``services.persistencia``), sem tocar nas entidades vivas.
+    ``parcial`` indica que a memória não tinha o histórico completo, então
+    tabelas ``completas`` não podem apagar o que já está no disco.
+    """
+
+    seq: int
+    completas: Dict[str, List[tuple]] = field(default_factory=dict)
+    deletes: Dict[str, List[Any]] = field(default_factory=dict)
+    upserts: Dict[str, List[tuple]] = field(default_factory=dict)
+    parcial: bool = False
+
+
+@dataclass
+class TotaisCaixa:
+    """Agregados dos movimentos de um caixa, atualizados a cada movimento."""
+
+    impacto_dinheiro: float = 0.0
+    impacto_positivo: float = 0.0
+    impacto_negativo: float = 0.0
+    suprimentos: float = 0.0
+    sangrias: float = 0.0
+    por_pagamento: Dict[str, float] = field(
+        default_factory=lambda: {"DINHEIRO": 0.0, "DEBITO": 0.0, "CREDITO": 0.0, "PIX": 0.0}
+    )
+
+    def aplicar(self, mov: MovimentoCaixa, sinal: int = 1) -> None:
+        impacto = mov.valor_dinheiro_impacto * sinal
+        self.impacto_dinheiro += impacto
+        if mov.valor_dinheiro_impacto > 0:
+            self.impacto_positivo += impacto
+        elif mov.valor_dinheiro_impacto < 0:
+            self.impacto_negativo += impacto
+        if mov.tipo == TipoMovimento.SUPRIMENTO:
+            self.suprimentos += mov.valor * sinal
+        elif mov.tipo == TipoMovimento.SANGRIA:
+            self.sangrias += mov.valor * sinal
+        forma = _PAGAMENTO_POR_TIPO.get(mov.tipo)
+        if forma:
+            self.por_pagamento[forma] += mov.valor * sinal
 
 
 class MemoryDB:
-    def __init__(self) -> None:
+    """Banco em memória.
+
+    As coleções são monitoradas: inserções e remoções ficam registradas em
+    ``mudancas`` automaticamente. Alterações feitas diretamente nos campos de
+    uma entidade (ex.: ``item.cancelado = True``) precisam ser avisadas com
+    ``marcar_alterado`` para que a persistência incremental as grave.
+
+    Os mesmos avisos mantêm índices por chave (``item_por_id``,
+    ``itens_da_comanda``, ``caixa_por_id``, ``movimentos_do_caixa``), que
+    evitam varrer o histórico inteiro nas operações do dia a dia, e o índice
+    de busca de produtos usado por ``buscar_produtos``. Para cada
+    caixa também são mantidos os totais dos movimentos (``totais_caixa``);
+    por isso movimentos de caixa devem ser tratados como imutáveis.
+
+    ``logs`` é um buffer circular com as ``logs_recentes`` entradas mais novas
+    (o que a interface exibe); as mais antigas ficam apenas no arquivo do
+    backend persistente e são lidas com ``consultar_logs``.
+    """
+
+    def __init__(self, logs_recentes: int = 500) -> None:
+        self.logs_recentes = logs_recentes
+        # ``GravadorAssincrono`` opcional: com ele ``persist()`` só enfileira
+        self.gravador = None
+        # ``ArmazemAnalitico`` opcional, ligado por ``ativar_analitico``
+        self.analitico: Optional[ArmazemAnalitico] = None
+        self.mudancas = ChangeSet()
+        self._itens_por_id: Dict[int, ItemComanda] = {}
+        self._itens_por_comanda: Dict[int, List[ItemComanda]] = {}
+        self._caixas_por_id: Dict[int, Caixa] = {}
+        self._movimentos_por_caixa: Dict[int, List[MovimentoCaixa]] = {}
+        self._totais_por_caixa: Dict[int, TotaisCaixa] = {}
+        self._movimentos_por_data = IndiceTemporal(lambda m: m.criado_em)
+        self._descontos_por_data = IndiceTemporal(lambda d: d.criado_em)
+        self._caixas_por_data = IndiceTemporal(lambda c: c.data_hora_fechamento or c.data_hora_abertura)
+        self._busca_produtos = IndiceBusca()
         self.produtos: Dict[str, Produto] = {}
         self.motivos_desconto: List[MotivoDesconto] = []
         self.motivos_perda: List[MotivoPerda] = []
@@ -52,6 +179,156 @@ class MemoryDB:
         self._seq = 1
         self._garantir_admin_padrao()
 
+    def __setattr__(self, nome: str, valor: Any) -> None:
+        substituida = False
+        if nome in _TABELAS_ARQUIVO and not isinstance(valor, TrackedRing):
+            valor = TrackedRing(valor, owner=self, tabela=nome, maxlen=self.logs_recentes)
+            substituida = True
+        elif nome in _TABELAS_LISTA and not isinstance(valor, TrackedList):
+            valor = TrackedList(valor, owner=self, tabela=nome)
+            substituida = True
+        elif nome in _TABELAS_DICT and not isinstance(valor, TrackedDict):
+            valor = TrackedDict(valor, owner=self, tabela=nome)
+            substituida = True
+        super().__setattr__(nome, valor)
+        if substituida:
+            self.mudancas.completa(nome)
+            self._reindexar(nome)
+
+    # Rastreamento de mudanças ------------------------------------------
+    @staticmethod
+    def _chave(tabela: str, entidade: Any) -> Any:
+        return getattr(entidade, _CHAVES.get(tabela, "id"))
+
+    def _entidade_inserida(self, tabela: str, entidade: Any) -> None:
+        self.mudancas.upsert(tabela, self._chave(tabela, entidade), entidade)
+        self._indexar(tabela, entidade)
+
+    def _entidade_removida(self, tabela: str, entidade: Any) -> None:
+        self.mudancas.delete(tabela, self._chave(tabela, entidade))
+        self._desindexar(tabela, entidade)
+
+    # Índices ------------------------------------------------------------
+    def _indexar(self, tabela: str, entidade: Any) -> None:
+        if tabela == "produtos":
+            self._busca_produtos.adicionar(entidade.codigo, entidade.codigo, entidade.descricao)
+        elif tabela == "itens":
+            self._itens_por_id[entidade.id] = entidade
+            self._itens_por_comanda.setdefault(entidade.comanda_id, []).append(entidade)
+        elif tabela == "caixas":
+            self._caixas_por_id[entidade.id] = entidade
+            self._caixas_por_data.adicionar(entidade)
+        elif tabela == "movimentos_caixa":
+            self._movimentos_por_caixa.setdefault(entidade.caixa_id, []).append(entidade)
+            self._totais_por_caixa.setdefault(entidade.caixa_id, TotaisCaixa()).aplicar(entidade)
+            self._movimentos_por_data.adicionar(entidade)
+        elif tabela == "descontos_log":
+            self._descontos_por_data.adicionar(entidade)
+        if self.analitico is not None:
+            self.analitico.indexar(tabela, entidade)
+
+    def _desindexar(self, tabela: str, entidade: Any) -> None:
+        if tabela == "produtos":
+            self._busca_produtos.remover(entidade.codigo)
+        elif tabela == "itens":
+            self._itens_por_id.pop(entidade.id, None)
+            _remover_de(self._itens_por_comanda, entidade.comanda_id, entidade)
+        elif tabela == "caixas":
+            self._caixas_por_id.pop(entidade.id, None)
+            self._caixas_por_data.remover(entidade)
+        elif tabela == "movimentos_caixa":
+            _remover_de(self._movimentos_por_caixa, entidade.caixa_id, entidade)
+            totais = self._totais_por_caixa.get(entidade.caixa_id)
+            if totais is not None:
+                totais.aplicar(entidade, sinal=-1)
+            self._movimentos_por_data.remover(entidade)
+        elif tabela == "descontos_log":
+            self._descontos_por_data.remover(entidade)
+        if self.analitico is not None:
+            self.analitico.desindexar(tabela, entidade)
+
+    def _reindexar(self, tabela: str) -> None:
+        if self.analitico is not None:
+            self.analitico.reconstruir(tabela, self._entidades(tabela))
+        if tabela == "produtos":
+            self._busca_produtos.limpar()
+        elif tabela == "itens":
+            self._itens_por_id.clear()
+            self._itens_por_comanda.clear()
+        elif tabela == "caixas":
+            self._caixas_por_id.clear()
+            self._caixas_por_data.limpar()
+        elif tabela == "movimentos_caixa":
+            self._movimentos_por_caixa.clear()
+            self._totais_por_caixa.clear()
+            self._movimentos_por_data.limpar()
+        elif tabela == "descontos_log":
+            self._descontos_por_data.limpar()
+        else:
+            return
+        for entidade in self._entidades(tabela):
+            self._indexar(tabela, entidade)
+
+    def item_por_id(self, item_id: int) -> Optional[ItemComanda]:
+        return self._itens_por_id.get(item_id)
+
+    def itens_da_comanda(self, comanda_id: int) -> List[ItemComanda]:
+        return self._itens_por_comanda.get(comanda_id, [])
+
+    def caixa_por_id(self, caixa_id: int) -> Optional[Caixa]:
+        return self._caixas_por_id.get(caixa_id)
+
+    def movimentos_do_caixa(self, caixa_id: int) -> List[MovimentoCaixa]:
+        return self._movimentos_por_caixa.get(caixa_id, [])
+
+    def totais_caixa(self, caixa_id: int) -> TotaisCaixa:
+        return self._totais_por_caixa.get(caixa_id) or TotaisCaixa()
+
+    def movimentos_do_dia(self, dia: date) -> List[MovimentoCaixa]:
+        """Movimentos de caixa criados em ``dia``, em ordem de criação."""
+        return self._movimentos_por_data.do_dia(dia)
+
+    def descontos_no_periodo(self, inicio: datetime, fim: datetime) -> List[DescontoLog]:
+        """Descontos com ``criado_em`` entre ``inicio`` e ``fim`` (inclusive)."""
+        return self._descontos_por_data.no_periodo(inicio, fim, incluir_fim=True)
+
+    def caixas_do_dia(self, dia: date) -> List[Caixa]:
+        """Caixas fechados em ``dia`` (ou abertos nele, se ainda não fechados)."""
+        return self._caixas_por_data.do_dia(dia)
+
+    def buscar_produtos(self, termo: str, limite: Optional[int] = None) -> List[Produto]:
+        """Produtos por código ou descrição (sem acentos), do mais relevante ao menos."""
+        return [self.produtos[codigo] for codigo in self._busca_produtos.buscar(termo, limite)]
+
+    def marcar_alterado(self, *entidades: Any) -> None:
+        """Registra entidades alteradas in-place para a próxima gravação."""
+        for entidade in entidades:
+            tabela = _TABELA_POR_TIPO[type(entidade)]
+            self.mudancas.upsert(tabela, self._chave(tabela, entidade), entidade)
+            if tabela == "produtos":
+                # a descrição pode ter mudado
+                self._indexar(tabela, entidade)
+            elif tabela == "itens" and self.analitico is not None:
+                # cancelamento ou desconto mudam os totais
+                self.analitico.indexar(tabela, entidade)
+            elif tabela == "caixas":
+                # o fechamento muda a data usada por ``caixas_do_dia``
+                self._caixas_por_data.atualizar(entidade)
+
+    def ativar_analitico(self) -> ArmazemAnalitico:
+        """Liga o armazém colunar usado pelos relatórios de ``PdvService``.
+
+        O armazém é montado com o que está em memória e depois acompanha as
+        mudanças. No ``SQLiteDB`` com ``lazy=True`` chame
+        ``carregar_historico`` antes, para incluir o histórico.
+        """
+        if self.analitico is None:
+            analitico = ArmazemAnalitico()
+            for tabela in ("itens", "movimentos_caixa", "descontos_log", "perdas_estoque"):
+                analitico.reconstruir(tabela, self._entidades(tabela))
+            self.analitico = analitico
+        return self.analitico
+
     def next_id(self) -> int:
         atual = self._seq
         self._seq += 1
@@ -62,11 +339,103 @@ class MemoryDB:
             LogEntry(id=self.next_id(), acao=acao, detalhes=detalhes, usuario=usuario, criado_em=datetime.now())
         )
 
+    def consultar_logs(
+        self,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None,
+        acao: Optional[str] = None,
+        limite: int = 100,
+    ) -> List[LogEntry]:
+        """Logs em ``[inicio, fim)`` (e da ``acao``, se informada), do mais novo ao mais antigo.
+
+        No ``MemoryDB`` só há o buffer em memória; os backends persistentes
+        consultam o arquivo completo.
+        """
+        encontrados = []
+        for log in reversed(self.logs):
+            if len(encontrados) >= limite:
+                break
+            if _log_no_filtro(log, inicio, fim, acao):
+                encontrados.append(log)
+        return encontrados
+
     # Persistência -----------------------------------------------------
     def persist(self) -> None:
-        """Gancho para persistência. ``MemoryDB`` não persiste nada."""
+        """Grava as mudanças pendentes. ``MemoryDB`` não persiste nada.
+
+        As mudanças são sempre serializadas na thread que chamou; a escrita
+        acontece na hora ou, com um ``gravador`` associado, na thread dele.
+        """
+        lote = self._coletar_mudancas()
+        if lote is None:
+            return
+        if self.gravador is not None:
+            self.gravador.enviar_lote(lote)
+        else:
+            self._gravar_lotes([lote])
+
+    def aguardar_gravacao(self) -> None:
+        """Persiste e, havendo ``gravador``, espera a escrita terminar."""
+        self.persist()
+        if self.gravador is not None:
+            self.gravador.flush()
+
+    def _coletar_mudancas(self) -> Optional[LoteGravacao]:
+        return None
+
+    def _gravar_lotes(self, lotes: List[LoteGravacao]) -> None:
         return
 
+    def _serializar_mudancas(self) -> LoteGravacao:
+        """Converte ``mudancas`` em um ``LoteGravacao`` e limpa o ``ChangeSet``."""
+        mudancas = self.mudancas
+        lote = LoteGravacao(seq=self._seq)
+        for tabela in mudancas.completas:
+            lote.completas[tabela] = [_SERIALIZADORES[tabela](e) for e in self._entidades(tabela)]
+        for tabela, chaves in mudancas.deletes.items():
+            if chaves and tabela not in mudancas.completas:
+                lote.deletes[tabela] = list(chaves)
+        for tabela, entidades in mudancas.upserts.items():
+            if entidades and tabela not in mudancas.completas:
+                lote.upserts[tabela] = [_SERIALIZADORES[tabela](e) for e in entidades.values()]
+        mudancas.clear()
+        return lote
+
+    def _entidades(self, tabela: str):
+        colecao = getattr(self, tabela)
+        return colecao.values() if isinstance(colecao, dict) else colecao
+
+    def _restaurar(self, linhas: Dict[str, Iterable[Mapping[str, Any]]]) -> None:
+        """Recria as coleções a partir de linhas no formato de ``_COLUNAS``.
+
+        Usado pelos backends persistentes no carregamento. O que foi lido é
+        considerado já gravado; apenas os seeds criados aqui ficam pendentes.
+        """
+        for tabela in _COLUNAS:
+            desserializar = _DESSERIALIZADORES[tabela]
+            entidades = [desserializar(linha) for linha in linhas.get(tabela, ())]
+            if tabela in _TABELAS_DICT:
+                setattr(self, tabela, {self._chave(tabela, e): e for e in entidades})
+            else:
+                setattr(self, tabela, entidades)
+        self.mesas.sort(key=lambda m: m.numero)
+        for item in self.itens:
+            comanda = self.comandas.get(item.comanda_id)
+            if comanda is not None and item.id not in comanda.itens:
+                comanda.itens.append(item.id)
+
+        # o que acabou de ser lido já está no disco
+        self.mudancas.clear()
+
+        if not self.mesas:
+            self.mesas.extend(Mesa(numero=i + 1) for i in range(20))
+        # se não houver dados mínimos, carregar demo
+        if not self.produtos:
+            self.carregar_dados_demo()
+        # garante usuário admin padrão
+        if not self.users:
+            self._garantir_admin_padrao()
+
     def caixa_aberto(self) -> Caixa | None:
         return next((c for c in self.caixas if getattr(c, "status", None) == StatusCaixa.ABERTO), None)
 
@@ -110,12 +479,29 @@ class MemoryDB:
 
 
 class SQLiteDB(MemoryDB):
-    """Versão do repositório que salva os dados em disco via SQLite."""
+    """Versão do repositório que salva os dados em disco via SQLite.
+
+    Com ``lazy=True`` apenas o estado operacional é carregado na abertura:
+    comandas abertas e seus itens, o caixa aberto com seus movimentos e
+    descontos do período. O histórico
+    fica no disco e é lido sob demanda com ``iterar``/``consultar`` (ou
+    ``carregar_historico`` para materializar tudo, ex.: relatórios completos).
+    Nesse modo, substituir uma coleção inteira não apaga o histórico do disco.
+    """
 
-    def __init__(self, db_path: Optional[str | Path] = None) -> None:
+    def __init__(
+        self,
+        db_path: Optional[str | Path] = None,
+        lazy: bool = False,
+        logs_recentes: int = 500,
+        perfil: Optional[str] = None,
+    ) -> None:
         self.db_path = Path(db_path or Path("data") / "pdv.sqlite")
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        super().__init__()
+        self.perfil = perfil
+        self.lazy = lazy
+        self._seq_gravado: Optional[int] = None
+        super().__init__(logs_recentes=logs_recentes)
         self._init_db()
         self._load()
 
@@ -123,8 +509,14 @@ class SQLiteDB(MemoryDB):
     def _connect(self) -> sqlite3.Connection:
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
+        aplicar_perfil(conn, self.perfil)
         return conn
 
+    def configuracao_sqlite(self) -> Dict[str, object]:
+        """PRAGMAs de desempenho em vigor (perfil ``RESTAURANTE_DB_PROFILE``)."""
+        with self._connect() as conn:
+            return configuracao_ativa(conn, self.perfil)
+
     def _init_db(self) -> None:
         with self._connect() as conn:
             conn.executescript(
@@ -172,7 +564,8 @@ class SQLiteDB(MemoryDB):
                     quantidade REAL,
                     preco_unitario REAL,
                     cancelado INTEGER,
-                    desconto REAL
+                    desconto REAL,
+                    criado_em TEXT
                 );
                 CREATE TABLE IF NOT EXISTS descontos_log (
                     id INTEGER PRIMARY KEY,
@@ -224,15 +617,31 @@ class SQLiteDB(MemoryDB):
                 );
                 """
             )
+            # bancos criados antes de ``itens.criado_em``
+            colunas_itens = {row["name"] for row in conn.execute("PRAGMA table_info(itens)")}
+            if "criado_em" not in colunas_itens:
+                conn.execute("ALTER TABLE itens ADD COLUMN criado_em TEXT")
             # garante 20 mesas
             cur = conn.execute("SELECT COUNT(*) as total FROM mesas")
             total = cur.fetchone()["total"]
             if total == 0:
                 conn.executemany("INSERT INTO mesas (numero, comanda_id) VALUES (?, NULL)", [(i + 1,) for i in range(20)])
+            # índices usados pelo carregamento parcial e pelas consultas de histórico
+            conn.executescript(
+                """
+                CREATE INDEX IF NOT EXISTS idx_comandas_status ON comandas (status);
+                CREATE INDEX IF NOT EXISTS idx_itens_comanda ON itens (comanda_id);
+                CREATE INDEX IF NOT EXISTS idx_caixas_status ON caixas (status);
+                CREATE INDEX IF NOT EXISTS idx_movimentos_caixa ON movimentos_caixa (caixa_id);
+                CREATE INDEX IF NOT EXISTS idx_descontos_criado_em ON descontos_log (criado_em);
+                CREATE INDEX IF NOT EXISTS idx_logs_criado_em ON logs (criado_em);
+                CREATE INDEX IF NOT EXISTS idx_logs_acao_criado_em ON logs (acao, criado_em);
+                """
+            )
 
     # Serialização -----------------------------------------------------
     def _dt(self, value: Optional[str]) -> Optional[datetime]:
-        return datetime.fromisoformat(value) if value else None
+        return _decode_datetime(value)
 
     def _load(self) -> None:
         if not self.db_path.exists():
@@ -240,290 +649,390 @@ class SQLiteDB(MemoryDB):
         with self._connect() as conn:
             seq_row = conn.execute("SELECT valor FROM metadata WHERE chave='seq'").fetchone()
             self._seq = int(seq_row["valor"]) if seq_row else 1
+            if self.lazy:
+                linhas = self._linhas_operacionais(conn)
+            else:
+                linhas = {
+                    tabela: conn.execute(f"SELECT * FROM {tabela}").fetchall()
+                    for tabela in _COLUNAS
+                    if tabela not in _TABELAS_ARQUIVO
+                }
+            recentes = conn.execute("SELECT * FROM logs ORDER BY id DESC LIMIT ?", (self.logs_recentes,)).fetchall()
+            linhas["logs"] = recentes[::-1]
+        self._restaurar(linhas)
+        # grava o estado atual (incluindo seeds) para evitar falhas de indentação
+        self.persist()
 
-            self.users = {
-                row["username"]: User(
-                    id=row["id"],
-                    username=row["username"],
-                    password_hash=row["password_hash"],
-                    role=UserRole(row["role"]),
-                )
-                for row in conn.execute("SELECT * FROM users")
-            }
+    def _linhas_operacionais(self, conn: sqlite3.Connection) -> Dict[str, List[sqlite3.Row]]:
+        """Linhas necessárias para operar o PDV, sem o histórico fechado."""
+        comanda_aberta = StatusComanda.ABERTA.value
+        caixa_aberto = StatusCaixa.ABERTO.value
+        linhas = {
+            tabela: conn.execute(f"SELECT * FROM {tabela}").fetchall()
+            for tabela in ("users", "produtos", "motivos_desconto", "motivos_perda", "mesas")
+        }
+        linhas["comandas"] = conn.execute("SELECT * FROM comandas WHERE status = ?", (comanda_aberta,)).fetchall()
+        linhas["itens"] = conn.execute(
+            "SELECT * FROM itens WHERE comanda_id IN (SELECT id FROM comandas WHERE status = ?)",
+            (comanda_aberta,),
+        ).fetchall()
+        linhas["caixas"] = conn.execute("SELECT * FROM caixas WHERE status = ?", (caixa_aberto,)).fetchall()
+        linhas["movimentos_caixa"] = conn.execute(
+            "SELECT * FROM movimentos_caixa WHERE caixa_id IN (SELECT id FROM caixas WHERE status = ?)",
+            (caixa_aberto,),
+        ).fetchall()
+        abertura = min((row["data_hora_abertura"] for row in linhas["caixas"]), default=None)
+        linhas["descontos_log"] = (
+            conn.execute("SELECT * FROM descontos_log WHERE criado_em >= ?", (abertura,)).fetchall()
+            if abertura
+            else []
+        )
+        linhas["perdas_estoque"] = []
+        return linhas
 
-            self.produtos = {
-                row["codigo"]: Produto(
-                    codigo=row["codigo"],
-                    descricao=row["descricao"],
-                    preco=row["preco"],
-                    por_quilo=bool(row["por_quilo"]),
-                    estoque=row["estoque"],
-                )
-                for row in conn.execute("SELECT * FROM produtos")
-            }
-            self.motivos_desconto = [MotivoDesconto(**dict(row)) for row in conn.execute("SELECT * FROM motivos_desconto")]
-            self.motivos_perda = [MotivoPerda(**dict(row)) for row in conn.execute("SELECT * FROM motivos_perda")]
-            self.mesas = [Mesa(**dict(row)) for row in conn.execute("SELECT * FROM mesas ORDER BY numero")] or [Mesa(numero=i + 1) for i in range(20)]
-
-            self.comandas = {}
-            for row in conn.execute("SELECT * FROM comandas"):
-                itens = json.loads(row["itens"]) if row["itens"] else []
-                self.comandas[row["id"]] = Comanda(
-                    id=row["id"],
-                    mesa=row["mesa"],
-                    status=StatusComanda(row["status"]),
-                    itens=itens,
-                    desconto_total=row["desconto_total"],
-                )
-
-            self.itens = []
-            for row in conn.execute("SELECT * FROM itens"):
-                item = ItemComanda(
-                    id=row["id"],
-                    comanda_id=row["comanda_id"],
-                    produto_codigo=row["produto_codigo"],
-                    quantidade=row["quantidade"],
-                    preco_unitario=row["preco_unitario"],
-                    cancelado=bool(row["cancelado"]),
-                    desconto=row["desconto"],
-                )
-                self.itens.append(item)
-                if item.comanda_id in self.comandas:
-                    if item.id not in self.comandas[item.comanda_id].itens:
-                        self.comandas[item.comanda_id].itens.append(item.id)
-
-            self.descontos_log = [
-                DescontoLog(
-                    id=row["id"],
-                    comanda_id=row["comanda_id"],
-                    item_id=row["item_id"],
-                    motivo_id=row["motivo_id"],
-                    usuario=row["usuario"],
-                    valor=row["valor"],
-                    criado_em=self._dt(row["criado_em"]),
-                )
-                for row in conn.execute("SELECT * FROM descontos_log")
-            ]
+    # Histórico sob demanda ----------------------------------------------
+    def iterar(self, tabela: str, filtro: str = "", parametros: tuple = (), lote: int = 500) -> Iterator[Any]:
+        """Percorre ``tabela`` direto do disco, em páginas de ``lote`` linhas.
 
-            self.perdas_estoque = [
-                PerdaEstoque(
-                    id=row["id"],
-                    produto_codigo=row["produto_codigo"],
-                    quantidade=row["quantidade"],
-                    motivo_id=row["motivo_id"],
-                    usuario=row["usuario"],
-                    valor_total=row["valor_total"],
-                    criado_em=self._dt(row["criado_em"]),
-                )
-                for row in conn.execute("SELECT * FROM perdas_estoque")
-            ]
+        ``filtro`` é uma condição SQL opcional (ex.: ``"criado_em >= ?"``). A
+        paginação é feita pela chave primária, então o custo de cada página
+        não cresce com o deslocamento. As entidades devolvidas não entram nas
+        coleções em memória.
+        """
+        chave = _COLUNAS[tabela][0]
+        desserializar = _DESSERIALIZADORES[tabela]
+        condicao = f"({filtro}) AND " if filtro else ""
+        ultima = None
+        with self._connect() as conn:
+            while True:
+                if ultima is None:
+                    sql = f"SELECT * FROM {tabela} {'WHERE ' + filtro if filtro else ''} ORDER BY {chave} LIMIT ?"
+                    pagina = conn.execute(sql, (*parametros, lote)).fetchall()
+                else:
+                    sql = f"SELECT * FROM {tabela} WHERE {condicao}{chave} > ? ORDER BY {chave} LIMIT ?"
+                    pagina = conn.execute(sql, (*parametros, ultima, lote)).fetchall()
+                if not pagina:
+                    return
+                for row in pagina:
+                    yield desserializar(row)
+                ultima = pagina[-1][chave]
 
-            self.caixas = [
-                Caixa(
-                    id=row["id"],
-                    data_hora_abertura=self._dt(row["data_hora_abertura"]),
-                    usuario_abertura_id=row["usuario_abertura_id"],
-                    valor_inicial_dinheiro=row["valor_inicial_dinheiro"],
-                    status=StatusCaixa(row["status"]),
-                    data_hora_fechamento=self._dt(row["data_hora_fechamento"]),
-                    usuario_fechamento_id=row["usuario_fechamento_id"],
-                    valor_esperado_dinheiro_fechamento=row["valor_esperado_dinheiro_fechamento"],
-                    valor_contado_dinheiro_fechamento=row["valor_contado_dinheiro_fechamento"],
-                    diferenca_dinheiro=row["diferenca_dinheiro"] or 0.0,
-                )
-                for row in conn.execute("SELECT * FROM caixas")
-            ]
+    def consultar(
+        self,
+        tabela: str,
+        filtro: str = "",
+        parametros: tuple = (),
+        limite: int = 100,
+        offset: int = 0,
+        ordem: Optional[str] = None,
+    ) -> List[Any]:
+        """Retorna uma página de ``tabela`` lida do disco (ex.: para telas de histórico)."""
+        onde = f"WHERE {filtro}" if filtro else ""
+        ordem = ordem or f"{_COLUNAS[tabela][0]} DESC"
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM {tabela} {onde} ORDER BY {ordem} LIMIT ? OFFSET ?",
+                (*parametros, limite, offset),
+            ).fetchall()
+        desserializar = _DESSERIALIZADORES[tabela]
+        return [desserializar(row) for row in rows]
 
-            self.movimentos_caixa = [
-                MovimentoCaixa(
-                    id=row["id"],
-                    caixa_id=row["caixa_id"],
-                    tipo=TipoMovimento(row["tipo"]),
-                    valor=row["valor"],
-                    forma_pagamento=row["forma_pagamento"],
-                    descricao=row["descricao"],
-                    criado_em=self._dt(row["criado_em"]),
-                    usuario=row["usuario"],
-                    valor_dinheiro_impacto=row["valor_dinheiro_impacto"],
-                )
-                for row in conn.execute("SELECT * FROM movimentos_caixa")
-            ]
+    def consultar_logs(
+        self,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None,
+        acao: Optional[str] = None,
+        limite: int = 100,
+    ) -> List[LogEntry]:
+        self.aguardar_gravacao()
+        condicoes, parametros = [], []
+        if acao is not None:
+            condicoes.append("acao = ?")
+            parametros.append(acao)
+        if inicio is not None:
+            condicoes.append("criado_em >= ?")
+            parametros.append(_encode_datetime(inicio))
+        if fim is not None:
+            condicoes.append("criado_em < ?")
+            parametros.append(_encode_datetime(fim))
+        return self.consultar(
+            "logs", " AND ".join(condicoes), tuple(parametros), limite=limite, ordem="criado_em DESC, id DESC"
+        )
 
-            self.logs = [
-                LogEntry(
-                    id=row["id"],
-                    acao=row["acao"],
-                    detalhes=row["detalhes"],
-                    usuario=row["usuario"],
-                    criado_em=self._dt(row["criado_em"]),
-                )
-                for row in conn.execute("SELECT * FROM logs")
-            ]
+    def carregar_historico(self) -> None:
+        """Materializa todo o histórico em memória (desliga o modo ``lazy``).
 
-            # se não houver dados mínimos, carregar demo
-            if not self.produtos:
-                self.carregar_dados_demo()
+        Os logs continuam limitados ao buffer; use ``consultar_logs``.
+        """
+        self.aguardar_gravacao()
+        self.lazy = False
+        self._load()
 
-            # garante usuário admin padrão e salva qualquer seed inicial
-            if not self.users:
-                self._garantir_admin_padrao()
+    def _encode_datetime(self, value: Optional[datetime]) -> Optional[str]:
+        return _encode_datetime(value)
 
-            # grava o estado atual (incluindo seeds) para evitar falhas de indentação
-            self.persist()
+    def _coletar_mudancas(self) -> Optional[LoteGravacao]:
+        """Serializa o que mudou desde a última chamada.
 
-    def _encode_datetime(self, value: Optional[datetime]) -> Optional[str]:
-        return value.isoformat() if value else None
+        Entidades novas ou marcadas como alteradas viram ``INSERT OR REPLACE``
+        e remoções viram ``DELETE`` pela chave primária. Tabelas substituídas
+        por inteiro (ex.: ``db.itens = [...]``) são regravadas do zero, exceto
+        no modo ``lazy``, em que a memória não contém o histórico completo, e
+        nas tabelas de arquivo (logs), que só recebem linhas novas.
+        """
+        if not self.mudancas and self._seq == self._seq_gravado:
+            return None
+        lote = self._serializar_mudancas()
+        lote.parcial = self.lazy
+        self._seq_gravado = lote.seq
+        return lote
 
-    def persist(self) -> None:
+    def _gravar_lotes(self, lotes: List[LoteGravacao]) -> None:
+        """Grava os lotes, em ordem, em uma única transação."""
         with self._connect() as conn:
-            conn.execute("DELETE FROM metadata")
-            conn.execute("INSERT INTO metadata (chave, valor) VALUES ('seq', ?)", (self._seq,))
+            for lote in lotes:
+                conn.execute("INSERT OR REPLACE INTO metadata (chave, valor) VALUES ('seq', ?)", (lote.seq,))
+                for tabela, colunas in _COLUNAS.items():
+                    arquivo = tabela in _TABELAS_ARQUIVO
+                    completa = lote.completas.get(tabela)
+                    if completa is not None:
+                        if not lote.parcial and not arquivo:
+                            conn.execute(f"DELETE FROM {tabela}")
+                        conn.executemany(_sql_upsert(tabela), completa)
+                        continue
+                    removidas = lote.deletes.get(tabela)
+                    if removidas and not arquivo:
+                        conn.executemany(
+                            f"DELETE FROM {tabela} WHERE {colunas[0]} = ?",
+                            [(chave,) for chave in removidas],
+                        )
+                    alteradas = lote.upserts.get(tabela)
+                    if alteradas:
+                        conn.executemany(_sql_upsert(tabela), alteradas)
 
-            conn.execute("DELETE FROM users")
-            conn.executemany(
-                "INSERT INTO users (id, username, password_hash, role) VALUES (?, ?, ?, ?)",
-                [(u.id, u.username, u.password_hash, u.role.value) for u in self.users.values()],
-            )
 
-            conn.execute("DELETE FROM produtos")
-            conn.executemany(
-                "INSERT INTO produtos (codigo, descricao, preco, por_quilo, estoque) VALUES (?, ?, ?, ?, ?)",
-                [(p.codigo, p.descricao, p.preco, int(p.por_quilo), p.estoque) for p in self.produtos.values()],
-            )
+def _remover_de(indice: Dict[Any, List[Any]], chave: Any, entidade: Any) -> None:
+    grupo = indice.get(chave, [])
+    for posicao, atual in enumerate(grupo):
+        if atual is entidade:
+            del grupo[posicao]
+            break
+    if not grupo:
+        indice.pop(chave, None)
 
-            conn.execute("DELETE FROM motivos_desconto")
-            conn.executemany(
-                "INSERT INTO motivos_desconto (id, descricao) VALUES (?, ?)",
-                [(m.id, m.descricao) for m in self.motivos_desconto],
-            )
 
-            conn.execute("DELETE FROM motivos_perda")
-            conn.executemany(
-                "INSERT INTO motivos_perda (id, descricao) VALUES (?, ?)",
-                [(m.id, m.descricao) for m in self.motivos_perda],
-            )
+def _log_no_filtro(
+    log: LogEntry, inicio: Optional[datetime], fim: Optional[datetime], acao: Optional[str]
+) -> bool:
+    if acao is not None and log.acao != acao:
+        return False
+    if inicio is not None and log.criado_em < inicio:
+        return False
+    return fim is None or log.criado_em < fim
 
-            conn.execute("DELETE FROM mesas")
-            conn.executemany(
-                "INSERT INTO mesas (numero, comanda_id) VALUES (?, ?)",
-                [(m.numero, m.comanda_id) for m in self.mesas],
-            )
 
-            conn.execute("DELETE FROM comandas")
-            conn.executemany(
-                "INSERT INTO comandas (id, mesa, status, itens, desconto_total) VALUES (?, ?, ?, ?, ?)",
-                [
-                    (c.id, c.mesa, c.status.value, json.dumps(c.itens), c.desconto_total)
-                    for c in self.comandas.values()
-                ],
-            )
+def _encode_datetime(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
 
-            conn.execute("DELETE FROM itens")
-            conn.executemany(
-                """
-                INSERT INTO itens (id, comanda_id, produto_codigo, quantidade, preco_unitario, cancelado, desconto)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                [
-                    (
-                        i.id,
-                        i.comanda_id,
-                        i.produto_codigo,
-                        i.quantidade,
-                        i.preco_unitario,
-                        int(i.cancelado),
-                        i.desconto,
-                    )
-                    for i in self.itens
-                ],
-            )
 
-            conn.execute("DELETE FROM descontos_log")
-            conn.executemany(
-                "INSERT INTO descontos_log (id, comanda_id, item_id, motivo_id, usuario, valor, criado_em) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                [
-                    (
-                        d.id,
-                        d.comanda_id,
-                        d.item_id,
-                        d.motivo_id,
-                        d.usuario,
-                        d.valor,
-                        self._encode_datetime(d.criado_em),
-                    )
-                    for d in self.descontos_log
-                ],
-            )
+def _decode_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
 
-            conn.execute("DELETE FROM perdas_estoque")
-            conn.executemany(
-                "INSERT INTO perdas_estoque (id, produto_codigo, quantidade, motivo_id, usuario, valor_total, criado_em) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                [
-                    (
-                        p.id,
-                        p.produto_codigo,
-                        p.quantidade,
-                        p.motivo_id,
-                        p.usuario,
-                        p.valor_total,
-                        self._encode_datetime(p.criado_em),
-                    )
-                    for p in self.perdas_estoque
-                ],
-            )
 
-            conn.execute("DELETE FROM caixas")
-            conn.executemany(
-                """
-                INSERT INTO caixas (id, data_hora_abertura, usuario_abertura_id, valor_inicial_dinheiro, status, data_hora_fechamento,
-                usuario_fechamento_id, valor_esperado_dinheiro_fechamento, valor_contado_dinheiro_fechamento, diferenca_dinheiro)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                [
-                    (
-                        c.id,
-                        self._encode_datetime(c.data_hora_abertura),
-                        c.usuario_abertura_id,
-                        c.valor_inicial_dinheiro,
-                        c.status.value,
-                        self._encode_datetime(c.data_hora_fechamento),
-                        c.usuario_fechamento_id,
-                        c.valor_esperado_dinheiro_fechamento,
-                        c.valor_contado_dinheiro_fechamento,
-                        c.diferenca_dinheiro,
-                    )
-                    for c in self.caixas
-                ],
-            )
+# Colunas de cada tabela do ``SQLiteDB``; a primeira é sempre a chave primária.
+_COLUNAS: Dict[str, Tuple[str, ...]] = {
+    "users": ("id", "username", "password_hash", "role"),
+    "produtos": ("codigo", "descricao", "preco", "por_quilo", "estoque"),
+    "motivos_desconto": ("id", "descricao"),
+    "motivos_perda": ("id", "descricao"),
+    "mesas": ("numero", "comanda_id"),
+    "comandas": ("id", "mesa", "status", "itens", "desconto_total"),
+    "itens": (
+        "id",
+        "comanda_id",
+        "produto_codigo",
+        "quantidade",
+        "preco_unitario",
+        "cancelado",
+        "desconto",
+        "criado_em",
+    ),
+    "descontos_log": ("id", "comanda_id", "item_id", "motivo_id", "usuario", "valor", "criado_em"),
+    "perdas_estoque": ("id", "produto_codigo", "quantidade", "motivo_id", "usuario", "valor_total", "criado_em"),
+    "caixas": (
+        "id",
+        "data_hora_abertura",
+        "usuario_abertura_id",
+        "valor_inicial_dinheiro",
+        "status",
+        "data_hora_fechamento",
+        "usuario_fechamento_id",
+        "valor_esperado_dinheiro_fechamento",
+        "valor_contado_dinheiro_fechamento",
+        "diferenca_dinheiro",
+    ),
+    "movimentos_caixa": (
+        "id",
+        "caixa_id",
+        "tipo",
+        "valor",
+        "forma_pagamento",
+        "descricao",
+        "criado_em",
+        "usuario",
+        "valor_dinheiro_impacto",
+    ),
+    "logs": ("id", "acao", "detalhes", "usuario", "criado_em"),
+}
 
-            conn.execute("DELETE FROM movimentos_caixa")
-            conn.executemany(
-                """
-                INSERT INTO movimentos_caixa (id, caixa_id, tipo, valor, forma_pagamento, descricao, criado_em, usuario, valor_dinheiro_impacto)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                [
-                    (
-                        m.id,
-                        m.caixa_id,
-                        m.tipo.value,
-                        m.valor,
-                        m.forma_pagamento,
-                        m.descricao,
-                        self._encode_datetime(m.criado_em),
-                        m.usuario,
-                        m.valor_dinheiro_impacto,
-                    )
-                    for m in self.movimentos_caixa
-                ],
-            )
+_SERIALIZADORES: Dict[str, Callable[[Any], tuple]] = {
+    "users": lambda u: (u.id, u.username, u.password_hash, u.role.value),
+    "produtos": lambda p: (p.codigo, p.descricao, p.preco, int(p.por_quilo), p.estoque),
+    "motivos_desconto": lambda m: (m.id, m.descricao),
+    "motivos_perda": lambda m: (m.id, m.descricao),
+    "mesas": lambda m: (m.numero, m.comanda_id),
+    "comandas": lambda c: (c.id, c.mesa, c.status.value, json.dumps(c.itens), c.desconto_total),
+    "itens": lambda i: (
+        i.id,
+        i.comanda_id,
+        i.produto_codigo,
+        i.quantidade,
+        i.preco_unitario,
+        int(i.cancelado),
+        i.desconto,
+        _encode_datetime(i.criado_em),
+    ),
+    "descontos_log": lambda d: (
+        d.id,
+        d.comanda_id,
+        d.item_id,
+        d.motivo_id,
+        d.usuario,
+        d.valor,
+        _encode_datetime(d.criado_em),
+    ),
+    "perdas_estoque": lambda p: (
+        p.id,
+        p.produto_codigo,
+        p.quantidade,
+        p.motivo_id,
+        p.usuario,
+        p.valor_total,
+        _encode_datetime(p.criado_em),
+    ),
+    "caixas": lambda c: (
+        c.id,
+        _encode_datetime(c.data_hora_abertura),
+        c.usuario_abertura_id,
+        c.valor_inicial_dinheiro,
+        c.status.value,
+        _encode_datetime(c.data_hora_fechamento),
+        c.usuario_fechamento_id,
+        c.valor_esperado_dinheiro_fechamento,
+        c.valor_contado_dinheiro_fechamento,
+        c.diferenca_dinheiro,
+    ),
+    "movimentos_caixa": lambda m: (
+        m.id,
+        m.caixa_id,
+        m.tipo.value,
+        m.valor,
+        m.forma_pagamento,
+        m.descricao,
+        _encode_datetime(m.criado_em),
+        m.usuario,
+        m.valor_dinheiro_impacto,
+    ),
+    "logs": lambda l: (l.id, l.acao, l.detalhes, l.usuario, _encode_datetime(l.criado_em)),
+}
+
+
+_DESSERIALIZADORES: Dict[str, Callable[[Mapping[str, Any]], Any]] = {
+    "users": lambda r: User(
+        id=r["id"],
+        username=r["username"],
+        password_hash=r["password_hash"],
+        role=UserRole(r["role"]),
+    ),
+    "produtos": lambda r: Produto(
+        codigo=r["codigo"],
+        descricao=r["descricao"],
+        preco=r["preco"],
+        por_quilo=bool(r["por_quilo"]),
+        estoque=r["estoque"],
+    ),
+    "motivos_desconto": lambda r: MotivoDesconto(id=r["id"], descricao=r["descricao"]),
+    "motivos_perda": lambda r: MotivoPerda(id=r["id"], descricao=r["descricao"]),
+    "mesas": lambda r: Mesa(numero=r["numero"], comanda_id=r["comanda_id"]),
+    "comandas": lambda r: Comanda(
+        id=r["id"],
+        mesa=r["mesa"],
+        status=StatusComanda(r["status"]),
+        itens=json.loads(r["itens"]) if r["itens"] else [],
+        desconto_total=r["desconto_total"],
+    ),
+    "itens": lambda r: ItemComanda(
+        id=r["id"],
+        comanda_id=r["comanda_id"],
+        produto_codigo=r["produto_codigo"],
+        quantidade=r["quantidade"],
+        preco_unitario=r["preco_unitario"],
+        cancelado=bool(r["cancelado"]),
+        desconto=r["desconto"],
+        criado_em=_decode_datetime(r["criado_em"]),
+    ),
+    "descontos_log": lambda r: DescontoLog(
+        id=r["id"],
+        comanda_id=r["comanda_id"],
+        item_id=r["item_id"],
+        motivo_id=r["motivo_id"],
+        usuario=r["usuario"],
+        valor=r["valor"],
+        criado_em=_decode_datetime(r["criado_em"]),
+    ),
+    "perdas_estoque": lambda r: PerdaEstoque(
+        id=r["id"],
+        produto_codigo=r["produto_codigo"],
+        quantidade=r["quantidade"],
+        motivo_id=r["motivo_id"],
+        usuario=r["usuario"],
+        valor_total=r["valor_total"],
+        criado_em=_decode_datetime(r["criado_em"]),
+    ),
+    "caixas": lambda r: Caixa(
+        id=r["id"],
+        data_hora_abertura=_decode_datetime(r["data_hora_abertura"]),
+        usuario_abertura_id=r["usuario_abertura_id"],
+        valor_inicial_dinheiro=r["valor_inicial_dinheiro"],
+        status=StatusCaixa(r["status"]),
+        data_hora_fechamento=_decode_datetime(r["data_hora_fechamento"]),
+        usuario_fechamento_id=r["usuario_fechamento_id"],
+        valor_esperado_dinheiro_fechamento=r["valor_esperado_dinheiro_fechamento"],
+        valor_contado_dinheiro_fechamento=r["valor_contado_dinheiro_fechamento"],
+        diferenca_dinheiro=r["diferenca_dinheiro"] or 0.0,
+    ),
+    "movimentos_caixa": lambda r: MovimentoCaixa(
+        id=r["id"],
+        caixa_id=r["caixa_id"],
+        tipo=TipoMovimento(r["tipo"]),
+        valor=r["valor"],
+        forma_pagamento=r["forma_pagamento"],
+        descricao=r["descricao"],
+        criado_em=_decode_datetime(r["criado_em"]),
+        usuario=r["usuario"],
+        valor_dinheiro_impacto=r["valor_dinheiro_impacto"],
+    ),
+    "logs": lambda r: LogEntry(
+        id=r["id"],
+        acao=r["acao"],
+        detalhes=r["detalhes"],
+        usuario=r["usuario"],
+        criado_em=_decode_datetime(r["criado_em"]),
+    ),
+}
 
-            conn.execute("DELETE FROM logs")
-            conn.executemany(
-                "INSERT INTO logs (id, acao, detalhes, usuario, criado_em) VALUES (?, ?, ?, ?, ?)",
-                [
-                    (l.id, l.acao, l.detalhes, l.usuario, self._encode_datetime(l.criado_em))
-                    for l in self.logs
-                ],
-            )
 
+def _sql_upsert(tabela: str) -> str:
+    colunas = _COLUNAS[tabela]
+    marcadores = ", ".join("?" for _ in colunas)
+    return f"INSERT OR REPLACE INTO {tabela} ({', '.join(colunas)}) VALUES ({marcadores})"
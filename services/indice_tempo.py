@@ -0,0 +1,97 @@
+"""Índice temporal das coleções do ``MemoryDB``.
+
+Mantém as entidades agrupadas por dia e em uma lista ordenada pela data, para
+que consultas de um dia ou de um período leiam só a fatia correspondente
+(``bisect``) em vez de percorrer o histórico inteiro. Entidades chegam quase
+sempre em ordem, então a inserção costuma ser um ``append``.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+class IndiceTemporal:
+    """Entidades por dia e ordenadas por ``data_de(entidade)``.
+
+    Entidades sem data não entram no índice. A data usada na inserção fica
+    guardada, então ``remover``/``atualizar`` funcionam mesmo se o campo da
+    entidade já tiver mudado.
+    """
+
+    def __init__(self, data_de: Callable[[Any], Optional[datetime]]) -> None:
+        self._data_de = data_de
+        self._datas: List[datetime] = []
+        self._entidades: List[Any] = []
+        self._por_dia: Dict[date, List[Any]] = {}
+        self._registradas: Dict[int, datetime] = {}
+
+    def __len__(self) -> int:
+        return len(self._entidades)
+
+    def adicionar(self, entidade: Any) -> None:
+        data = self._data_de(entidade)
+        if data is None:
+            return
+        self._registradas[id(entidade)] = data
+        if not self._datas or self._datas[-1] <= data:
+            self._datas.append(data)
+            self._entidades.append(entidade)
+        else:
+            posicao = bisect_right(self._datas, data)
+            self._datas.insert(posicao, data)
+            self._entidades.insert(posicao, entidade)
+        dia = self._por_dia.setdefault(data.date(), [])
+        if not dia or self._data_de_registro(dia[-1]) <= data:
+            dia.append(entidade)
+        else:
+            datas_do_dia = [self._data_de_registro(e) for e in dia]
+            dia.insert(bisect_right(datas_do_dia, data), entidade)
+
+    def remover(self, entidade: Any) -> None:
+        data = self._registradas.pop(id(entidade), None)
+        if data is None:
+            return
+        posicao = bisect_left(self._datas, data)
+        while self._entidades[posicao] is not entidade:
+            posicao += 1
+        del self._datas[posicao]
+        del self._entidades[posicao]
+        dia = self._por_dia[data.date()]
+        del dia[next(i for i, e in enumerate(dia) if e is entidade)]
+        if not dia:
+            del self._por_dia[data.date()]
+
+    def atualizar(self, entidade: Any) -> None:
+        """Reposiciona ``entidade`` depois de uma mudança na data."""
+        if self._registradas.get(id(entidade)) != self._data_de(entidade):
+            self.remover(entidade)
+            self.adicionar(entidade)
+
+    def limpar(self) -> None:
+        self._datas.clear()
+        self._entidades.clear()
+        self._por_dia.clear()
+        self._registradas.clear()
+
+    def _data_de_registro(self, entidade: Any) -> datetime:
+        return self._registradas[id(entidade)]
+
+    def do_dia(self, dia: date) -> List[Any]:
+        """Entidades do ``dia``, em ordem de data."""
+        return list(self._por_dia.get(dia, ()))
+
+    def no_periodo(
+        self, inicio: Optional[datetime] = None, fim: Optional[datetime] = None, incluir_fim: bool = False
+    ) -> List[Any]:
+        """Entidades em ``[inicio, fim)`` (ou ``[inicio, fim]`` com ``incluir_fim``), em ordem de data."""
+        lo = bisect_left(self._datas, inicio) if inicio is not None else 0
+        if fim is None:
+            hi = len(self._datas)
+        else:
+            hi = (bisect_right if incluir_fim else bisect_left)(self._datas, fim)
+        return self._entidades[lo:hi]
+
+
+__all__ = ["IndiceTemporal"]
@@ -0,0 +1,395 @@
+"""Persistência por diário (journal) append-only com snapshots periódicos.
+
+Alternativa ao ``SQLiteDB`` com o mesmo contrato ``persist()``/``_load()``.
+Cada ``persist()`` acrescenta uma única linha JSON ao diário contendo as
+linhas alteradas desde a gravação anterior (mesmo formato de ``_COLUNAS``),
+então o custo por operação depende só do tamanho da mudança. De tempos em
+tempos o estado completo é compactado em um snapshot e o diário é zerado.
+
+Na abertura o snapshot é lido e o diário é reaplicado por cima. Uma última
+linha incompleta (queda de energia no meio da escrita) é descartada.
+
+Os logs não entram no diário nem no snapshot: cada log novo é acrescentado a
+``logs.jsonl``, um arquivo append-only que nunca é compactado. Na abertura só
+as últimas ``logs_recentes`` linhas voltam para a memória e é montado um
+índice dia -> posição da primeira linha do dia, com o qual ``consultar_logs``
+lê só o trecho do período pedido.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import zip_longest
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from models import LogEntry
+from services.database import (
+    _COLUNAS,
+    _DESSERIALIZADORES,
+    _SERIALIZADORES,
+    _TABELAS_ARQUIVO,
+    LoteGravacao,
+    MemoryDB,
+    _encode_datetime,
+    _log_no_filtro,
+)
+
+
+@dataclass
+class _LoteDiario(LoteGravacao):
+    """Lote do diário: também leva os logs novos e, às vezes, um snapshot."""
+
+    logs: List[list] = field(default_factory=list)
+    snapshot: Optional[Dict[str, Any]] = None
+
+
+class JournalDB(MemoryDB):
+    """Banco em memória persistido em ``snapshot.json`` + ``journal.jsonl``.
+
+    ``fsync_a_cada`` e ``fsync_intervalo`` controlam o agrupamento de
+    ``fsync``: o diário é sempre enviado ao sistema operacional a cada
+    ``persist()``, mas só é forçado ao disco quando um dos limites é atingido
+    (ou em ``flush()``/``close()``). ``compactar_apos`` define quantas linhas
+    o diário acumula antes de gerar um novo snapshot.
+    """
+
+    def __init__(
+        self,
+        diretorio: Optional[str | Path] = None,
+        *,
+        fsync_a_cada: int = 20,
+        fsync_intervalo: float = 1.0,
+        compactar_apos: int = 5000,
+        logs_recentes: int = 500,
+    ) -> None:
+        self.diretorio = Path(diretorio or Path("data") / "pdv-journal")
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.snapshot_path = self.diretorio / "snapshot.json"
+        self.journal_path = self.diretorio / "journal.jsonl"
+        self.logs_path = self.diretorio / "logs.jsonl"
+        self.fsync_a_cada = fsync_a_cada
+        self.fsync_intervalo = fsync_intervalo
+        self.compactar_apos = compactar_apos
+        self._arquivo = None
+        self._arquivo_logs = None
+        self._ultimo_log = 0
+        # índice de ``logs.jsonl``: dias em ordem e a posição (byte) da primeira linha de cada um
+        self._dias_logs: List[str] = []
+        self._posicoes_logs: List[int] = []
+        self._dias_em_ordem = True
+        self._tamanho_logs = 0
+        self._pendentes_fsync = 0
+        self._ultimo_fsync = time.monotonic()
+        self._registros = 0
+        # protege os arquivos quando um ``GravadorAssincrono`` escreve em outra thread
+        self._trava = threading.RLock()
+        super().__init__(logs_recentes=logs_recentes)
+        self._load()
+
+    # Carregamento -----------------------------------------------------
+    def _load(self) -> None:
+        estado: Dict[str, Dict[Any, list]] = {tabela: {} for tabela in _COLUNAS}
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, encoding="utf-8") as arquivo:
+                snapshot = json.load(arquivo)
+            self._seq = snapshot["seq"]
+            for tabela, linhas in snapshot["tabelas"].items():
+                estado[tabela] = {linha[0]: linha for linha in linhas}
+
+        self._registros = self._reaplicar_diario(estado)
+        recentes: deque = deque(maxlen=self.logs_recentes)
+        for posicao, linha in self._linhas_arquivadas(truncar=True):
+            self._indexar_log(posicao, linha)
+            recentes.append(linha)
+        if recentes:
+            self._ultimo_log = recentes[-1][0]
+            # logs gravados depois da última linha do diário
+            self._seq = max(self._seq, self._ultimo_log + 1)
+        estado["logs"] = {linha[0]: linha for linha in recentes}
+        self._restaurar(
+            {
+                # ``zip_longest``: linhas gravadas antes de uma coluna nova (ex.: itens.criado_em)
+                tabela: [dict(zip_longest(_COLUNAS[tabela], linha)) for linha in linhas.values()]
+                for tabela, linhas in estado.items()
+            }
+        )
+        self._arquivo = open(self.journal_path, "a", encoding="utf-8")
+        self._arquivo_logs = open(self.logs_path, "ab")
+        self._tamanho_logs = self._arquivo_logs.tell()
+        # grava seeds criados no carregamento (admin, mesas, demo)
+        self.persist()
+
+    def _reaplicar_diario(self, estado: Dict[str, Dict[Any, list]]) -> int:
+        """Aplica o diário sobre ``estado`` e devolve quantas linhas foram lidas.
+
+        A reaplicação é idempotente: upserts e deletes carregam a linha
+        completa ou a chave, então reaplicar um diário já incluído no snapshot
+        (queda entre gravar o snapshot e zerar o diário) gera o mesmo estado.
+        """
+        if not self.journal_path.exists():
+            return 0
+        lidos = 0
+        valido_ate = 0
+        with open(self.journal_path, "rb") as arquivo:
+            for bruto in arquivo:
+                if not bruto.endswith(b"\n"):
+                    break
+                try:
+                    registro = json.loads(bruto)
+                except ValueError:
+                    break
+                for tabela, linhas in registro.get("c", {}).items():
+                    estado[tabela] = {linha[0]: linha for linha in linhas}
+                for tabela, chaves in registro.get("d", {}).items():
+                    for chave in chaves:
+                        estado[tabela].pop(chave, None)
+                for tabela, linhas in registro.get("u", {}).items():
+                    for linha in linhas:
+                        estado[tabela][linha[0]] = linha
+                self._seq = registro["seq"]
+                valido_ate += len(bruto)
+                lidos += 1
+        if valido_ate < self.journal_path.stat().st_size:
+            # descarta a cauda corrompida para as próximas gravações
+            with open(self.journal_path, "r+b") as arquivo:
+                arquivo.truncate(valido_ate)
+        return lidos
+
+    def _linhas_arquivadas(
+        self, truncar: bool = False, desde: int = 0, ate: Optional[int] = None, contendo: Optional[bytes] = None
+    ) -> Iterator[Tuple[int, list]]:
+        """``(posição, linha)`` de ``logs.jsonl`` em ordem de gravação, entre os bytes ``desde`` e ``ate``.
+
+        Com ``contendo`` as linhas sem esse trecho são puladas sem decodificar
+        o JSON. Com ``truncar`` uma cauda incompleta é removida do arquivo,
+        para que a próxima gravação comece em uma linha nova.
+        """
+        if not self.logs_path.exists():
+            return
+        valido_ate = desde
+        with open(self.logs_path, "rb") as arquivo:
+            arquivo.seek(desde)
+            for bruto in arquivo:
+                if (ate is not None and valido_ate >= ate) or not bruto.endswith(b"\n"):
+                    break
+                posicao = valido_ate
+                valido_ate += len(bruto)
+                if contendo is not None and contendo not in bruto:
+                    continue
+                try:
+                    linha = json.loads(bruto)
+                except ValueError:
+                    valido_ate = posicao
+                    break
+                yield posicao, linha
+        if truncar and valido_ate < self.logs_path.stat().st_size:
+            with open(self.logs_path, "r+b") as arquivo:
+                arquivo.truncate(valido_ate)
+
+    def consultar_logs(
+        self,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None,
+        acao: Optional[str] = None,
+        limite: int = 100,
+    ) -> List[LogEntry]:
+        self.aguardar_gravacao()
+        de, ate = _encode_datetime(inicio), _encode_datetime(fim)
+        with self._trava:
+            if self._arquivo_logs is not None:
+                self._arquivo_logs.flush()
+            desde, limite_bytes = self._trecho_logs(de, ate)
+        # ``acao`` como aparece no JSON: descarta linhas antes de decodificar
+        contendo = None if acao is None else json.dumps(acao, ensure_ascii=False).encode("utf-8")
+        desserializar = _DESSERIALIZADORES["logs"]
+        colunas = _COLUNAS["logs"]
+        encontrados: deque = deque(maxlen=limite)
+        for _posicao, linha in self._linhas_arquivadas(desde=desde, ate=limite_bytes, contendo=contendo):
+            # filtra pela linha crua (ISO ordena como data) e só então monta o ``LogEntry``
+            criado_em = linha[4]
+            if acao is not None and linha[1] != acao:
+                continue
+            if de is not None and (criado_em is None or criado_em < de):
+                continue
+            if ate is not None and (criado_em is None or criado_em >= ate):
+                continue
+            encontrados.append(linha)
+        return [desserializar(dict(zip(colunas, linha))) for linha in reversed(encontrados)]
+
+    def _trecho_logs(self, de: Optional[str], ate: Optional[str]) -> Tuple[int, Optional[int]]:
+        """Bytes de ``logs.jsonl`` que podem ter logs em ``[de, ate)``.
+
+        Só usa o índice por dia enquanto os logs foram gravados em ordem de
+        dia; senão o arquivo inteiro é lido.
+        """
+        if not self._dias_em_ordem:
+            return 0, None
+        desde, limite_bytes = 0, None
+        if de is not None:
+            i = bisect_left(self._dias_logs, de[:10])
+            desde = self._posicoes_logs[i] if i < len(self._dias_logs) else self._tamanho_logs
+        if ate is not None:
+            i = bisect_right(self._dias_logs, ate[:10])
+            if i < len(self._dias_logs):
+                limite_bytes = self._posicoes_logs[i]
+        return desde, limite_bytes
+
+    def _indexar_log(self, posicao: int, linha: list) -> None:
+        # logs sem data nunca entram em consultas por período
+        dia = linha[4][:10] if linha[4] else None
+        if dia is None or not self._dias_em_ordem:
+            return
+        if self._dias_logs and dia < self._dias_logs[-1]:
+            # dia fora de ordem: o índice deixa de valer e as consultas leem o arquivo todo
+            self._dias_em_ordem = False
+        elif not self._dias_logs or dia != self._dias_logs[-1]:
+            self._dias_logs.append(dia)
+            self._posicoes_logs.append(posicao)
+
+    # Persistência -----------------------------------------------------
+    def _coletar_mudancas(self) -> Optional[_LoteDiario]:
+        """Serializa o que mudou; logs novos vão para ``logs.jsonl``.
+
+        Quando o diário atinge ``compactar_apos`` linhas o lote também leva o
+        estado completo, que vira o novo snapshot na gravação.
+        """
+        if not self.mudancas or self._arquivo is None:
+            return None
+        mudancas = self.mudancas
+        if "logs" in mudancas.completas:
+            candidatos = self.logs
+        else:
+            candidatos = mudancas.upserts.get("logs", {}).values()
+        novos = sorted((log for log in candidatos if log.id > self._ultimo_log), key=lambda log: log.id)
+        for tabela in _TABELAS_ARQUIVO:
+            mudancas.completas.discard(tabela)
+            mudancas.upserts.pop(tabela, None)
+            mudancas.deletes.pop(tabela, None)
+        base = self._serializar_mudancas()
+        lote = _LoteDiario(base.seq, base.completas, base.deletes, base.upserts)
+        if novos:
+            lote.logs = [_SERIALIZADORES["logs"](log) for log in novos]
+            self._ultimo_log = novos[-1].id
+        self._registros += 1
+        if self._registros >= self.compactar_apos:
+            lote.snapshot = self._estado_completo()
+            self._registros = 0
+        return lote
+
+    def _estado_completo(self) -> Dict[str, Any]:
+        return {
+            "seq": self._seq,
+            "tabelas": {
+                tabela: [_SERIALIZADORES[tabela](e) for e in self._entidades(tabela)]
+                for tabela in _COLUNAS
+                if tabela not in _TABELAS_ARQUIVO
+            },
+        }
+
+    def _gravar_lotes(self, lotes: List[_LoteDiario]) -> None:
+        """Acrescenta os lotes ao diário; o último snapshot do grupo zera o diário.
+
+        O snapshot só cobre as mudanças até o lote que o trouxe: os lotes
+        seguintes do grupo são acrescentados depois de o diário ser zerado.
+        """
+        with self._trava:
+            if self._arquivo is None:
+                return
+            com_snapshot = [i for i, lote in enumerate(lotes) if lote.snapshot is not None]
+            if com_snapshot:
+                ultimo = com_snapshot[-1]
+                self._acrescentar(lotes[: ultimo + 1])
+                self._gravar_snapshot(lotes[ultimo].snapshot)
+                lotes = lotes[ultimo + 1 :]
+            if lotes:
+                self._acrescentar(lotes)
+
+    def _acrescentar(self, lotes: List[_LoteDiario]) -> None:
+        # chamado com ``_trava``
+        linhas, logs = [], []
+        for lote in lotes:
+            registro: Dict[str, Any] = {"seq": lote.seq}
+            if lote.completas:
+                registro["c"] = lote.completas
+            if lote.deletes:
+                registro["d"] = lote.deletes
+            if lote.upserts:
+                registro["u"] = lote.upserts
+            linhas.append(json.dumps(registro, ensure_ascii=False, separators=(",", ":")) + "\n")
+            for linha in lote.logs:
+                logs.append((json.dumps(linha, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+                self._indexar_log(self._tamanho_logs, linha)
+                self._tamanho_logs += len(logs[-1])
+        if logs:
+            self._arquivo_logs.writelines(logs)
+            self._arquivo_logs.flush()
+        self._arquivo.writelines(linhas)
+        self._arquivo.flush()
+        self._pendentes_fsync += len(linhas)
+        if (
+            self._pendentes_fsync >= self.fsync_a_cada
+            or time.monotonic() - self._ultimo_fsync >= self.fsync_intervalo
+        ):
+            self._sincronizar()
+
+    def _sincronizar(self) -> None:
+        self._arquivo.flush()
+        self._arquivo_logs.flush()
+        if self._pendentes_fsync:
+            os.fsync(self._arquivo_logs.fileno())
+            os.fsync(self._arquivo.fileno())
+        self._pendentes_fsync = 0
+        self._ultimo_fsync = time.monotonic()
+
+    def _gravar_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        # chamado com ``_trava``; o diário só é zerado depois do snapshot no disco
+        self._sincronizar()
+        temporario = self.snapshot_path.with_suffix(".tmp")
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(snapshot, arquivo, ensure_ascii=False, separators=(",", ":"))
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.snapshot_path)
+        self._arquivo.close()
+        self._arquivo = open(self.journal_path, "w", encoding="utf-8")
+
+    def flush(self) -> None:
+        """Força as linhas já escritas do diário (e do arquivo de logs) para o disco."""
+        with self._trava:
+            if self._arquivo is not None:
+                self._sincronizar()
+
+    def compactar(self) -> None:
+        """Grava um snapshot do estado atual e zera o diário."""
+        self.aguardar_gravacao()
+        snapshot = self._estado_completo()
+        self._registros = 0
+        with self._trava:
+            if self._arquivo is not None:
+                self._gravar_snapshot(snapshot)
+
+    def close(self) -> None:
+        self.aguardar_gravacao()
+        with self._trava:
+            if self._arquivo is not None:
+                self._sincronizar()
+                self._arquivo.close()
+                self._arquivo_logs.close()
+                self._arquivo = None
+                self._arquivo_logs = None
+
+    def __enter__(self) -> "JournalDB":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+
+__all__ = ["JournalDB"]
@@ -1,18 +1,201 @@
-from typing import Optional
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
 
-from core.db import get_connection
+from core.db import conexao, em_transacao, expressao_fts, get_connection, get_pool, tem_busca_textual, transacao
+from services import metricas
+
+logger = logging.getLogger(__name__)
+
+# Com a gravação assíncrona (padrão) os logs fora de transação vão para um
+# buffer e são gravados em lote por uma thread de fundo. RESTAURANTE_AUDIT_ASYNC=0
+# volta ao INSERT + commit síncrono por ação.
+AUDITORIA_ASSINCRONA = os.environ.get("RESTAURANTE_AUDIT_ASYNC", "1") != "0"
+AUDITORIA_LOTE = 200
+AUDITORIA_INTERVALO = 0.5
+AUDITORIA_MAX_PENDENTES = 10_000
+AUDITORIA_TENTATIVAS = 5
+
+_SQL_INSERIR = "INSERT INTO logs(acao, usuario, detalhes, criado_em) VALUES (?, ?, ?, ?)"
+
+Linha = Tuple[Optional[str], Optional[str], str, str]
+
+
+class AuditoriaNaoGravadaError(sqlite3.OperationalError):
+    """Logs de auditoria que não puderam ser gravados; ficam em ``linhas``."""
+
+    def __init__(self, linhas: List[Tuple[Path, Linha]]) -> None:
+        super().__init__(f"{len(linhas)} logs de auditoria não gravados")
+        self.linhas = linhas
+
+
+class _BufferAuditoria:
+    """Fila limitada de logs gravada em lote por uma thread de fundo.
+
+    O lote é gravado quando acumula ``lote`` linhas ou quando a linha mais
+    antiga espera ``intervalo`` segundos. Com ``max_pendentes`` linhas na fila
+    quem registra espera a próxima gravação (contrapressão), então a memória
+    fica limitada mesmo se o disco travar.
+
+    Um lote que falha volta para o início da fila e é tentado de novo até
+    ``tentativas`` vezes, com espera crescente. Depois disso as linhas ficam
+    guardadas em ``_falhas``: ``flush()`` e ``close()`` tentam mais uma vez e
+    levantam ``AuditoriaNaoGravadaError`` se ainda não gravarem. Nenhum log
+    é descartado em silêncio.
+    """
+
+    def __init__(self, lote: int, intervalo: float, max_pendentes: int, tentativas: int = AUDITORIA_TENTATIVAS) -> None:
+        self.lote = lote
+        self.intervalo = intervalo
+        self.max_pendentes = max_pendentes
+        self.tentativas = tentativas
+        self._pendentes: List[Tuple[Path, Linha]] = []
+        self._falhas: List[Tuple[Path, Linha]] = []
+        self._tentativa = 0
+        self._gravando = 0
+        self._forcar = False
+        self._encerrado = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def adicionar(self, caminho: Path, linha: Linha) -> None:
+        with self._cond:
+            if self._encerrado:
+                # depois do encerramento (atexit) grava direto
+                falhas = self._gravar([(caminho, linha)])
+                if falhas:
+                    raise AuditoriaNaoGravadaError(falhas)
+                return
+            while len(self._pendentes) >= self.max_pendentes:
+                self._forcar = True
+                self._cond.notify_all()
+                self._cond.wait()
+            self._pendentes.append((caminho, linha))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name="auditoria", daemon=True)
+                self._thread.start()
+            if len(self._pendentes) >= self.lote:
+                self._cond.notify_all()
+
+    def flush(self) -> None:
+        """Espera até que tudo o que já foi registrado esteja no banco.
+
+        Levanta ``AuditoriaNaoGravadaError`` se sobrarem linhas que esgotaram
+        as tentativas e também falharem agora.
+        """
+        with self._cond:
+            if self._thread is None:
+                return
+            self._forcar = True
+            self._cond.notify_all()
+            while (self._pendentes or self._gravando) and self._thread.is_alive():
+                self._cond.wait(self.intervalo)
+        self._regravar_falhas()
+
+    def close(self) -> None:
+        with self._cond:
+            self._encerrado = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self._regravar_falhas()
+
+    def _regravar_falhas(self) -> None:
+        with self._cond:
+            falhas, self._falhas = self._falhas, []
+        if not falhas:
+            return
+        falhas = self._gravar(falhas)
+        if falhas:
+            with self._cond:
+                self._falhas[:0] = falhas
+            raise AuditoriaNaoGravadaError(falhas)
+
+    def _executar(self) -> None:
+        with self._cond:
+            while True:
+                while not self._pendentes and not self._encerrado:
+                    self._cond.wait()
+                prazo = time.monotonic() + self.intervalo
+                while not (self._forcar or self._encerrado or len(self._pendentes) >= self.lote):
+                    restante = prazo - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                lote, self._pendentes = self._pendentes, []
+                self._forcar = False
+                self._gravando = len(lote)
+                self._cond.notify_all()
+                self._cond.release()
+                try:
+                    falhas = self._gravar(lote)
+                finally:
+                    self._cond.acquire()
+                self._gravando = 0
+                if falhas:
+                    self._tentativa += 1
+                    if self._tentativa < self.tentativas:
+                        # volta para o início da fila, mantendo a ordem, e espera antes de tentar de novo
+                        self._pendentes[:0] = falhas
+                        self._cond.notify_all()
+                        self._cond.wait(self.intervalo * self._tentativa)
+                        continue
+                    logger.error("%d logs de auditoria não gravados após %d tentativas", len(falhas), self._tentativa)
+                    self._falhas.extend(falhas)
+                self._tentativa = 0
+                self._cond.notify_all()
+                if self._encerrado and not self._pendentes:
+                    return
+
+    @staticmethod
+    def _gravar(lote: List[Tuple[Path, Linha]]) -> List[Tuple[Path, Linha]]:
+        """Grava o lote e devolve as linhas que falharam."""
+        por_banco = {}
+        for caminho, linha in lote:
+            por_banco.setdefault(caminho, []).append(linha)
+        falhas = []
+        for caminho, linhas in por_banco.items():
+            try:
+                with conexao(caminho) as conn:
+                    conn.executemany(_SQL_INSERIR, linhas)
+                    conn.commit()
+            except Exception:  # a thread não pode morrer com logs na fila
+                logger.exception("Falha ao gravar %d logs de auditoria em %s", len(linhas), caminho)
+                falhas.extend((caminho, linha) for linha in linhas)
+        return falhas
+
+
+_buffer = _BufferAuditoria(AUDITORIA_LOTE, AUDITORIA_INTERVALO, AUDITORIA_MAX_PENDENTES)
+atexit.register(_buffer.close)
 
 
 def registrar(acao: str, usuario: Optional[str], detalhes: str) -> None:
-    conn = get_connection()
-    conn.execute(
-        "INSERT INTO logs(acao, usuario, detalhes, criado_em) VALUES (?, ?, ?, datetime('now'))",
-        (acao, usuario, detalhes),
-    )
-    conn.commit()
+    """Registra uma ação no log de auditoria.
+
+    Dentro de ``transacao()`` o log entra no mesmo commit da operação; fora
+    dela vai para o buffer e é gravado em lote, sem commit por ação.
+    """
+    criado_em = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    if not AUDITORIA_ASSINCRONA or em_transacao():
+        with transacao() as conn:
+            conn.execute(_SQL_INSERIR, (acao, usuario, detalhes, criado_em))
+        return
+    _buffer.adicionar(get_pool().path, (acao, usuario, detalhes, criado_em))
+
+
+def flush() -> None:
+    """Grava os logs ainda no buffer; levanta ``AuditoriaNaoGravadaError`` com os que falharem."""
+    _buffer.flush()
 
 
 def listar(limit: int = 100):
+    flush()
     conn = get_connection()
     cursor = conn.execute(
         "SELECT id, acao, usuario, detalhes, criado_em FROM logs ORDER BY criado_em DESC LIMIT ?",
@@ -21,4 +204,52 @@ def listar(limit: int = 100):
     return cursor.fetchall()
 
 
-__all__ = ["registrar", "listar"]
+def buscar(
+    texto: str,
+    limite: int = 100,
+    offset: int = 0,
+    usuario: Optional[str] = None,
+    inicio: Optional[str] = None,
+    fim: Optional[str] = None,
+):
+    """Busca paginada nos logs por ação e detalhes (ex.: ``"comanda 42"``).
+
+    Com FTS5 o resultado vem por relevância (BM25) e, no empate, do mais
+    recente para o mais antigo; sem FTS5 usa ``LIKE`` e só a ordem por data.
+    ``inicio``/``fim`` filtram ``criado_em`` no formato ``AAAA-MM-DD HH:MM:SS``
+    (``fim`` exclusivo).
+    """
+    flush()
+    conn = get_connection()
+    condicoes, parametros = [], []
+    if usuario is not None:
+        condicoes.append("l.usuario = ?")
+        parametros.append(usuario)
+    if inicio is not None:
+        condicoes.append("l.criado_em >= ?")
+        parametros.append(inicio)
+    if fim is not None:
+        condicoes.append("l.criado_em < ?")
+        parametros.append(fim)
+    if texto.split() and tem_busca_textual(conn):
+        origem = "logs_fts JOIN logs l ON l.id = logs_fts.rowid"
+        condicoes.insert(0, "logs_fts MATCH ?")
+        parametros.insert(0, expressao_fts(texto))
+        ordem = "bm25(logs_fts), l.criado_em DESC, l.id DESC"
+    else:
+        origem = "logs l"
+        for palavra in texto.split():
+            condicoes.append("(l.acao LIKE ? OR l.detalhes LIKE ?)")
+            parametros.extend([f"%{palavra}%"] * 2)
+        ordem = "l.criado_em DESC, l.id DESC"
+    onde = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    return conn.execute(
+        f"SELECT l.id, l.acao, l.usuario, l.detalhes, l.criado_em FROM {origem} {onde}"
+        f" ORDER BY {ordem} LIMIT ? OFFSET ?",
+        (*parametros, limite, offset),
+    ).fetchall()
+
+
+__all__ = ["AuditoriaNaoGravadaError", "registrar", "flush", "listar", "buscar"]
+
+metricas.instrumentar_modulo(globals())
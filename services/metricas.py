@@ -0,0 +1,229 @@
+"""Registro de latência das operações dos serviços.
+
+As classes de serviço (``@cronometrar_classe``) e as funções públicas dos
+módulos de serviço (``instrumentar_modulo(globals())``) são cronometradas
+automaticamente: cada chamada soma uma observação em ``registro`` com a
+duração em ms e se terminou em exceção. Por operação ficam a contagem, os
+erros, o total, o máximo e as ``JANELA`` durações mais recentes, das quais
+saem p50/p95/p99; assim os percentis mostram o comportamento atual, não a
+média desde a abertura do sistema.
+
+O registro é exportado em texto do Prometheus ou em JSON (``gravar``) e o
+``ExportadorMetricas`` regrava o arquivo periodicamente numa thread de
+fundo. ``RESTAURANTE_METRICAS=0`` desliga a instrumentação (as funções ficam
+como estão, sem custo algum).
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, MutableMapping, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+METRICAS_ATIVAS = os.environ.get("RESTAURANTE_METRICAS", "1") != "0"
+ARQUIVO = os.environ.get("RESTAURANTE_METRICAS_ARQUIVO")
+INTERVALO = float(os.environ.get("RESTAURANTE_METRICAS_INTERVALO", "60"))
+JANELA = 2048
+PERCENTIS = (50, 95, 99)
+
+F = TypeVar("F", bound=Callable[..., Any])
+C = TypeVar("C", bound=type)
+
+
+def _percentil(ordenadas: List[float], p: int) -> float:
+    if not ordenadas:
+        return 0.0
+    return ordenadas[max(0, -(-len(ordenadas) * p // 100) - 1)]
+
+
+class _Operacao:
+    __slots__ = ("quantidade", "erros", "total_ms", "max_ms", "recentes")
+
+    def __init__(self, janela: int) -> None:
+        self.quantidade = 0
+        self.erros = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recentes: deque = deque(maxlen=janela)
+
+    def observar(self, ms: float, erro: bool) -> None:
+        self.quantidade += 1
+        self.erros += erro
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        self.recentes.append(ms)
+
+
+class RegistroMetricas:
+    """Latências por operação, seguras para várias threads."""
+
+    def __init__(self, janela: int = JANELA) -> None:
+        self.janela = janela
+        self._operacoes: Dict[str, _Operacao] = {}
+        self._trava = threading.Lock()
+
+    def observar(self, operacao: str, ms: float, erro: bool = False) -> None:
+        with self._trava:
+            dados = self._operacoes.get(operacao)
+            if dados is None:
+                dados = self._operacoes[operacao] = _Operacao(self.janela)
+            dados.observar(ms, erro)
+
+    def limpar(self) -> None:
+        with self._trava:
+            self._operacoes.clear()
+
+    def resumo(self) -> Dict[str, Dict[str, float]]:
+        """``{operacao: {quantidade, erros, total_ms, max_ms, p50_ms, p95_ms, p99_ms}}``."""
+        with self._trava:
+            copia = {
+                nome: (d.quantidade, d.erros, d.total_ms, d.max_ms, list(d.recentes))
+                for nome, d in self._operacoes.items()
+            }
+        resumo = {}
+        for nome, (quantidade, erros, total_ms, max_ms, recentes) in sorted(copia.items()):
+            recentes.sort()
+            resumo[nome] = {
+                "quantidade": quantidade,
+                "erros": erros,
+                "total_ms": total_ms,
+                "max_ms": max_ms,
+                **{f"p{p}_ms": _percentil(recentes, p) for p in PERCENTIS},
+            }
+        return resumo
+
+    # Exportação -------------------------------------------------------------
+    def exportar_json(self) -> str:
+        return json.dumps({"gerado_em": time.time(), "operacoes": self.resumo()}, ensure_ascii=False, indent=2)
+
+    def exportar_prometheus(self) -> str:
+        """Texto no formato de exposição do Prometheus (durações em segundos)."""
+        resumo = self.resumo()
+        linhas = [
+            "# HELP restaurante_operacao_segundos Latência das operações dos serviços.",
+            "# TYPE restaurante_operacao_segundos summary",
+        ]
+        for nome, dados in resumo.items():
+            rotulo = nome.replace("\\", "\\\\").replace('"', '\\"')
+            for p in PERCENTIS:
+                linhas.append(
+                    f'restaurante_operacao_segundos{{operacao="{rotulo}",quantile="{p / 100}"}} '
+                    f"{dados[f'p{p}_ms'] / 1000:.6f}"
+                )
+            linhas.append(f'restaurante_operacao_segundos_sum{{operacao="{rotulo}"}} {dados["total_ms"] / 1000:.6f}')
+            linhas.append(f'restaurante_operacao_segundos_count{{operacao="{rotulo}"}} {dados["quantidade"]}')
+        linhas += [
+            "# HELP restaurante_operacao_erros_total Chamadas que terminaram em exceção.",
+            "# TYPE restaurante_operacao_erros_total counter",
+        ]
+        for nome, dados in resumo.items():
+            rotulo = nome.replace("\\", "\\\\").replace('"', '\\"')
+            linhas.append(f'restaurante_operacao_erros_total{{operacao="{rotulo}"}} {dados["erros"]}')
+        return "\n".join(linhas) + "\n"
+
+    def gravar(self, caminho: Path) -> None:
+        """Grava em JSON (sufixo ``.json``) ou texto do Prometheus, substituindo o arquivo de uma vez."""
+        caminho = Path(caminho)
+        texto = self.exportar_json() if caminho.suffix == ".json" else self.exportar_prometheus()
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        temporario = caminho.with_name(caminho.name + ".tmp")
+        temporario.write_text(texto, encoding="utf-8")
+        os.replace(temporario, caminho)
+
+
+registro = RegistroMetricas()
+
+
+# Instrumentação ----------------------------------------------------------------
+def cronometrar(operacao: str) -> Callable[[F], F]:
+    """Decorador que registra a duração de cada chamada como ``operacao``."""
+
+    def decorar(funcao: F) -> F:
+        if not METRICAS_ATIVAS or getattr(funcao, "__cronometrada__", False):
+            return funcao
+
+        @functools.wraps(funcao)
+        def cronometrada(*args: Any, **kwargs: Any) -> Any:
+            inicio = time.perf_counter()
+            try:
+                resultado = funcao(*args, **kwargs)
+            except BaseException:
+                registro.observar(operacao, (time.perf_counter() - inicio) * 1000, True)
+                raise
+            registro.observar(operacao, (time.perf_counter() - inicio) * 1000)
+            return resultado
+
+        cronometrada.__cronometrada__ = True
+        return cronometrada  # type: ignore[return-value]
+
+    return decorar
+
+
+def cronometrar_classe(cls: C) -> C:
+    """Cronometra os métodos públicos definidos na classe como ``Classe.metodo``."""
+    for nome, valor in list(vars(cls).items()):
+        if not nome.startswith("_") and inspect.isfunction(valor):
+            setattr(cls, nome, cronometrar(f"{cls.__name__}.{nome}")(valor))
+    return cls
+
+
+def instrumentar_modulo(namespace: MutableMapping[str, Any]) -> None:
+    """Cronometra as funções de ``__all__`` do módulo como ``modulo.funcao``.
+
+    Chame no fim do módulo com ``globals()``; as chamadas entre funções do
+    próprio módulo também passam a ser medidas.
+    """
+    modulo = namespace["__name__"].rsplit(".", 1)[-1]
+    for nome in namespace.get("__all__", ()):
+        valor = namespace.get(nome)
+        if inspect.isfunction(valor):
+            namespace[nome] = cronometrar(f"{modulo}.{nome}")(valor)
+
+
+class ExportadorMetricas:
+    """Regrava ``caminho`` a cada ``intervalo`` segundos numa thread de fundo."""
+
+    def __init__(
+        self, caminho: Path, intervalo: float = INTERVALO, origem: Optional[RegistroMetricas] = None
+    ) -> None:
+        self.caminho = Path(caminho)
+        self.intervalo = intervalo
+        self.origem = origem or registro
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name="exportador-metricas", daemon=True)
+        self._thread.start()
+
+    def _executar(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            self.exportar()
+
+    def exportar(self) -> None:
+        try:
+            self.origem.gravar(self.caminho)
+        except OSError:
+            logger.exception("Falha ao exportar métricas para %s", self.caminho)
+
+    def close(self) -> None:
+        """Para a thread e grava o arquivo uma última vez."""
+        self._parar.set()
+        self._thread.join()
+        self.exportar()
+
+
+__all__ = [
+    "ExportadorMetricas",
+    "RegistroMetricas",
+    "cronometrar",
+    "cronometrar_classe",
+    "instrumentar_modulo",
+    "registro",
+]
@@ -3,7 +3,7 @@ from __future__ import annotations
 
 from collections import defaultdict
 from datetime import datetime
-from typing import Dict, Iterable, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from models import (
     Caixa,
@@ -21,8 +21,19 @@ from models import (
     TipoMovimento,
 )
 from services.database import MemoryDB
+from services.metricas import cronometrar_classe
 
 
+def _no_periodo(data: Optional[datetime], inicio: Optional[datetime], fim: Optional[datetime]) -> bool:
+    """``data`` em ``[inicio, fim)``; sem filtro vale tudo, com filtro registros sem data ficam de fora."""
+    if inicio is None and fim is None:
+        return True
+    if data is None:
+        return False
+    return (inicio is None or data >= inicio) and (fim is None or data < fim)
+
+
+@cronometrar_classe
 class PdvService:
     def __init__(self, db: MemoryDB, usuario: str = "operador") -> None:
         self.db = db
@@ -38,7 +49,9 @@ class PdvService:
         comanda = Comanda(id=comanda_id, mesa=mesa_numero)
         self.db.comandas[comanda_id] = comanda
         if mesa_numero:
-            self.db.mesas[mesa_numero - 1].comanda_id = comanda_id
+            mesa = self.db.mesas[mesa_numero - 1]
+            mesa.comanda_id = comanda_id
+            self.db.marcar_alterado(mesa)
         self.db.log("abrir_comanda", f"Comanda {comanda_id} na mesa {mesa_numero}", self.usuario)
         self._persist()
         return comanda
@@ -46,14 +59,22 @@ class PdvService:
     def fechar_comanda(self, comanda_id: int) -> None:
         comanda = self.db.comandas[comanda_id]
         comanda.status = StatusComanda.FECHADA
+        self.db.marcar_alterado(comanda)
         if comanda.mesa:
-            self.db.mesas[comanda.mesa - 1].comanda_id = None
+            mesa = self.db.mesas[comanda.mesa - 1]
+            mesa.comanda_id = None
+            self.db.marcar_alterado(mesa)
         self.db.log("fechar_comanda", f"Comanda {comanda_id} fechada", self.usuario)
         self._persist()
 
     def listar_comandas(self) -> Iterable[Comanda]:
         return self.db.comandas.values()
 
+    def total_comanda(self, comanda_id: int) -> float:
+        """Total líquido da comanda, consultando apenas os itens dela."""
+        comanda = self.db.comandas[comanda_id]
+        return comanda.total_liquido(self.db.itens_da_comanda(comanda_id))
+
     # --- Itens ---
     def adicionar_item(self, comanda_id: int, produto_codigo: str, quantidade: float) -> ItemComanda:
         produto = self.db.produtos[produto_codigo]
@@ -63,9 +84,12 @@ class PdvService:
             produto_codigo=produto.codigo,
             quantidade=quantidade,
             preco_unitario=produto.preco,
+            criado_em=datetime.now(),
         )
         self.db.itens.append(item)
-        self.db.comandas[comanda_id].itens.append(item.id)
+        comanda = self.db.comandas[comanda_id]
+        comanda.itens.append(item.id)
+        self.db.marcar_alterado(comanda)
         self.db.log(
             "adicionar_item",
             f"Comanda {comanda_id} adicionou {quantidade}x {produto.descricao}",
@@ -74,22 +98,57 @@ class PdvService:
         self._persist()
         return item
 
+    def adicionar_itens(self, comanda_id: int, linhas: Iterable[Tuple[str, float]]) -> List[ItemComanda]:
+        """Lança um pedido inteiro: ``linhas`` são pares ``(produto_codigo, quantidade)``.
+
+        Todos os códigos são conferidos antes de alterar qualquer coisa, e o
+        pedido gera um único log e um único ``persist()``.
+        """
+        linhas = list(linhas)
+        comanda = self.db.comandas[comanda_id]
+        produtos = [self.db.produtos[codigo] for codigo, _quantidade in linhas]
+        if not linhas:
+            return []
+        agora = datetime.now()
+        itens = [
+            ItemComanda(
+                id=self.db.next_id(),
+                comanda_id=comanda_id,
+                produto_codigo=produto.codigo,
+                quantidade=quantidade,
+                preco_unitario=produto.preco,
+                criado_em=agora,
+            )
+            for produto, (_codigo, quantidade) in zip(produtos, linhas)
+        ]
+        self.db.itens.extend(itens)
+        comanda.itens.extend(item.id for item in itens)
+        self.db.marcar_alterado(comanda)
+        resumo = ", ".join(f"{item.quantidade}x {produto.descricao}" for item, produto in zip(itens, produtos))
+        self.db.log("adicionar_itens", f"Comanda {comanda_id} adicionou {resumo}", self.usuario)
+        self._persist()
+        return itens
+
     def cancelar_item(self, item_id: int, motivo: str) -> None:
-        for item in self.db.itens:
-            if item.id == item_id:
-                item.cancelado = True
-                produto = self.db.produtos.get(item.produto_codigo)
-                nome = produto.descricao if produto else "(produto desconhecido)"
-                self.db.log("cancelar_item", f"Item {nome} cancelado: {motivo}", self.usuario)
-                self._persist()
-                break
+        item = self.db.item_por_id(item_id)
+        if item is None:
+            return
+        item.cancelado = True
+        self.db.marcar_alterado(item)
+        produto = self.db.produtos.get(item.produto_codigo)
+        nome = produto.descricao if produto else "(produto desconhecido)"
+        self.db.log("cancelar_item", f"Item {nome} cancelado: {motivo}", self.usuario)
+        self._persist()
 
     # --- Descontos ---
     def aplicar_desconto_item(self, comanda_id: int, item_id: int, valor: float, motivo_id: int) -> None:
-        item = next(i for i in self.db.itens if i.id == item_id)
+        item = self.db.item_por_id(item_id)
+        if item is None:
+            raise KeyError(item_id)
         produto = self.db.produtos.get(item.produto_codigo)
         nome = produto.descricao if produto else "(produto desconhecido)"
         item.desconto += valor
+        self.db.marcar_alterado(item)
         log = DescontoLog(
             id=self.db.next_id(),
             comanda_id=comanda_id,
@@ -106,6 +165,7 @@ class PdvService:
     def aplicar_desconto_comanda(self, comanda_id: int, valor: float, motivo_id: int) -> None:
         comanda = self.db.comandas[comanda_id]
         comanda.desconto_total += valor
+        self.db.marcar_alterado(comanda)
         log = DescontoLog(
             id=self.db.next_id(),
             comanda_id=comanda_id,
@@ -129,6 +189,7 @@ class PdvService:
     ) -> float:
         produto = self.db.produtos[produto_codigo]
         produto.estoque = max(0.0, produto.estoque - quantidade)
+        self.db.marcar_alterado(produto)
         valor_total = valor_total if valor_total is not None else quantidade * produto.preco
         perda = PerdaEstoque(
             id=self.db.next_id(),
@@ -231,30 +292,40 @@ class PdvService:
         return mov
 
     def fechar_caixa(self, caixa_id: int, contagem_final: float) -> Caixa:
-        caixa = next(c for c in self.db.caixas if c.id == caixa_id)
+        caixa = self.db.caixa_por_id(caixa_id)
+        if caixa is None:
+            raise KeyError(caixa_id)
         caixa.usuario_fechamento_id = self.usuario
         caixa.data_hora_fechamento = datetime.now()
         caixa.valor_contado_dinheiro_fechamento = contagem_final
-        saldo_movimentos = sum(m.valor_dinheiro_impacto for m in self.db.movimentos_caixa if m.caixa_id == caixa_id)
+        saldo_movimentos = self.db.totais_caixa(caixa_id).impacto_dinheiro
         esperado = caixa.valor_inicial_dinheiro + saldo_movimentos
         caixa.valor_esperado_dinheiro_fechamento = esperado
         caixa.diferenca_dinheiro = contagem_final - esperado
         caixa.status = StatusCaixa.FECHADO
+        self.db.marcar_alterado(caixa)
         self.db.log("fechar_caixa", f"Caixa {caixa_id} fechado", self.usuario)
         self._persist()
         return caixa
 
     # --- Relatórios ---
-    def relatorio_vendas(self) -> dict:
+    def relatorio_vendas(self, inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> dict:
+        """Totais de vendas; ``inicio``/``fim`` filtram pela data do item/movimento (``fim`` exclusivo).
+
+        Com ``db.ativar_analitico()`` as somas vêm do armazém colunar, com o
+        mesmo resultado.
+        """
+        if self.db.analitico is not None:
+            return self.db.analitico.relatorio_vendas(inicio, fim)
         total_bruto = 0.0
         total_descontos = 0.0
         por_forma = defaultdict(float)
         por_produto = defaultdict(float)
         for mov in self.db.movimentos_caixa:
-            if mov.tipo == TipoMovimento.VENDA:
+            if mov.tipo == TipoMovimento.VENDA and _no_periodo(mov.criado_em, inicio, fim):
                 por_forma[mov.forma_pagamento or ""] += mov.valor
         for item in self.db.itens:
-            if item.cancelado:
+            if item.cancelado or not _no_periodo(item.criado_em, inicio, fim):
                 continue
             total_bruto += item.total_bruto
             total_descontos += item.desconto
@@ -267,19 +338,27 @@ class PdvService:
             "por_produto": dict(por_produto),
         }
 
-    def relatorio_descontos(self) -> dict:
+    def relatorio_descontos(self, inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> dict:
+        if self.db.analitico is not None:
+            return self.db.analitico.relatorio_descontos(inicio, fim)
         por_motivo = defaultdict(float)
         por_usuario = defaultdict(float)
         for log in self.db.descontos_log:
+            if not _no_periodo(log.criado_em, inicio, fim):
+                continue
             por_motivo[log.motivo_id] += log.valor
             por_usuario[log.usuario] += log.valor
         return {"por_motivo": dict(por_motivo), "por_usuario": dict(por_usuario)}
 
-    def relatorio_perdas(self) -> dict:
+    def relatorio_perdas(self, inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> dict:
+        if self.db.analitico is not None:
+            return self.db.analitico.relatorio_perdas(inicio, fim)
         por_produto = defaultdict(float)
         por_motivo = defaultdict(float)
         total = 0.0
         for perda in self.db.perdas_estoque:
+            if not _no_periodo(perda.criado_em, inicio, fim):
+                continue
             por_produto[perda.produto_codigo] += perda.valor_total
             por_motivo[perda.motivo_id] += perda.valor_total
             total += perda.valor_total
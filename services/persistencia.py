@@ -0,0 +1,199 @@
+"""Gravação em segundo plano para os bancos do PDV.
+
+``GravadorAssincrono`` tira a escrita em disco da thread da interface: o
+``persist()`` do banco só serializa as mudanças (rápido, na thread que as fez)
+e entrega o lote a uma thread gravadora, que escreve os lotes acumulados em
+ordem e de uma vez. Cada envio devolve um ``Future`` resolvido quando o lote
+está gravado.
+
+Com um ``widget`` Tk os callbacks de conclusão rodam na thread da interface,
+entregues via ``after()``; sem widget rodam na própria thread gravadora.
+``flush()`` espera tudo o que já foi enviado e ``close()`` deve ser chamado no
+fechamento da janela, para que nada fique na fila.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from services.database import LoteGravacao, MemoryDB
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[Future], None]
+
+_FIM = object()
+
+
+class GravadorAssincrono:
+    """Thread gravadora com fila para um ``MemoryDB`` persistente.
+
+    Ao ser criado o gravador se associa ao banco (``db.gravador``), então
+    qualquer ``persist()`` passa a ser assíncrono. Com ``widget`` os envios
+    devem partir da thread do Tk (como todo acesso ao Tk): é ela que agenda o
+    ``after()`` que recolhe os callbacks enquanto houver lotes em andamento.
+
+    Uma falha de gravação fica no ``Future`` do lote, é repassada a
+    ``ao_falhar`` e volta a ser lançada no próximo ``flush()``.
+    """
+
+    def __init__(
+        self,
+        db: MemoryDB,
+        widget: Any = None,
+        ao_falhar: Optional[Callable[[BaseException], None]] = None,
+        intervalo_ms: int = 50,
+    ) -> None:
+        self.db = db
+        self.widget = widget
+        self.ao_falhar = ao_falhar
+        self.intervalo_ms = intervalo_ms
+        self._fila: "queue.Queue[Any]" = queue.Queue()
+        self._entregas: "queue.Queue[Tuple[Callable[..., None], tuple]]" = queue.Queue()
+        self._trava = threading.Lock()
+        self._ultimo: Optional[Future] = None
+        self._em_andamento = 0
+        self._erro: Optional[BaseException] = None
+        self._recolhendo = False
+        self._fechado = False
+        self._thread = threading.Thread(target=self._executar, name="gravador-pdv", daemon=True)
+        self._thread.start()
+        db.gravador = self
+
+    # Envio ------------------------------------------------------------
+    def enviar(self, ao_concluir: Optional[Callback] = None) -> Future:
+        """Persiste as mudanças atuais do banco sem bloquear.
+
+        ``ao_concluir`` recebe o ``Future`` quando o lote estiver gravado (ou
+        tiver falhado). Sem mudanças pendentes o ``Future`` é concluído junto
+        com os lotes já enviados.
+        """
+        return self._enfileirar(self.db._coletar_mudancas(), ao_concluir)
+
+    def enviar_lote(self, lote: LoteGravacao, ao_concluir: Optional[Callback] = None) -> Future:
+        """Enfileira um lote já serializado (usado por ``MemoryDB.persist``)."""
+        return self._enfileirar(lote, ao_concluir)
+
+    def _enfileirar(self, lote: Optional[LoteGravacao], ao_concluir: Optional[Callback]) -> Future:
+        futuro: Future = Future()
+        with self._trava:
+            if self._fechado:
+                raise RuntimeError("gravador encerrado")
+            self._ultimo = futuro
+            self._em_andamento += 1
+            self._fila.put((lote, futuro, ao_concluir))
+        self._recolher()
+        return futuro
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Espera a gravação de tudo o que já foi enviado.
+
+        Lança a primeira falha ocorrida desde o ``flush()`` anterior.
+        """
+        with self._trava:
+            ultimo = self._ultimo
+        if ultimo is not None:
+            # a falha, se houver, sai de ``_erro`` logo abaixo
+            ultimo.exception(timeout)
+        erro, self._erro = self._erro, None
+        if erro is not None:
+            raise erro
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Grava o que falta no banco, entrega os callbacks e encerra a thread."""
+        if self._fechado:
+            return
+        try:
+            self.db.persist()
+        finally:
+            with self._trava:
+                self._fechado = True
+                self._fila.put(_FIM)
+            self._thread.join(timeout)
+            if self.db.gravador is self:
+                self.db.gravador = None
+            self._entregar()
+        erro, self._erro = self._erro, None
+        if erro is not None:
+            raise erro
+
+    # Thread gravadora -------------------------------------------------
+    def _executar(self) -> None:
+        while True:
+            pedidos = [self._fila.get()]
+            # junta o que mais estiver na fila em uma única escrita
+            while True:
+                try:
+                    pedidos.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            encerrar = _FIM in pedidos
+            pedidos = [pedido for pedido in pedidos if pedido is not _FIM]
+            lotes: List[LoteGravacao] = [lote for lote, _futuro, _cb in pedidos if lote is not None]
+            erro: Optional[BaseException] = None
+            if lotes:
+                try:
+                    self.db._gravar_lotes(lotes)
+                except Exception as exc:  # a thread continua atendendo a fila
+                    logger.exception("Falha ao gravar %d lotes do PDV", len(lotes))
+                    erro = exc
+            if erro is not None:
+                if self._erro is None:
+                    self._erro = erro
+                if self.ao_falhar is not None:
+                    self._despachar(self.ao_falhar, erro)
+            for _lote, futuro, ao_concluir in pedidos:
+                if erro is not None:
+                    futuro.set_exception(erro)
+                else:
+                    futuro.set_result(None)
+                if ao_concluir is not None:
+                    self._despachar(ao_concluir, futuro)
+            with self._trava:
+                self._em_andamento -= len(pedidos)
+            if encerrar:
+                return
+
+    # Callbacks --------------------------------------------------------
+    def _despachar(self, callback: Callable[..., None], *args: Any) -> None:
+        if self.widget is None:
+            self._chamar(callback, args)
+        else:
+            self._entregas.put((callback, args))
+
+    def _recolher(self) -> None:
+        """Agenda a coleta dos callbacks na thread do Tk, se ainda não agendada."""
+        if self.widget is None or self._recolhendo:
+            return
+        self._recolhendo = True
+        self.widget.after(self.intervalo_ms, self._recolher_periodicamente)
+
+    def _recolher_periodicamente(self) -> None:
+        self._entregar()
+        with self._trava:
+            continuar = self._em_andamento > 0 and not self._fechado
+        if continuar or not self._entregas.empty():
+            self.widget.after(self.intervalo_ms, self._recolher_periodicamente)
+        else:
+            self._recolhendo = False
+
+    def _entregar(self) -> None:
+        while True:
+            try:
+                callback, args = self._entregas.get_nowait()
+            except queue.Empty:
+                return
+            self._chamar(callback, args)
+
+    @staticmethod
+    def _chamar(callback: Callable[..., None], args: tuple) -> None:
+        try:
+            callback(*args)
+        except Exception:
+            logger.exception("Falha no callback de gravação")
+
+
+__all__ = ["GravadorAssincrono"]
@@ -1,8 +1,129 @@
-from typing import Optional
+import sqlite3
+import threading
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
 
-from core.db import get_connection
+from core.db import expressao_fts, get_connection, get_pool, tem_busca_textual, transacao
 from models.enums import CategoriaProduto
-from services import logging_service
+from services import logging_service, metricas
+from services.busca import IndiceBusca, normalizar
+
+# Índice de busca por banco: (pool, versão de ``produtos_versao``, índice),
+# compartilhado pelas threads. Os triggers da migração 2 incrementam a versão
+# a cada inclusão, exclusão ou mudança de nome/categoria/ativo, venha de qualquer
+# conexão ou processo. Cada conexão anota ainda, em tabelas TEMP (só dela e
+# desfeitas junto com um rollback), quais produtos ela mesma alterou desde
+# que viu o índice em dia. Em cada busca:
+#  - versão igual à do índice: usa o índice como está;
+#  - diferença toda feita pela própria conexão: dentro de uma transação as
+#    linhas alteradas são buscadas por cima do índice, sem tocá-lo; fora dela
+#    (já gravadas) são aplicadas no índice;
+#  - mudanças de outras conexões: o índice é remontado e guardado, a menos
+#    que a transação aberta tenha alterações próprias ainda não gravadas.
+_indices: Dict[str, Tuple[object, int, IndiceBusca]] = {}
+_trava = threading.RLock()
+
+_ALTERACOES_DA_CONEXAO = (
+    "CREATE TEMP TABLE IF NOT EXISTS produtos_indice_base (versao INTEGER NOT NULL, alteracoes INTEGER NOT NULL)",
+    "CREATE TEMP TABLE IF NOT EXISTS produtos_alterados (id INTEGER PRIMARY KEY)",
+    # -1: ainda não sabe desde quando anota; a primeira busca em dia acerta a base
+    "INSERT INTO produtos_indice_base (versao, alteracoes) SELECT -1, 0"
+    " WHERE NOT EXISTS (SELECT 1 FROM produtos_indice_base)",
+    """CREATE TEMP TRIGGER IF NOT EXISTS produtos_alterados_ai AFTER INSERT ON main.produtos BEGIN
+        INSERT OR IGNORE INTO produtos_alterados (id) VALUES (new.id);
+        UPDATE produtos_indice_base SET alteracoes = alteracoes + 1;
+    END""",
+    """CREATE TEMP TRIGGER IF NOT EXISTS produtos_alterados_ad AFTER DELETE ON main.produtos BEGIN
+        INSERT OR IGNORE INTO produtos_alterados (id) VALUES (old.id);
+        UPDATE produtos_indice_base SET alteracoes = alteracoes + 1;
+    END""",
+    """CREATE TEMP TRIGGER IF NOT EXISTS produtos_alterados_au AFTER UPDATE OF id, nome, categoria, ativo ON main.produtos BEGIN
+        INSERT OR IGNORE INTO produtos_alterados (id) VALUES (old.id);
+        INSERT OR IGNORE INTO produtos_alterados (id) VALUES (new.id);
+        UPDATE produtos_indice_base SET alteracoes = alteracoes + 1;
+    END""",
+)
+_SQL_ESTADO = (
+    "SELECT v.versao, b.versao, b.alteracoes FROM main.produtos_versao v, temp.produtos_indice_base b"
+)
+
+
+def _estado(conn) -> Tuple[int, int, int]:
+    """(versão vista pela conexão, versão base das anotações, alterações anotadas)."""
+    try:
+        return tuple(conn.execute(_SQL_ESTADO).fetchone())
+    except sqlite3.OperationalError:
+        # primeira busca nesta conexão, ou as tabelas TEMP sumiram num rollback
+        em_transacao = conn.in_transaction
+        for comando in _ALTERACOES_DA_CONEXAO:
+            conn.execute(comando)
+        if not em_transacao:
+            conn.commit()
+        return tuple(conn.execute(_SQL_ESTADO).fetchone())
+
+
+def _marcar_base(conn, versao: int) -> None:
+    """Passa a anotar as alterações da conexão a partir de ``versao``."""
+    em_transacao = conn.in_transaction
+    conn.execute("DELETE FROM temp.produtos_alterados")
+    conn.execute("UPDATE temp.produtos_indice_base SET versao = ?, alteracoes = 0", (versao,))
+    if not em_transacao:
+        conn.commit()
+
+
+def _montar(conn) -> IndiceBusca:
+    indice = IndiceBusca()
+    for produto in conn.execute("SELECT id, nome FROM produtos WHERE ativo = 1"):
+        indice.adicionar(produto["id"], str(produto["id"]), produto["nome"], normalizar(produto["nome"]))
+    return indice
+
+
+def _ativos(conn, ids: Iterable[int]):
+    ids = list(ids)
+    for inicio in range(0, len(ids), 500):
+        lote = ids[inicio : inicio + 500]
+        marcadores = ",".join("?" * len(lote))
+        yield from conn.execute(
+            f"SELECT id, nome, categoria, preco, preco_por_kg FROM produtos WHERE id IN ({marcadores}) AND ativo = 1",
+            lote,
+        )
+
+
+def _indice(conn) -> Tuple[IndiceBusca, FrozenSet[int]]:
+    """Índice em cache e os ids alterados pela transação aberta, a buscar por cima dele.
+
+    Chamado com ``_trava``.
+    """
+    versao, base, alteracoes = _estado(conn)
+    pool = get_pool()
+    entrada = _indices.get(str(pool.path))
+    indice, versao_indice = (entrada[2], entrada[1]) if entrada is not None and entrada[0] is pool else (None, None)
+    if indice is not None and versao == versao_indice:
+        pass
+    elif indice is not None and base == versao_indice and versao - base == alteracoes:
+        alterados = frozenset(linha[0] for linha in conn.execute("SELECT id FROM temp.produtos_alterados"))
+        if conn.in_transaction:
+            return indice, alterados
+        # alterações da própria conexão, já gravadas: entram no índice compartilhado
+        for produto_id in alterados:
+            indice.remover(produto_id)
+        for produto in _ativos(conn, alterados):
+            indice.adicionar(produto["id"], str(produto["id"]), produto["nome"], normalizar(produto["nome"]))
+        _indices[str(pool.path)] = (pool, versao, indice)
+    elif not conn.in_transaction or (alteracoes == 0 and base >= 0):
+        # sem alterações próprias desde a base, a conexão enxerga só o que já foi gravado
+        indice = _montar(conn)
+        _indices[str(pool.path)] = (pool, versao, indice)
+    else:
+        return _montar(conn), frozenset()
+    if (base, alteracoes) != (versao, 0):
+        _marcar_base(conn, versao)
+    return indice, frozenset()
+
+
+def recarregar_indice_busca() -> None:
+    """Descarta o índice de busca do banco atual; o próximo uso o reconstrói."""
+    with _trava:
+        _indices.pop(str(get_pool().path), None)
 
 
 def criar_produto(
@@ -12,21 +133,19 @@ def criar_produto(
     preco_por_kg: Optional[float],
     usuario: str,
 ) -> int:
-    conn = get_connection()
-    cursor = conn.execute(
-        "INSERT INTO produtos(nome, categoria, preco, preco_por_kg) VALUES (?, ?, ?, ?)",
-        (nome, categoria.value, preco, preco_por_kg),
-    )
-    conn.commit()
-    logging_service.registrar("CRIAR_PRODUTO", usuario, f"Produto {nome} criado na categoria {categoria.value}")
+    with transacao() as conn:
+        cursor = conn.execute(
+            "INSERT INTO produtos(nome, categoria, preco, preco_por_kg) VALUES (?, ?, ?, ?)",
+            (nome, categoria.value, preco, preco_por_kg),
+        )
+        logging_service.registrar("CRIAR_PRODUTO", usuario, f"Produto {nome} criado na categoria {categoria.value}")
     return cursor.lastrowid
 
 
 def atualizar_preco(produto_id: int, preco: float, usuario: str) -> None:
-    conn = get_connection()
-    conn.execute("UPDATE produtos SET preco = ? WHERE id = ?", (preco, produto_id))
-    conn.commit()
-    logging_service.registrar("ATUALIZAR_PRODUTO", usuario, f"Preco do produto {produto_id} atualizado")
+    with transacao() as conn:
+        conn.execute("UPDATE produtos SET preco = ? WHERE id = ?", (preco, produto_id))
+        logging_service.registrar("ATUALIZAR_PRODUTO", usuario, f"Preco do produto {produto_id} atualizado")
 
 
 def obter(produto_id: int):
@@ -37,26 +156,99 @@ def obter(produto_id: int):
     ).fetchone()
 
 
-def buscar_por_nome(texto: str):
+def buscar_por_nome(texto: str, limite: Optional[int] = None):
+    """Produtos ativos cujo nome (ou id) contém as palavras de ``texto``, sem acentos.
+
+    O índice só aponta candidatos em ordem de relevância; as linhas vêm do
+    banco e são conferidas de novo com ``texto``, então produtos desativados,
+    renomeados ou desfeitos por rollback não aparecem.
+    """
     conn = get_connection()
-    termo = f"%{texto}%"
+    with _trava:
+        indice, alterados = _indice(conn)
+        if alterados:
+            sobreposto = IndiceBusca()
+            for produto in _ativos(conn, alterados):
+                sobreposto.adicionar(produto["id"], str(produto["id"]), produto["nome"], normalizar(produto["nome"]))
+            ids = indice.buscar(texto, limite, sobreposto, alterados)
+        else:
+            ids = indice.buscar(texto, limite)
+    if not ids:
+        return []
+    palavras = normalizar(texto).split()
+    linhas = {}
+    for linha in _ativos(conn, ids):
+        conteudo = f"{linha['id']} {' '.join(normalizar(linha['nome']).split())}"
+        if all(palavra in conteudo for palavra in palavras):
+            linhas[linha["id"]] = linha
+    return [linhas[produto_id] for produto_id in ids if produto_id in linhas]
+
+
+def _buscar_sem_fts(conn, texto: str, limite: int, offset: int):
+    por_nome = buscar_por_nome(texto, limite + offset)
+    if len(por_nome) >= limite + offset:
+        return por_nome[offset:]
+    # o índice só cobre o nome e já trouxe todos os acertos; completa pela categoria
+    condicoes, parametros = ["ativo = 1"], []
+    if por_nome:
+        condicoes.append(f"id NOT IN ({','.join('?' * len(por_nome))})")
+        parametros.extend(produto["id"] for produto in por_nome)
+    for palavra in texto.split():
+        condicoes.append("(nome LIKE ? OR REPLACE(categoria, '_', ' ') LIKE ?)")
+        parametros.extend([f"%{palavra}%"] * 2)
+    pulados = max(0, len(por_nome) - offset)
+    parametros.extend([limite - pulados, max(0, offset - len(por_nome))])
+    return por_nome[offset:] + conn.execute(
+        f"SELECT id, nome, categoria, preco, preco_por_kg FROM produtos WHERE {' AND '.join(condicoes)}"
+        " ORDER BY nome COLLATE NOCASE LIMIT ? OFFSET ?",
+        parametros,
+    ).fetchall()
+
+
+def buscar(texto: str, limite: int = 20, offset: int = 0):
+    """Busca paginada de produtos ativos por nome ou categoria, por relevância.
+
+    Usa a tabela FTS5 ``produtos_fts`` quando disponível (ranking BM25, nome
+    pesando mais que a categoria); caso contrário vêm primeiro os acertos do
+    índice em memória de ``buscar_por_nome`` e depois, por nome, os produtos
+    em que as palavras aparecem no nome ou na categoria.
+    """
+    conn = get_connection()
+    if not texto.strip():
+        return conn.execute(
+            "SELECT id, nome, categoria, preco, preco_por_kg FROM produtos WHERE ativo = 1"
+            " ORDER BY nome COLLATE NOCASE LIMIT ? OFFSET ?",
+            (limite, offset),
+        ).fetchall()
+    if not tem_busca_textual(conn):
+        return _buscar_sem_fts(conn, texto, limite, offset)
     return conn.execute(
-        "SELECT id, nome, categoria, preco, preco_por_kg FROM produtos WHERE nome LIKE ? AND ativo = 1",
-        (termo,),
+        """
+        SELECT p.id, p.nome, p.categoria, p.preco, p.preco_por_kg
+        FROM produtos_fts
+        JOIN produtos p ON p.id = produtos_fts.rowid
+        WHERE produtos_fts MATCH ? AND p.ativo = 1
+        ORDER BY bm25(produtos_fts, 10.0, 1.0), p.nome COLLATE NOCASE
+        LIMIT ? OFFSET ?
+        """,
+        (expressao_fts(texto), limite, offset),
     ).fetchall()
 
 
 def desativar(produto_id: int, usuario: str) -> None:
-    conn = get_connection()
-    conn.execute("UPDATE produtos SET ativo = 0 WHERE id = ?", (produto_id,))
-    conn.commit()
-    logging_service.registrar("DESATIVAR_PRODUTO", usuario, f"Produto {produto_id} desativado")
+    with transacao() as conn:
+        conn.execute("UPDATE produtos SET ativo = 0 WHERE id = ?", (produto_id,))
+        logging_service.registrar("DESATIVAR_PRODUTO", usuario, f"Produto {produto_id} desativado")
 
 
 __all__ = [
     "criar_produto",
     "atualizar_preco",
     "obter",
+    "buscar",
     "buscar_por_nome",
+    "recarregar_indice_busca",
     "desativar",
 ]
+
+metricas.instrumentar_modulo(globals())
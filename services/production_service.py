@@ -1,8 +1,8 @@
-from typing import Optional
+from typing import Dict, Iterable, Optional, Tuple
 
-from core.db import get_connection
+from core.db import get_connection, transacao
 from models.enums import UnidadeProducao
-from services import logging_service
+from services import logging_service, metricas
 
 
 def criar_lote(
@@ -12,52 +12,83 @@ def criar_lote(
     estimativa_pratos: Optional[int],
     usuario: str,
 ) -> int:
-    conn = get_connection()
-    cursor = conn.execute(
-        "INSERT INTO lotes_producao(produto_id, quantidade, unidade, estimativa_pratos) VALUES (?, ?, ?, ?)",
-        (produto_id, quantidade, unidade.value, estimativa_pratos),
-    )
-    conn.commit()
-    logging_service.registrar(
-        "CRIAR_LOTE",
-        usuario,
-        f"Lote criado para produto {produto_id} quantidade {quantidade}{unidade.value}",
-    )
+    with transacao() as conn:
+        cursor = conn.execute(
+            "INSERT INTO lotes_producao(produto_id, quantidade, unidade, estimativa_pratos) VALUES (?, ?, ?, ?)",
+            (produto_id, quantidade, unidade.value, estimativa_pratos),
+        )
+        logging_service.registrar(
+            "CRIAR_LOTE",
+            usuario,
+            f"Lote criado para produto {produto_id} quantidade {quantidade}{unidade.value}",
+        )
     return cursor.lastrowid
 
 
-def _obter_lotes_abertos(produto_id: int):
-    conn = get_connection()
-    return conn.execute(
-        "SELECT * FROM lotes_producao WHERE produto_id = ? ORDER BY criado_em ASC",
-        (produto_id,),
-    ).fetchall()
+# coluna de consumo por unidade; o nome entra no SQL, então só estes valores
+_COLUNA_CONSUMO = {
+    UnidadeProducao.PORCAO: "consumido_porcoes",
+    UnidadeProducao.KG: "consumido_kg",
+}
 
 
-def registrar_consumo_venda(produto_id: int, quantidade: float, unidade: UnidadeProducao) -> None:
-    """Decrementa o estoque do lote mais antigo."""
-    conn = get_connection()
-    lotes = _obter_lotes_abertos(produto_id)
+def _baixar_lotes(conn, produto_id: int, quantidade: float, unidade: UnidadeProducao) -> float:
+    """Consome ``quantidade`` dos lotes abertos em ordem FIFO; devolve o que faltou.
+
+    O saldo acumulado é calculado pelo SQLite (função de janela sobre o índice
+    parcial ``idx_lotes_abertos``) e só os lotes necessários para cobrir a
+    quantidade são lidos, então o custo não cresce com o histórico de lotes já
+    consumidos. As baixas saem em um único ``executemany``.
+    """
+    if quantidade <= 0:
+        return 0.0
+    coluna = _COLUNA_CONSUMO[unidade]
+    lotes = conn.execute(
+        f"""
+        SELECT id, disponivel, acumulado FROM (
+            SELECT id, quantidade - {coluna} AS disponivel,
+                   SUM(quantidade - {coluna}) OVER (ORDER BY criado_em ASC, id ASC) AS acumulado
+            FROM lotes_producao
+            WHERE produto_id = ? AND consumido_porcoes < quantidade AND consumido_kg < quantidade
+        )
+        WHERE acumulado - disponivel < ?
+        ORDER BY acumulado
+        """,
+        (produto_id, quantidade),
+    ).fetchall()
+    baixas = []
     restante = quantidade
     for lote in lotes:
-        if unidade == UnidadeProducao.PORCAO:
-            disponivel = lote["quantidade"] - lote["consumido_porcoes"]
-            uso = min(disponivel, restante)
-            conn.execute(
-                "UPDATE lotes_producao SET consumido_porcoes = consumido_porcoes + ? WHERE id = ?",
-                (uso, lote["id"]),
-            )
-        else:
-            disponivel = lote["quantidade"] - lote["consumido_kg"]
-            uso = min(disponivel, restante)
-            conn.execute(
-                "UPDATE lotes_producao SET consumido_kg = consumido_kg + ? WHERE id = ?",
-                (uso, lote["id"]),
-            )
+        uso = min(lote["disponivel"], restante)
+        baixas.append((uso, lote["id"]))
         restante -= uso
-        if restante <= 0:
-            break
-    conn.commit()
+    conn.executemany(f"UPDATE lotes_producao SET {coluna} = {coluna} + ? WHERE id = ?", baixas)
+    return max(restante, 0.0)
+
+
+def registrar_consumo_venda(produto_id: int, quantidade: float, unidade: UnidadeProducao) -> None:
+    """Decrementa o estoque do lote mais antigo.
+
+    Participa da transação em andamento (ex.: ``comanda_service.adicionar_item``).
+    """
+    with transacao() as conn:
+        _baixar_lotes(conn, produto_id, quantidade, unidade)
+
+
+def registrar_consumo_vendas(linhas: Iterable[Tuple[int, float, UnidadeProducao]]) -> None:
+    """Versão em lote de ``registrar_consumo_venda``.
+
+    Recebe tuplas ``(produto_id, quantidade, unidade)``; linhas do mesmo
+    produto e unidade são somadas antes da baixa, e tudo é gravado em uma
+    única transação.
+    """
+    agregado: Dict[Tuple[int, UnidadeProducao], float] = {}
+    for produto_id, quantidade, unidade in linhas:
+        chave = (produto_id, unidade)
+        agregado[chave] = agregado.get(chave, 0.0) + quantidade
+    with transacao() as conn:
+        for (produto_id, unidade), quantidade in agregado.items():
+            _baixar_lotes(conn, produto_id, quantidade, unidade)
 
 
 def registrar_perda(
@@ -68,13 +99,12 @@ def registrar_perda(
     usuario: str,
     lote_id: Optional[int] = None,
 ) -> int:
-    conn = get_connection()
-    cursor = conn.execute(
-        "INSERT INTO perdas_estoque(lote_id, produto_id, quantidade, unidade, motivo, registrado_por) VALUES (?, ?, ?, ?, ?, ?)",
-        (lote_id, produto_id, quantidade, unidade.value, motivo, usuario),
-    )
-    conn.commit()
-    logging_service.registrar("PERDA", usuario, f"Perda registrada produto {produto_id} motivo {motivo}")
+    with transacao() as conn:
+        cursor = conn.execute(
+            "INSERT INTO perdas_estoque(lote_id, produto_id, quantidade, unidade, motivo, registrado_por) VALUES (?, ?, ?, ?, ?, ?)",
+            (lote_id, produto_id, quantidade, unidade.value, motivo, usuario),
+        )
+        logging_service.registrar("PERDA", usuario, f"Perda registrada produto {produto_id} motivo {motivo}")
     return cursor.lastrowid
 
 
@@ -96,6 +126,9 @@ def relatorio_resumo():
 __all__ = [
     "criar_lote",
     "registrar_consumo_venda",
+    "registrar_consumo_vendas",
     "registrar_perda",
     "relatorio_resumo",
 ]
+
+metricas.instrumentar_modulo(globals())
@@ -0,0 +1,200 @@
+"""Coleções monitoradas usadas pelo ``MemoryDB``.
+
+As listas e dicionários do banco em memória avisam o dono (normalmente o
+``MemoryDB``) sempre que uma entidade entra ou sai da coleção. Com isso a
+persistência consegue gravar apenas o que mudou desde o último ``persist()``
+em vez de reescrever todas as tabelas.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Set
+
+
+class ChangeSet:
+    """Entidades criadas/alteradas e chaves removidas desde a última gravação.
+
+    ``upserts`` guarda a própria entidade (e não uma cópia), então alterações
+    feitas depois de marcada continuam sendo gravadas com o valor mais recente.
+    ``completas`` indica tabelas substituídas por inteiro, que precisam ser
+    regravadas do zero.
+    """
+
+    def __init__(self) -> None:
+        self.upserts: Dict[str, Dict[Any, Any]] = {}
+        self.deletes: Dict[str, Set[Any]] = {}
+        self.completas: Set[str] = set()
+
+    def upsert(self, tabela: str, chave: Any, entidade: Any) -> None:
+        self.upserts.setdefault(tabela, {})[chave] = entidade
+        removidas = self.deletes.get(tabela)
+        if removidas:
+            removidas.discard(chave)
+
+    def delete(self, tabela: str, chave: Any) -> None:
+        pendentes = self.upserts.get(tabela)
+        if pendentes:
+            pendentes.pop(chave, None)
+        self.deletes.setdefault(tabela, set()).add(chave)
+
+    def completa(self, tabela: str) -> None:
+        self.completas.add(tabela)
+        self.upserts.pop(tabela, None)
+        self.deletes.pop(tabela, None)
+
+    def clear(self) -> None:
+        self.upserts.clear()
+        self.deletes.clear()
+        self.completas.clear()
+
+    def __bool__(self) -> bool:
+        return bool(self.completas or any(self.upserts.values()) or any(self.deletes.values()))
+
+
+class TrackedList(list):
+    """Lista que notifica o dono sobre entidades inseridas e removidas.
+
+    Reordenações (``sort``/``reverse``) não alteram o conteúdo e por isso não
+    geram notificações.
+    """
+
+    def __init__(self, iterable: Iterable[Any] = (), *, owner: Any, tabela: str) -> None:
+        super().__init__(iterable)
+        self._owner = owner
+        self._tabela = tabela
+
+    def _inserida(self, entidade: Any) -> None:
+        self._owner._entidade_inserida(self._tabela, entidade)
+
+    def _removida(self, entidade: Any) -> None:
+        self._owner._entidade_removida(self._tabela, entidade)
+
+    def append(self, entidade: Any) -> None:
+        super().append(entidade)
+        self._inserida(entidade)
+
+    def extend(self, entidades: Iterable[Any]) -> None:
+        novas = list(entidades)
+        super().extend(novas)
+        for entidade in novas:
+            self._inserida(entidade)
+
+    def __iadd__(self, entidades: Iterable[Any]) -> "TrackedList":
+        self.extend(entidades)
+        return self
+
+    def insert(self, indice: int, entidade: Any) -> None:
+        super().insert(indice, entidade)
+        self._inserida(entidade)
+
+    def __setitem__(self, indice, valor) -> None:
+        if isinstance(indice, slice):
+            antigas = self[indice]
+            novas = list(valor)
+            super().__setitem__(indice, novas)
+        else:
+            antigas = [self[indice]]
+            novas = [valor]
+            super().__setitem__(indice, valor)
+        for entidade in antigas:
+            self._removida(entidade)
+        for entidade in novas:
+            self._inserida(entidade)
+
+    def __delitem__(self, indice) -> None:
+        antigas = self[indice] if isinstance(indice, slice) else [self[indice]]
+        super().__delitem__(indice)
+        for entidade in antigas:
+            self._removida(entidade)
+
+    def pop(self, indice: int = -1) -> Any:
+        entidade = super().pop(indice)
+        self._removida(entidade)
+        return entidade
+
+    def remove(self, entidade: Any) -> None:
+        super().remove(entidade)
+        self._removida(entidade)
+
+    def clear(self) -> None:
+        antigas = list(self)
+        super().clear()
+        for entidade in antigas:
+            self._removida(entidade)
+
+
+class TrackedRing(TrackedList):
+    """Lista monitorada com capacidade máxima (buffer circular).
+
+    Ao passar de ``maxlen`` as entradas mais antigas saem da memória sem
+    aviso de remoção: elas continuam no disco (ou pendentes no ``ChangeSet``,
+    que guarda a referência), que passa a servir de arquivo.
+    """
+
+    def __init__(self, iterable: Iterable[Any] = (), *, owner: Any, tabela: str, maxlen: int) -> None:
+        entidades = list(iterable)
+        if len(entidades) > maxlen:
+            entidades = entidades[len(entidades) - maxlen :]
+        super().__init__(entidades, owner=owner, tabela=tabela)
+        self.maxlen = maxlen
+
+    def _inserida(self, entidade: Any) -> None:
+        super()._inserida(entidade)
+        excedente = len(self) - self.maxlen
+        if excedente > 0:
+            list.__delitem__(self, slice(0, excedente))
+
+
+_AUSENTE = object()
+
+
+class TrackedDict(dict):
+    """Dicionário que notifica o dono sobre valores inseridos e removidos."""
+
+    def __init__(self, dados: Any = (), *, owner: Any, tabela: str) -> None:
+        super().__init__(dados)
+        self._owner = owner
+        self._tabela = tabela
+
+    def __setitem__(self, chave: Any, valor: Any) -> None:
+        antigo = self.get(chave, _AUSENTE)
+        super().__setitem__(chave, valor)
+        if antigo is not _AUSENTE and antigo is not valor:
+            self._owner._entidade_removida(self._tabela, antigo)
+        self._owner._entidade_inserida(self._tabela, valor)
+
+    def __delitem__(self, chave: Any) -> None:
+        antigo = self[chave]
+        super().__delitem__(chave)
+        self._owner._entidade_removida(self._tabela, antigo)
+
+    def pop(self, chave: Any, *padrao: Any) -> Any:
+        if chave not in self:
+            if padrao:
+                return padrao[0]
+            raise KeyError(chave)
+        valor = super().pop(chave)
+        self._owner._entidade_removida(self._tabela, valor)
+        return valor
+
+    def popitem(self) -> tuple:
+        chave, valor = super().popitem()
+        self._owner._entidade_removida(self._tabela, valor)
+        return chave, valor
+
+    def setdefault(self, chave: Any, padrao: Any = None) -> Any:
+        if chave not in self:
+            self[chave] = padrao
+        return self[chave]
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for chave, valor in dict(*args, **kwargs).items():
+            self[chave] = valor
+
+    def clear(self) -> None:
+        antigos = list(self.values())
+        super().clear()
+        for valor in antigos:
+            self._owner._entidade_removida(self._tabela, valor)
+
+
+__all__ = ["ChangeSet", "TrackedDict", "TrackedList", "TrackedRing"]
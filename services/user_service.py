@@ -5,6 +5,7 @@ from core.db import get_connection
 from models.entities import User
 from models.enums import UserRole
 from services.auth_service import verify_password
+from services.metricas import cronometrar_classe
 
 
 
@@ -30,6 +31,7 @@ class Usuario:
 from models.enums import UserRole
 from services.auth_service import verify_password
 
+@cronometrar_classe
 class UserService:
     def __init__(self, db):
         self.db = db
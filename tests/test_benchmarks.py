@@ -0,0 +1,257 @@
+"""Micro-benchmarks dos caminhos quentes dos serviços, nos dois backends.
+
+Não rodam por padrão. Informe os tamanhos de histórico desejados::
+
+    RESTAURANTE_BENCH_TAMANHOS=1000,100000,1000000 pytest tests/test_benchmarks.py -q
+
+Cada caso é medido ``RESTAURANTE_BENCH_REPETICOES`` vezes (padrão 50; a
+abertura do ``SQLiteDB`` usa um décimo disso) sobre um banco já populado com o
+histórico do tamanho pedido. O resultado de cada execução é acrescentado a
+``RESTAURANTE_BENCH_SAIDA`` (padrão ``bench_resultados.json``), então o mesmo
+arquivo guarda as curvas de escala e permite comparar versões.
+"""
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from core import db
+from models import (
+    Caixa,
+    Comanda,
+    DescontoLog,
+    ItemComanda,
+    LogEntry,
+    MovimentoCaixa,
+    StatusCaixa,
+    StatusComanda,
+    TipoMovimento,
+)
+from models.enums import UnidadeProducao
+from services import comanda_service, production_service
+from services.caixa_service import CaixaService
+from services.database import _SERIALIZADORES, SQLiteDB, _sql_upsert
+from services.pdv_service import PdvService
+from tools.bench_indices import popular
+
+TAMANHOS = [int(t) for t in os.environ.get("RESTAURANTE_BENCH_TAMANHOS", "").replace(" ", "").split(",") if t]
+REPETICOES = int(os.environ.get("RESTAURANTE_BENCH_REPETICOES", "50"))
+SAIDA = Path(os.environ.get("RESTAURANTE_BENCH_SAIDA", "bench_resultados.json"))
+
+pytestmark = pytest.mark.skipif(not TAMANHOS, reason="defina RESTAURANTE_BENCH_TAMANHOS para rodar os benchmarks")
+
+INICIO_HISTORICO = datetime(2024, 1, 1, 8)
+_resultados = []
+
+
+@pytest.fixture(scope="module", autouse=True)
+def gravar_resultados():
+    yield
+    if not _resultados:
+        return
+    execucoes = json.loads(SAIDA.read_text(encoding="utf-8"))["execucoes"] if SAIDA.exists() else []
+    execucoes.append(
+        {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "perfil": db.DB_PROFILE,
+            "resultados": list(_resultados),
+        }
+    )
+    SAIDA.write_text(json.dumps({"execucoes": execucoes}, ensure_ascii=False, indent=2), encoding="utf-8")
+    _resultados.clear()
+
+
+def medir(caso: str, tamanho: int, funcao, preparar=None, repeticoes: int = REPETICOES) -> None:
+    """Cronometra ``funcao(*preparar())``; o preparo fica fora da medição."""
+    tempos = []
+    for _ in range(repeticoes):
+        argumentos = preparar() if preparar else ()
+        inicio = time.perf_counter()
+        funcao(*argumentos)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    _resultados.append(
+        {
+            "caso": caso,
+            "tamanho": tamanho,
+            "repeticoes": repeticoes,
+            "mediana_ms": statistics.median(tempos),
+            "min_ms": min(tempos),
+            "media_ms": statistics.fmean(tempos),
+            "p95_ms": sorted(tempos)[max(0, int(len(tempos) * 0.95) - 1)],
+        }
+    )
+
+
+# PDV (``SQLiteDB``) -----------------------------------------------------------
+def _popular_pdv(caminho: Path, tamanho: int) -> None:
+    """Grava ``tamanho`` itens e movimentos (mais comandas, caixas, descontos e logs) no arquivo."""
+    base = SQLiteDB(caminho)
+    codigos = list(base.produtos)
+    seq = base.next_id()
+    del base
+    rnd = random.Random(42)
+    itens_por_comanda = 8
+    comandas = max(1, tamanho // itens_por_comanda)
+    caixas = max(1, tamanho // 1000)
+
+    def ids(quantidade):
+        nonlocal seq
+        inicio, seq = seq, seq + quantidade
+        return range(inicio, seq)
+
+    ids_comandas = ids(comandas)
+    ids_itens = ids(tamanho)
+    ids_caixas = ids(caixas)
+
+    def quando(minutos):
+        return INICIO_HISTORICO + timedelta(minutes=minutos)
+
+    tabelas = {
+        "comandas": (
+            Comanda(
+                id=cid,
+                mesa=None,
+                status=StatusComanda.FECHADA,
+                itens=list(ids_itens[n * itens_por_comanda : (n + 1) * itens_por_comanda]),
+            )
+            for n, cid in enumerate(ids_comandas)
+        ),
+        "itens": (
+            ItemComanda(
+                id=iid,
+                comanda_id=ids_comandas[min(n // itens_por_comanda, comandas - 1)],
+                produto_codigo=rnd.choice(codigos),
+                quantidade=1,
+                preco_unitario=10.0,
+                criado_em=quando(n),
+            )
+            for n, iid in enumerate(ids_itens)
+        ),
+        "caixas": (
+            Caixa(
+                id=cid,
+                data_hora_abertura=quando(n * 1000),
+                usuario_abertura_id="bench",
+                valor_inicial_dinheiro=100.0,
+                status=StatusCaixa.FECHADO,
+                data_hora_fechamento=quando(n * 1000 + 999),
+            )
+            for n, cid in enumerate(ids_caixas)
+        ),
+        "movimentos_caixa": (
+            MovimentoCaixa(
+                id=mid,
+                caixa_id=ids_caixas[min(n // 1000, caixas - 1)],
+                tipo=TipoMovimento.VENDA_DINHEIRO,
+                valor=10.0,
+                forma_pagamento="dinheiro",
+                descricao="Venda",
+                criado_em=quando(n),
+                usuario="bench",
+                valor_dinheiro_impacto=10.0,
+            )
+            for n, mid in enumerate(ids(tamanho))
+        ),
+        "descontos_log": (
+            DescontoLog(
+                id=did,
+                comanda_id=ids_comandas[0],
+                item_id=None,
+                motivo_id=1,
+                usuario="bench",
+                valor=1.0,
+                criado_em=quando(n * 10),
+            )
+            for n, did in enumerate(ids(max(1, tamanho // 10)))
+        ),
+        "logs": (
+            LogEntry(id=lid, acao="adicionar_item", detalhes=f"item {n}", usuario="bench", criado_em=quando(n))
+            for n, lid in enumerate(ids(tamanho))
+        ),
+    }
+    with sqlite3.connect(caminho) as conn:
+        for tabela, entidades in tabelas.items():
+            conn.executemany(_sql_upsert(tabela), map(_SERIALIZADORES[tabela], entidades))
+        conn.execute("INSERT OR REPLACE INTO metadata (chave, valor) VALUES ('seq', ?)", (seq,))
+
+
+@pytest.fixture(scope="module", params=TAMANHOS or [0])
+def pdv(request, tmp_path_factory):
+    caminho = tmp_path_factory.mktemp("pdv") / "pdv.sqlite"
+    _popular_pdv(caminho, request.param)
+    return request.param, caminho, SQLiteDB(caminho)
+
+
+def test_bench_sqlite_load(pdv):
+    tamanho, caminho, _db = pdv
+    medir("SQLiteDB._load", tamanho, lambda: SQLiteDB(caminho), repeticoes=max(1, REPETICOES // 10))
+
+
+def test_bench_pdv_operacoes(pdv):
+    tamanho, _caminho, banco = pdv
+    service = PdvService(banco, usuario="bench")
+    caixa_service = CaixaService(banco, usuario="bench")
+    comanda = service.abrir_comanda(1)
+
+    medir("PdvService.adicionar_item", tamanho, lambda: service.adicionar_item(comanda.id, "001", 1))
+    medir("PdvService.fechar_comanda", tamanho, service.fechar_comanda, lambda: (service.abrir_comanda(2).id,))
+
+    if banco.caixa_aberto() is None:
+        caixa_service.abrir_caixa(100)
+    medir("CaixaService.registrar_venda", tamanho, lambda: caixa_service.registrar_venda(10.0, "DINHEIRO", 20.0))
+    historico = banco.caixas[len(banco.caixas) // 2]
+    medir("CaixaService._resumo_caixa", tamanho, lambda: caixa_service.resumo_fechamento(historico.id))
+
+    def alterar_um_item():
+        item = banco.itens[len(banco.itens) // 2]
+        item.desconto += 0.01
+        banco.marcar_alterado(item)
+        return ()
+
+    medir("SQLiteDB.persist", tamanho, banco.persist, alterar_um_item)
+
+
+# Núcleo (``core.db``) -------------------------------------------------------------
+@pytest.fixture(scope="module", params=TAMANHOS or [0])
+def nucleo(request, tmp_path_factory):
+    caminho = tmp_path_factory.mktemp("nucleo") / "restaurante.db"
+    anterior = db.DB_PATH
+    db.DB_PATH = caminho
+    db.init_db(caminho)
+    popular(db.get_connection(caminho), request.param, seed=42)
+    yield request.param
+    db.close_pool(caminho)
+    db.DB_PATH = anterior
+
+
+def test_bench_nucleo_operacoes(nucleo):
+    tamanho = nucleo
+    conn = db.get_connection()
+    produto = conn.execute("SELECT produto_id FROM lotes_producao WHERE consumido_porcoes < quantidade").fetchone()
+    produto_id = produto[0] if produto else 1
+    production_service.criar_lote(produto_id, REPETICOES * 4, UnidadeProducao.PORCAO, None, "bench")
+    comanda = comanda_service.abrir_comanda(1, "bench")
+    historica = max(1, tamanho // 20)
+
+    medir(
+        "comanda_service.adicionar_item",
+        tamanho,
+        lambda: comanda_service.adicionar_item(comanda, produto_id, quantidade=1, usuario="bench"),
+    )
+    medir("comanda_service.totalizar", tamanho, lambda: comanda_service.totalizar(historica))
+    medir(
+        "production_service.registrar_consumo_venda",
+        tamanho,
+        lambda: production_service.registrar_consumo_venda(produto_id, 1, UnidadeProducao.PORCAO),
+    )
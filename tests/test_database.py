@@ -0,0 +1,406 @@
+from datetime import date, datetime
+
+import pytest
+
+from models import Caixa, DescontoLog, LogEntry, MovimentoCaixa, Produto, StatusCaixa, TipoMovimento
+from services.caixa_service import CaixaService
+from services.database import MemoryDB, SQLiteDB
+from services.journal import JournalDB
+from services.pdv_service import PdvService
+from services.persistencia import GravadorAssincrono
+
+
+def test_persist_incremental_grava_apenas_mudancas(tmp_path):
+    db = SQLiteDB(tmp_path / "pdv.sqlite")
+    service = PdvService(db)
+    comanda = service.abrir_comanda(1)
+    assert not db.mudancas
+
+    item = service.adicionar_item(comanda.id, "001", 2)
+    # a gravação já ocorreu; nada pendente
+    assert not db.mudancas
+
+    statements = []
+    conn_original = db._connect
+
+    def connect_rastreado():
+        conn = conn_original()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    db._connect = connect_rastreado
+    service.cancelar_item(item.id, "erro")
+    escritas = [s for s in statements if s.startswith(("INSERT", "DELETE"))]
+    # metadata + item alterado + log novo
+    assert len(escritas) == 3
+    assert not any(s.startswith("DELETE") for s in escritas)
+
+
+def test_persist_incremental_recarrega_estado(tmp_path):
+    caminho = tmp_path / "pdv.sqlite"
+    db = SQLiteDB(caminho)
+    service = PdvService(db)
+    comanda = service.abrir_comanda(3)
+    item = service.adicionar_item(comanda.id, "002", 1)
+    service.aplicar_desconto_item(comanda.id, item.id, 1.5, db.motivos_desconto[0].id)
+    service.fechar_comanda(comanda.id)
+    db.produtos.pop("003")
+    db.persist()
+
+    recarregado = SQLiteDB(caminho)
+    assert recarregado.comandas[comanda.id].status == db.comandas[comanda.id].status
+    assert recarregado.comandas[comanda.id].itens == [item.id]
+    assert recarregado.mesas[2].comanda_id is None
+    assert next(i for i in recarregado.itens if i.id == item.id).desconto == 1.5
+    assert "003" not in recarregado.produtos
+    assert len(recarregado.logs) == len(db.logs)
+    assert recarregado.next_id() == db.next_id()
+
+
+def test_journal_reaplica_diario_e_snapshot(tmp_path):
+    db = JournalDB(tmp_path, compactar_apos=3)
+    service = PdvService(db)
+    comanda = service.abrir_comanda(2)
+    item = service.adicionar_item(comanda.id, "001", 3)
+    service.cancelar_item(item.id, "engano")
+    service.aplicar_desconto_comanda(comanda.id, 2.0, db.motivos_desconto[0].id)
+    db.close()
+    assert db.snapshot_path.exists()
+
+    # simula queda no meio da escrita da última linha do diário
+    with open(db.journal_path, "a", encoding="utf-8") as arquivo:
+        arquivo.write('{"seq": 999, "u": {"logs": [[')
+
+    recarregado = JournalDB(tmp_path)
+    assert recarregado.comandas[comanda.id].desconto_total == 2.0
+    assert recarregado.mesas[1].comanda_id == comanda.id
+    assert next(i for i in recarregado.itens if i.id == item.id).cancelado
+    assert len(recarregado.logs) == len(db.logs)
+    assert recarregado.next_id() == db.next_id()
+    recarregado.close()
+
+
+def test_journal_snapshot_no_meio_do_grupo_nao_apaga_lotes_seguintes(tmp_path):
+    db = JournalDB(tmp_path)
+    db.produtos["A1"] = Produto(codigo="A1", descricao="Primeiro", preco=1.0)
+    primeiro = db._coletar_mudancas()
+    primeiro.snapshot = db._estado_completo()
+    db.produtos["B2"] = Produto(codigo="B2", descricao="Segundo", preco=2.0)
+    segundo = db._coletar_mudancas()
+    # o gravador assíncrono junta os lotes da fila em uma única chamada
+    db._gravar_lotes([primeiro, segundo])
+    db.close()
+
+    recarregado = JournalDB(tmp_path)
+    assert {"A1", "B2"} <= set(recarregado.produtos)
+    recarregado.close()
+
+
+def test_lazy_carrega_apenas_estado_operacional(tmp_path):
+    caminho = tmp_path / "pdv.sqlite"
+    db = SQLiteDB(caminho)
+    service = PdvService(db)
+    fechada = service.abrir_comanda(1)
+    item_fechado = service.adicionar_item(fechada.id, "001", 1)
+    service.fechar_comanda(fechada.id)
+    aberta = service.abrir_comanda(2)
+    item_aberto = service.adicionar_item(aberta.id, "002", 2)
+
+    lazy = SQLiteDB(caminho, lazy=True, logs_recentes=2)
+    assert list(lazy.comandas) == [aberta.id]
+    assert [i.id for i in lazy.itens] == [item_aberto.id]
+    assert len(lazy.logs) == 2
+
+    historico = list(lazy.iterar("itens", "comanda_id = ?", (fechada.id,), lote=1))
+    assert [i.id for i in historico] == [item_fechado.id]
+    assert len(list(lazy.iterar("logs", lote=2))) == len(db.logs)
+
+    # gravações no modo lazy não apagam o histórico do disco
+    PdvService(lazy).adicionar_item(aberta.id, "003", 1)
+    lazy.carregar_historico()
+    assert fechada.id in lazy.comandas
+    assert {item_fechado.id, item_aberto.id} <= {i.id for i in lazy.itens}
+
+
+def test_indices_acompanham_insercoes_e_remocoes():
+    db = MemoryDB()
+    db.carregar_dados_demo()
+    service = PdvService(db)
+    comanda = service.abrir_comanda(1)
+    item = service.adicionar_item(comanda.id, "001", 1)
+    caixa = service.abrir_caixa(50)
+    mov = service.suprimento(caixa.id, 10, "troco")
+
+    assert db.item_por_id(item.id) is item
+    assert db.itens_da_comanda(comanda.id) == [item]
+    assert db.caixa_por_id(caixa.id) is caixa
+    assert db.movimentos_do_caixa(caixa.id) == [mov]
+
+    db.itens.remove(item)
+    assert db.item_por_id(item.id) is None
+    assert db.itens_da_comanda(comanda.id) == []
+
+    db.movimentos_caixa = []
+    assert db.movimentos_do_caixa(caixa.id) == []
+    assert service.fechar_caixa(caixa.id, 50).diferenca_dinheiro == 0
+
+
+def test_total_comanda_considera_apenas_itens_da_comanda():
+    db = MemoryDB()
+    db.carregar_dados_demo()
+    service = PdvService(db)
+    comanda = service.abrir_comanda(1)
+    outra = service.abrir_comanda(2)
+    service.adicionar_item(comanda.id, "001", 2)
+    cancelado = service.adicionar_item(comanda.id, "003", 1)
+    service.adicionar_item(outra.id, "002", 4)
+    service.cancelar_item(cancelado.id, "erro")
+    service.aplicar_desconto_comanda(comanda.id, 1.0, db.motivos_desconto[0].id)
+
+    assert service.total_comanda(comanda.id) == 9.0
+    assert comanda.total_liquido(db.itens) == service.total_comanda(comanda.id)
+
+
+def test_resumo_caixa_usa_totais_mantidos_por_movimento():
+    db = MemoryDB()
+    caixa_service = CaixaService(db)
+    caixa = caixa_service.abrir_caixa(100)
+    caixa_service.registrar_suprimento(20)
+    caixa_service.registrar_sangria(30)
+    caixa_service.registrar_venda(50, "DINHEIRO", 60)
+    caixa_service.registrar_venda(25, "PIX")
+    PdvService(db).sangria(caixa.id, 5, "troco")
+
+    assert caixa_service.calcular_saldo_dinheiro(caixa.id) == 135
+    caixa_service.fechar_caixa(140)
+    resumo = caixa_service.resumo_fechamento(caixa.id)
+    assert resumo["pagamentos"] == {"DINHEIRO": 50, "DEBITO": 0.0, "CREDITO": 0.0, "PIX": 25}
+    assert (resumo["suprimentos"], resumo["sangrias"]) == (20, 35)
+    assert (resumo["total_movimentos_positivos"], resumo["total_movimentos_negativos"]) == (70, -35)
+    assert resumo["diferenca"] == 5
+
+
+def test_indice_temporal_de_movimentos_descontos_e_fechamentos():
+    db = MemoryDB()
+    caixa_service = CaixaService(db)
+    dias = [datetime(2024, 5, d, 9) for d in (3, 1, 2)]
+    antigo = Caixa(
+        id=db.next_id(),
+        data_hora_abertura=datetime(2024, 4, 30, 8),
+        usuario_abertura_id="ana",
+        valor_inicial_dinheiro=0,
+        status=StatusCaixa.FECHADO,
+        data_hora_fechamento=dias[1],
+    )
+    db.caixas.append(antigo)
+    for i, dia in enumerate(dias):
+        # fora de ordem de propósito
+        db.movimentos_caixa.append(
+            MovimentoCaixa(
+                id=db.next_id(),
+                caixa_id=antigo.id,
+                tipo=TipoMovimento.SUPRIMENTO,
+                valor=10 + i,
+                forma_pagamento=None,
+                descricao="",
+                criado_em=dia,
+                usuario="ana",
+            )
+        )
+        db.descontos_log.append(
+            DescontoLog(
+                id=db.next_id(), comanda_id=1, item_id=None, motivo_id=1, usuario="ana", valor=1 + i, criado_em=dia
+            )
+        )
+
+    do_dia = caixa_service.movimentos_do_dia(date(2024, 5, 2))
+    assert [m.valor for m in do_dia["movimentos"]] == [12]
+    assert [d.valor for d in db.descontos_no_periodo(datetime(2024, 5, 1, 9), datetime(2024, 5, 2, 9))] == [2, 3]
+    assert caixa_service.resumo_fechamento(antigo.id)["descontos"] == 2
+    assert [r["caixa_id"] for r in caixa_service.fechamentos_por_data(date(2024, 5, 1))] == [antigo.id]
+
+    atual = caixa_service.abrir_caixa(50)
+    assert caixa_service.fechamentos_por_data(date.today()) == []
+    caixa_service.fechar_caixa(50)
+    assert [r["caixa_id"] for r in caixa_service.fechamentos_por_data(date.today())] == [atual.id]
+
+    db.movimentos_caixa.pop(0)
+    assert caixa_service.movimentos_do_dia(date(2024, 5, 3))["movimentos"] == []
+
+
+def test_logs_em_buffer_circular_com_arquivo_consultavel(tmp_path):
+    for db in (SQLiteDB(tmp_path / "pdv.sqlite", logs_recentes=5), JournalDB(tmp_path / "diario", logs_recentes=5)):
+        for i in range(12):
+            acao = "VENDA" if i % 2 else "ABERTURA"
+            db.logs.append(LogEntry(db.next_id(), acao, f"evento {i}", "admin", datetime(2024, 1, 1, 12, i)))
+            db.persist()
+        assert [log.detalhes for log in db.logs] == [f"evento {i}" for i in range(7, 12)]
+
+        vendas = db.consultar_logs(acao="VENDA", limite=3)
+        assert [log.detalhes for log in vendas] == ["evento 11", "evento 9", "evento 7"]
+        periodo = db.consultar_logs(inicio=datetime(2024, 1, 1, 12, 1), fim=datetime(2024, 1, 1, 12, 4), limite=20)
+        assert [log.detalhes for log in periodo] == ["evento 3", "evento 2", "evento 1"]
+
+        # substituir o buffer não apaga o arquivo
+        db.logs = []
+        db.persist()
+        assert len(db.consultar_logs(limite=50)) == 12
+        if isinstance(db, JournalDB):
+            db.compactar()
+            db.close()
+            recarregado = JournalDB(tmp_path / "diario", logs_recentes=5)
+        else:
+            recarregado = SQLiteDB(tmp_path / "pdv.sqlite", logs_recentes=5)
+        assert [log.detalhes for log in recarregado.logs] == [f"evento {i}" for i in range(7, 12)]
+        assert len(recarregado.consultar_logs(limite=50)) == 12
+        assert recarregado.next_id() > max(log.id for log in recarregado.logs)
+
+
+def test_journal_consulta_logs_por_dia_sem_ler_o_arquivo_todo(tmp_path):
+    def registrar(db, dia, hora, acao="VENDA"):
+        db.logs.append(LogEntry(db.next_id(), acao, f"{dia} {hora}h", "admin", datetime(2024, 3, dia, hora)))
+        db.persist()
+
+    db = JournalDB(tmp_path / "diario")
+    for dia in range(1, 6):
+        for hora in (10, 20):
+            registrar(db, dia, hora, "VENDA" if hora == 10 else "FECHAMENTO")
+    periodo = db.consultar_logs(inicio=datetime(2024, 3, 2, 12), fim=datetime(2024, 3, 4, 12))
+    assert [log.detalhes for log in periodo] == ["4 10h", "3 20h", "3 10h", "2 20h"]
+    assert [log.detalhes for log in db.consultar_logs(inicio=datetime(2024, 3, 4), acao="VENDA")] == ["5 10h", "4 10h"]
+    assert db._trecho_logs("2024-03-04T00:00:00", None)[0] > 0
+    db.close()
+
+    # o índice é remontado na abertura; um dia fora de ordem desliga a leitura por trecho
+    db = JournalDB(tmp_path / "diario")
+    assert [log.detalhes for log in db.consultar_logs(inicio=datetime(2024, 3, 5))] == ["5 20h", "5 10h"]
+    registrar(db, 1, 23)
+    assert [log.detalhes for log in db.consultar_logs(fim=datetime(2024, 3, 2))] == ["1 23h", "1 20h", "1 10h"]
+    assert db.consultar_logs(inicio=datetime(2024, 3, 6)) == []
+    db.close()
+
+
+def test_adicionar_itens_grava_pedido_com_um_persist(tmp_path):
+    db = SQLiteDB(tmp_path / "pdv.sqlite")
+    service = PdvService(db)
+    comanda = service.abrir_comanda(5)
+    logs_antes = len(db.logs)
+    gravacoes = []
+    persist_original = db.persist
+    db.persist = lambda: (gravacoes.append(1), persist_original())
+
+    with pytest.raises(KeyError):
+        service.adicionar_itens(comanda.id, [("001", 1), ("999", 1)])
+    assert comanda.itens == [] and not gravacoes
+
+    itens = service.adicionar_itens(comanda.id, [("001", 2)] * 8 + [("002", 1)] * 4)
+    assert len(gravacoes) == 1
+    assert len(db.logs) == logs_antes + 1
+    assert comanda.itens == [item.id for item in itens]
+    recarregado = SQLiteDB(tmp_path / "pdv.sqlite")
+    assert len(recarregado.itens_da_comanda(comanda.id)) == 12
+
+
+class WidgetFalso:
+    def __init__(self):
+        self.agendados = []
+
+    def after(self, _atraso, funcao):
+        self.agendados.append(funcao)
+
+    def rodar(self):
+        while self.agendados:
+            self.agendados.pop(0)()
+
+
+def test_gravador_assincrono_entrega_callback_no_after_e_grava_ao_fechar(tmp_path):
+    for db in (SQLiteDB(tmp_path / "pdv.sqlite"), JournalDB(tmp_path / "diario", compactar_apos=4)):
+        widget = WidgetFalso()
+        gravador = GravadorAssincrono(db, widget=widget)
+        service = PdvService(db)
+        comanda = service.abrir_comanda(4)
+        for _ in range(5):
+            service.adicionar_item(comanda.id, "001", 1)
+
+        concluidos = []
+        futuro = gravador.enviar(concluidos.append)
+        futuro.result(5)
+        # o callback só roda quando o "Tk" processa o after
+        assert concluidos == []
+        widget.rodar()
+        assert concluidos == [futuro]
+
+        service.adicionar_item(comanda.id, "002", 1)
+        gravador.close()
+        assert db.gravador is None
+        if isinstance(db, JournalDB):
+            db.close()
+            recarregado = JournalDB(tmp_path / "diario")
+        else:
+            recarregado = SQLiteDB(tmp_path / "pdv.sqlite")
+        assert len(recarregado.comandas[comanda.id].itens) == 6
+        assert len(recarregado.logs) == len(db.logs)
+
+
+def test_busca_de_produtos_ignora_acentos_e_prioriza_codigo():
+    db = MemoryDB()
+    db.carregar_dados_demo()
+    db.produtos["010"] = Produto(codigo="010", descricao="Queijo coalho", preco=9.0)
+
+    assert [p.codigo for p in db.buscar_produtos("pao")] == ["002"]
+    assert [p.codigo for p in db.buscar_produtos("QUEIJO")] == ["010", "002"]
+    assert [p.codigo for p in db.buscar_produtos("de qu")] == ["002"]
+    assert db.buscar_produtos("001")[0].codigo == "001"
+    assert len(db.buscar_produtos("", limite=2)) == 2
+    # termos de uma ou duas letras casam em qualquer posição, como ``LIKE '%termo%'``
+    assert [p.codigo for p in db.buscar_produtos("01")][:2] == ["010", "001"]
+    assert "002" in [p.codigo for p in db.buscar_produtos("jo")]
+
+    suco = db.produtos["003"]
+    suco.descricao = "Suco de laranja"
+    db.marcar_alterado(suco)
+    assert [p.codigo for p in db.buscar_produtos("laranja")] == ["003"]
+    assert db.buscar_produtos("natural") == []
+    db.produtos.pop("002")
+    assert [p.codigo for p in db.buscar_produtos("queijo")] == ["010"]
+
+
+def test_relatorios_do_armazem_colunar_iguais_aos_da_lista():
+    db = MemoryDB()
+    db.carregar_dados_demo()
+    service = PdvService(db)
+    caixa = service.abrir_caixa(100)
+    motivo = db.motivos_desconto[0].id
+    dias = [datetime(2024, 3, d, 12) for d in (1, 10, 20)]
+    for dia, codigo in zip(dias, ("001", "002", "003")):
+        comanda = service.abrir_comanda()
+        item = service.adicionar_item(comanda.id, codigo, 2)
+        item.criado_em = dia
+        service.aplicar_desconto_item(comanda.id, item.id, 1.0, motivo)
+        db.descontos_log[-1].criado_em = dia
+        mov = service.registrar_venda(caixa.id, 10.0, "pix" if dia.day > 5 else "dinheiro", comanda.id)
+        mov.criado_em = dia
+        service.registrar_perda(codigo, 1, db.motivos_perda[0].id)
+        db.perdas_estoque[-1].criado_em = dia
+
+    periodos = [(None, None), (datetime(2024, 3, 5), None), (datetime(2024, 3, 5), datetime(2024, 3, 15))]
+    esperado = [
+        (service.relatorio_vendas(i, f), service.relatorio_descontos(i, f), service.relatorio_perdas(i, f))
+        for i, f in periodos
+    ]
+    assert esperado[2][0]["por_produto"] == {"002": 14.0}
+
+    db.ativar_analitico()
+    obtido = [
+        (service.relatorio_vendas(i, f), service.relatorio_descontos(i, f), service.relatorio_perdas(i, f))
+        for i, f in periodos
+    ]
+    assert obtido == esperado
+
+    # alterações depois de ativado continuam refletidas
+    service.cancelar_item(db.itens[0].id, "erro")
+    db.perdas_estoque.pop()
+    assert service.relatorio_vendas()["por_produto"] == {"002": 14.0, "003": 23.0}
+    assert service.relatorio_perdas()["total"] == 12.5
+    db.analitico = None
+    assert service.relatorio_vendas()["por_produto"] == {"002": 14.0, "003": 23.0}
@@ -1,3 +1,6 @@
+import json
+import sqlite3
+import threading
 from pathlib import Path
 
 import pytest
@@ -7,9 +10,12 @@ from models.enums import CategoriaProduto, FormaPagamento, TipoMovimentoCaixa, U
 from services import (
     caixa_service,
     comanda_service,
+    logging_service,
+    metricas,
     production_service,
     product_service,
 )
+from services.database import MemoryDB
 from services.logging_service import listar
 
 
@@ -18,6 +24,7 @@ def reset_db(temp_db_path):
     db.DB_PATH = Path(temp_db_path)
     db.reset_database(temp_db_path)
     yield
+    logging_service.flush()
     if Path(temp_db_path).exists():
         Path(temp_db_path).unlink()
 
@@ -74,3 +81,299 @@ def test_log_desconto_comanda_registrado():
     )
     logs = listar(limit=5)
     assert any("DESCONTO_COMANDA" in log["acao"] for log in logs)
+
+
+def test_pool_reaproveita_conexoes_e_respeita_limite(temp_db_path):
+    assert db.get_connection() is db.get_connection()
+
+    pool = db.ConnectionPool(Path(temp_db_path), max_size=2, timeout=0.05)
+    with pool.conexao() as primeira:
+        pass
+    with pool.conexao() as segunda:
+        assert segunda is primeira
+        outra = pool.acquire()
+        with pytest.raises(db.PoolEsgotadoError):
+            pool.acquire()
+        pool.release(outra)
+
+    # conexões de thread não ocupam vaga; a de uma thread encerrada volta sem transação aberta
+    def usar_e_abandonar():
+        conn = pool.conexao_da_thread()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("CREATE TABLE abandonada (id INTEGER)")
+
+    for _ in range(4):
+        thread = threading.Thread(target=usar_e_abandonar)
+        thread.start()
+        thread.join()
+    with pool.conexao() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'abandonada'").fetchone() is None
+    pool.close()
+
+
+def test_perfil_sqlite_aplicado_nas_conexoes():
+    ativa = db.configuracao_ativa(db.get_connection())
+    assert ativa["perfil"] == db.DB_PROFILE
+    assert ativa["journal_mode"] == "wal"
+
+    pool = db.ConnectionPool(db.DB_PATH, perfil="fast")
+    with pool.conexao() as conn:
+        rapida = db.configuracao_ativa(conn, "fast")
+    pool.close()
+    assert rapida["synchronous"] == 0
+    with pytest.raises(ValueError):
+        db.aplicar_perfil(db.get_connection(), "inexistente")
+
+
+def test_migracoes_versionadas_criam_indices():
+    conn = db.get_connection()
+    assert db.versao_esquema(conn) == db.MIGRACOES[-1][0]
+    assert db.migrar(conn) == db.MIGRACOES[-1][0]
+    plano = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM lotes_producao WHERE produto_id = ? "
+        "AND consumido_porcoes < quantidade AND consumido_kg < quantidade ORDER BY criado_em ASC, id ASC",
+        (1,),
+    ).fetchall()
+    assert any("idx_lotes_abertos" in linha["detail"] for linha in plano)
+
+
+def test_adicionar_item_grava_em_uma_unica_transacao(monkeypatch):
+    produto_id = criar_produto_basico("Prato", CategoriaProduto.PRATO_FIXO)
+    production_service.criar_lote(produto_id, 10, UnidadeProducao.PORCAO, 10, "admin")
+    comanda = comanda_service.abrir_comanda(1, "admin")
+    conn = db.get_connection()
+    comandos = []
+    conn.set_trace_callback(comandos.append)
+    comanda_service.adicionar_item(comanda, produto_id, quantidade=2, usuario="admin")
+    conn.set_trace_callback(None)
+    assert [c for c in comandos if c.startswith(("BEGIN", "COMMIT"))] == ["BEGIN IMMEDIATE", "COMMIT"]
+
+    def falhar(*_args):
+        raise RuntimeError("falha no estoque")
+
+    monkeypatch.setattr(production_service, "registrar_consumo_venda", falhar)
+    with pytest.raises(RuntimeError):
+        comanda_service.adicionar_item(comanda, produto_id, quantidade=1, usuario="admin")
+    assert conn.execute("SELECT COUNT(*) FROM itens_comanda").fetchone()[0] == 1
+    assert conn.execute("SELECT COUNT(*) FROM logs WHERE acao = 'ADICIONAR_ITEM'").fetchone()[0] == 1
+    assert not conn.in_transaction
+
+
+def test_adicionar_itens_lanca_pedido_em_um_commit():
+    prato = criar_produto_basico("Prato", CategoriaProduto.PRATO_FIXO)
+    doce = criar_produto_basico("Doce", CategoriaProduto.SOBREMESA_PESO)
+    lote = production_service.criar_lote(prato, 20, UnidadeProducao.PORCAO, 20, "admin")
+    comanda = comanda_service.abrir_comanda(1, "admin")
+    conn = db.get_connection()
+    linhas = [{"produto_id": prato, "quantidade": 1} for _ in range(11)]
+    linhas.append({"produto_id": doce, "quantidade": 1, "peso_gramas": 300})
+
+    comandos = []
+    conn.set_trace_callback(comandos.append)
+    ids = comanda_service.adicionar_itens(comanda, linhas, "admin")
+    conn.set_trace_callback(None)
+
+    assert len(ids) == 12
+    assert [c for c in comandos if c.startswith(("BEGIN", "COMMIT"))] == ["BEGIN IMMEDIATE", "COMMIT"]
+    assert sum(c.startswith("UPDATE lotes_producao") for c in comandos) == 1
+    assert conn.execute("SELECT COUNT(*) FROM logs WHERE acao = 'ADICIONAR_ITENS'").fetchone()[0] == 1
+    assert conn.execute("SELECT consumido_porcoes FROM lotes_producao WHERE id = ?", (lote,)).fetchone()[0] == 11
+    assert comanda_service.totalizar(comanda) == pytest.approx(11 * 10.0 + 50.0 * 0.3)
+
+    with pytest.raises(ValueError):
+        # o doce por quilo sem peso invalida o pedido inteiro
+        comanda_service.adicionar_itens(
+            comanda, [{"produto_id": prato, "quantidade": 1}, {"produto_id": doce, "quantidade": 1}], "admin"
+        )
+    assert conn.execute("SELECT COUNT(*) FROM itens_comanda").fetchone()[0] == 12
+
+
+def test_consumo_fifo_em_lote_baixa_apenas_lotes_abertos():
+    prato = criar_produto_basico("Prato", CategoriaProduto.PRATO_FIXO)
+    doce = criar_produto_basico("Doce", CategoriaProduto.SOBREMESA_PESO)
+    lotes = [production_service.criar_lote(prato, 5, UnidadeProducao.PORCAO, 5, "admin") for _ in range(3)]
+    lote_kg = production_service.criar_lote(doce, 2, UnidadeProducao.KG, None, "admin")
+
+    production_service.registrar_consumo_venda(prato, 5, UnidadeProducao.PORCAO)
+    production_service.registrar_consumo_vendas(
+        [
+            (prato, 2, UnidadeProducao.PORCAO),
+            (doce, 0.5, UnidadeProducao.KG),
+            (prato, 4, UnidadeProducao.PORCAO),
+            (doce, 0.25, UnidadeProducao.KG),
+        ]
+    )
+
+    conn = db.get_connection()
+    consumo = {
+        linha["id"]: (linha["consumido_porcoes"], linha["consumido_kg"])
+        for linha in conn.execute("SELECT id, consumido_porcoes, consumido_kg FROM lotes_producao")
+    }
+    assert [consumo[lote][0] for lote in lotes] == [5, 5, 1]
+    assert consumo[lote_kg] == (0, 0.75)
+
+
+def test_auditoria_fora_de_transacao_grava_em_lote():
+    conn = db.get_connection()
+    comandos = []
+    conn.set_trace_callback(comandos.append)
+    for i in range(50):
+        logging_service.registrar("TESTE", "admin", f"acao {i}")
+    conn.set_trace_callback(None)
+    # quem registra não paga INSERT nem commit
+    assert comandos == []
+
+    logs = listar(limit=100)
+    assert sorted(log["detalhes"] for log in logs if log["acao"] == "TESTE") == sorted(f"acao {i}" for i in range(50))
+
+
+def test_auditoria_em_lote_tenta_de_novo_e_nao_descarta_falhas(monkeypatch):
+    conexao_real = logging_service.conexao
+    falhar = {"vezes": 1}
+
+    def conexao_instavel(caminho):
+        if falhar["vezes"]:
+            falhar["vezes"] -= 1
+            raise sqlite3.OperationalError("disk I/O error")
+        return conexao_real(caminho)
+
+    monkeypatch.setattr(logging_service, "conexao", conexao_instavel)
+    buffer = logging_service._BufferAuditoria(lote=10, intervalo=0.01, max_pendentes=100, tentativas=2)
+    caminho = db.get_pool().path
+    buffer.adicionar(caminho, ("TESTE", "admin", "primeira", "2024-01-01 12:00:00"))
+    buffer.flush()
+
+    falhar["vezes"] = 10
+    buffer.adicionar(caminho, ("TESTE", "admin", "segunda", "2024-01-01 12:00:01"))
+    with pytest.raises(logging_service.AuditoriaNaoGravadaError) as erro:
+        buffer.flush()
+    assert [linha[2] for _caminho, linha in erro.value.linhas] == ["segunda"]
+
+    falhar["vezes"] = 0
+    buffer.close()
+    detalhes = [log["detalhes"] for log in listar() if log["acao"] == "TESTE"]
+    assert sorted(detalhes) == ["primeira", "segunda"]
+
+
+def test_busca_de_produtos_usa_indice_sem_acentos():
+    pao = criar_produto_basico("Pão de queijo", CategoriaProduto.PRATO_FIXO)
+    criar_produto_basico("Queijo coalho", CategoriaProduto.PRATO_FIXO)
+    assert [p["id"] for p in product_service.buscar_por_nome("pao")] == [pao]
+    assert [p["nome"] for p in product_service.buscar_por_nome("queijo")] == ["Queijo coalho", "Pão de queijo"]
+
+    novo = criar_produto_basico("Queijadinha", CategoriaProduto.SOBREMESA_PESO)
+    assert [p["id"] for p in product_service.buscar_por_nome("queija")] == [novo]
+    product_service.desativar(pao, "admin")
+    assert [p["nome"] for p in product_service.buscar_por_nome("queijo")] == ["Queijo coalho"]
+    assert [p["id"] for p in product_service.buscar_por_nome("ja")] == [novo]
+
+
+def test_indice_de_produtos_acompanha_outras_conexoes():
+    feijoada = criar_produto_basico("Feijoada", CategoriaProduto.PRATO_FIXO)
+    assert [p["id"] for p in product_service.buscar_por_nome("jo")] == [feijoada]
+
+    outra = sqlite3.connect(db.get_pool().path)
+    with outra:
+        outra.execute(
+            "INSERT INTO produtos(nome, categoria, preco) VALUES ('Picanha', ?, 80.0)",
+            (CategoriaProduto.PRATO_FIXO.value,),
+        )
+        outra.execute("UPDATE produtos SET nome = 'Moqueca' WHERE id = ?", (feijoada,))
+    outra.close()
+
+    assert [p["nome"] for p in product_service.buscar_por_nome("pica")] == ["Picanha"]
+    assert product_service.buscar_por_nome("feij") == []
+    assert [p["id"] for p in product_service.buscar_por_nome("moq")] == [feijoada]
+
+    versao = db.get_connection().execute("SELECT versao FROM produtos_versao").fetchone()[0]
+    with db.transacao() as conn:
+        conn.execute("UPDATE produtos SET categoria = ? WHERE id = ?", (CategoriaProduto.BEBIDA.value, feijoada))
+    assert db.get_connection().execute("SELECT versao FROM produtos_versao").fetchone()[0] == versao + 1
+
+
+def verificar_busca_de_produtos_e_logs():
+    pao = criar_produto_basico("Pão de queijo", CategoriaProduto.PRATO_FIXO)
+    coalho = criar_produto_basico("Queijo coalho", CategoriaProduto.PRATO_FIXO)
+    criar_produto_basico("Pudim", CategoriaProduto.SOBREMESA_PESO)
+
+    assert [p["id"] for p in product_service.buscar("pao")] == [pao]
+    assert {p["id"] for p in product_service.buscar("queij")} == {pao, coalho}
+    assert [p["nome"] for p in product_service.buscar("sobremesa")] == ["Pudim"]
+    assert len(product_service.buscar("queijo", limite=1, offset=1)) == 1
+    paginas = product_service.buscar("prato", limite=1) + product_service.buscar("prato", limite=2, offset=1)
+    assert sorted(p["id"] for p in paginas) == sorted([pao, coalho])
+    product_service.desativar(coalho, "admin")
+    assert [p["id"] for p in product_service.buscar("queijo")] == [pao]
+
+    comanda = comanda_service.abrir_comanda(4, "caixa1")
+    comanda_service.adicionar_item(comanda, pao, quantidade=1, usuario="caixa1")
+    comanda_service.fechar_comanda(comanda, "caixa2")
+    logs = logging_service.buscar(f"comanda {comanda}")
+    assert {log["acao"] for log in logs} == {"ADICIONAR_ITEM", "FECHAR_COMANDA"}
+    assert [log["acao"] for log in logging_service.buscar("comanda", usuario="caixa2")] == ["FECHAR_COMANDA"]
+    assert logging_service.buscar("inexistente") == []
+
+
+def test_indice_de_produtos_em_transacao_sem_remontar():
+    feijoada = criar_produto_basico("Feijoada", CategoriaProduto.PRATO_FIXO)
+    criar_produto_basico("Feijão tropeiro", CategoriaProduto.PRATO_FIXO)
+    assert len(product_service.buscar_por_nome("feij")) == 2
+    conn = db.get_connection()
+    comandos = []
+    conn.set_trace_callback(comandos.append)
+
+    with pytest.raises(RuntimeError):
+        with db.transacao():
+            assert len(product_service.buscar_por_nome("feij")) == 2
+            # alterações da própria transação aparecem por cima do índice em cache
+            novo = criar_produto_basico("Feijão amigo", CategoriaProduto.PRATO_FIXO)
+            product_service.desativar(feijoada, "admin")
+            assert [p["id"] for p in product_service.buscar_por_nome("amigo")] == [novo]
+            assert [p["nome"] for p in product_service.buscar_por_nome("feij")] == ["Feijão amigo", "Feijão tropeiro"]
+            raise RuntimeError("desfaz")
+
+    assert [p["nome"] for p in product_service.buscar_por_nome("feij")] == ["Feijão tropeiro", "Feijoada"]
+    outro = criar_produto_basico("Feijão verde", CategoriaProduto.PRATO_FIXO)
+    assert [p["id"] for p in product_service.buscar_por_nome("verde")] == [outro]
+    conn.set_trace_callback(None)
+    assert not [c for c in comandos if c.startswith("SELECT id, nome FROM produtos")]
+
+
+def test_busca_textual_em_produtos_e_logs():
+    if not db.instalar_busca_textual(db.get_connection()):
+        pytest.skip("SQLite sem FTS5")
+    verificar_busca_de_produtos_e_logs()
+
+
+def test_busca_sem_fts_usa_indice_e_like(monkeypatch):
+    monkeypatch.setattr(product_service, "tem_busca_textual", lambda conn: False)
+    monkeypatch.setattr(logging_service, "tem_busca_textual", lambda conn: False)
+    verificar_busca_de_produtos_e_logs()
+
+
+@pytest.mark.skipif(not metricas.METRICAS_ATIVAS, reason="RESTAURANTE_METRICAS=0")
+def test_metricas_cronometram_servicos_e_exportam(tmp_path):
+    metricas.registro.limpar()
+    comanda = comanda_service.abrir_comanda(1, "admin")
+    with pytest.raises(ValueError):
+        comanda_service.adicionar_item(comanda, 9999, quantidade=1, usuario="admin")
+    caixa_service.CaixaService(MemoryDB()).abrir_caixa(100)
+
+    resumo = metricas.registro.resumo()
+    assert resumo["comanda_service.abrir_comanda"]["quantidade"] == 1
+    assert resumo["comanda_service.abrir_comanda"]["erros"] == 0
+    assert resumo["comanda_service.adicionar_item"]["erros"] == 1
+    assert resumo["CaixaService.abrir_caixa"]["quantidade"] == 1
+    assert "logging_service.registrar" in resumo
+    assert resumo["comanda_service.abrir_comanda"]["p99_ms"] >= resumo["comanda_service.abrir_comanda"]["p50_ms"] > 0
+
+    metricas.registro.gravar(tmp_path / "metricas.prom")
+    texto = (tmp_path / "metricas.prom").read_text(encoding="utf-8")
+    assert 'restaurante_operacao_erros_total{operacao="comanda_service.adicionar_item"} 1' in texto
+    assert 'restaurante_operacao_segundos_count{operacao="CaixaService.abrir_caixa"} 1' in texto
+
+    exportador = metricas.ExportadorMetricas(tmp_path / "metricas.json", intervalo=3600)
+    exportador.close()
+    dados = json.loads((tmp_path / "metricas.json").read_text(encoding="utf-8"))
+    assert dados["operacoes"]["comanda_service.abrir_comanda"]["quantidade"] == 1
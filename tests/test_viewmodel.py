@@ -0,0 +1,79 @@
+from ui.viewmodel import Agendador, ListaIncremental
+
+
+class ListboxFalso:
+    def __init__(self):
+        self.linhas = []
+        self.operacoes = 0
+        self.cores = {}
+
+    def insert(self, indice, *textos):
+        self.linhas[indice:indice] = textos
+        self.operacoes += 1
+
+    def delete(self, inicio, fim):
+        del self.linhas[inicio : fim + 1]
+        self.operacoes += 1
+
+    def itemconfigure(self, indice, **opcoes):
+        self.cores[indice] = opcoes["background"]
+
+
+class WidgetFalso:
+    def __init__(self):
+        self.agendados = {}
+        self._proximo = 0
+
+    def _agendar(self, funcao):
+        self._proximo += 1
+        self.agendados[f"after#{self._proximo}"] = funcao
+        return f"after#{self._proximo}"
+
+    def after(self, _atraso, funcao):
+        return self._agendar(funcao)
+
+    def after_idle(self, funcao):
+        return self._agendar(funcao)
+
+    def after_cancel(self, identificador):
+        self.agendados.pop(identificador, None)
+
+    def rodar(self):
+        while self.agendados:
+            identificador = next(iter(self.agendados))
+            self.agendados.pop(identificador)()
+
+
+def test_lista_incremental_aplica_apenas_diferencas():
+    listbox = ListboxFalso()
+    lista = ListaIncremental(listbox)
+    lista.atualizar([f"log {i}" for i in range(50)])
+    listbox.operacoes = 0
+
+    # janela deslizante: sai a primeira linha e entra uma nova no fim
+    assert lista.atualizar([f"log {i}" for i in range(1, 51)]) == 2
+    assert listbox.linhas == [f"log {i}" for i in range(1, 51)]
+    assert listbox.operacoes == 2
+    assert lista.atualizar(list(listbox.linhas)) == 0
+
+    lista.atualizar(["a", "b", "c"], [("verde", "preto"), ("cinza", "preto"), ("cinza", "preto")])
+    lista.atualizar(["a", "B", "c"], [("verde", "preto"), ("azul", "preto"), ("cinza", "preto")])
+    assert listbox.linhas == ["a", "B", "c"]
+    assert listbox.cores[1] == "azul"
+
+
+def test_agendador_agrupa_pedidos_e_aplica_debounce():
+    widget = WidgetFalso()
+    agendador = Agendador(widget)
+    chamadas = []
+    for _ in range(3):
+        agendador.agendar("itens", lambda: chamadas.append("itens"))
+        agendador.adiar("busca", lambda: chamadas.append("busca"), 100)
+    assert len(widget.agendados) == 2
+    widget.rodar()
+    assert sorted(chamadas) == ["busca", "itens"]
+
+    agendador.adiar("busca", lambda: chamadas.append("busca imediata"), 100)
+    agendador.executar_pendentes("busca")
+    assert chamadas[-1] == "busca imediata"
+    assert not widget.agendados
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Mede o ganho dos índices secundários do esquema ``core.db``.
+
+Cria um banco temporário, popula as tabelas quentes com ``--linhas`` registros
+(padrão: 1 milhão em ``itens_comanda``, ``lotes_producao`` e ``logs``) e mede as
+consultas usadas pelos serviços com e sem os índices da migração 1. Nada é
+gravado no banco configurado em ``RESTAURANTE_DB_PATH``.
+
+Exemplo::
+
+    python tools/bench_indices.py --linhas 1000000 --repeticoes 20
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from core import db  # noqa: E402
+
+INDICES = [
+    "idx_itens_comanda_comanda",
+    "idx_lotes_produto_criado",
+    "idx_lotes_abertos",
+    "idx_logs_criado_em",
+    "idx_produtos_nome",
+    "idx_comandas_mesa_status",
+    "idx_movimentos_caixa_caixa",
+    "idx_perdas_estoque_produto",
+]
+
+CONSULTAS: List[Tuple[str, str, Callable[[random.Random, int], tuple]]] = [
+    (
+        "totalizar (itens por comanda)",
+        "SELECT IFNULL(SUM(preco_unitario - desconto_valor),0) FROM itens_comanda WHERE comanda_id = ?",
+        lambda rnd, n: (rnd.randint(1, max(1, n // 10)),),
+    ),
+    (
+        "lotes abertos por produto",
+        "SELECT * FROM lotes_producao WHERE produto_id = ? AND consumido_porcoes < quantidade "
+        "AND consumido_kg < quantidade ORDER BY criado_em ASC, id ASC",
+        lambda rnd, n: (rnd.randint(1, 500),),
+    ),
+    (
+        "últimos logs",
+        "SELECT id, acao, usuario, detalhes, criado_em FROM logs ORDER BY criado_em DESC LIMIT 100",
+        lambda rnd, n: (),
+    ),
+    (
+        "produtos por prefixo do nome",
+        "SELECT id FROM produtos WHERE nome LIKE ? AND ativo = 1",
+        lambda rnd, n: (f"Produto {rnd.randint(1, 499)}%",),
+    ),
+    (
+        "mesa por número",
+        "SELECT id FROM mesas WHERE numero = ?",
+        lambda rnd, n: (rnd.randint(1, 20),),
+    ),
+]
+
+
+def popular(conn, linhas: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    conn.executemany(
+        "INSERT INTO produtos(nome, categoria, preco) VALUES (?, 'PRATO_FIXO', ?)",
+        [(f"Produto {i}", 10.0 + i % 50) for i in range(1, 501)],
+    )
+    comandas = max(1, linhas // 10)
+    conn.executemany(
+        "INSERT INTO comandas(mesa_id, aberta_por, status, criado_em) VALUES (?, 'bench', 'FECHADA', ?)",
+        [(rnd.randint(1, 20), f"2024-01-01 {i % 24:02d}:00:00") for i in range(comandas)],
+    )
+    conn.executemany(
+        "INSERT INTO itens_comanda(comanda_id, produto_id, quantidade, preco_unitario) VALUES (?, ?, 1, ?)",
+        ((rnd.randint(1, comandas), rnd.randint(1, 500), 12.5) for _ in range(linhas)),
+    )
+    # a maior parte dos lotes já foi consumida; poucos seguem abertos
+    conn.executemany(
+        "INSERT INTO lotes_producao(produto_id, quantidade, unidade, consumido_porcoes, criado_em)"
+        " VALUES (?, 10, 'PORCAO', ?, ?)",
+        (
+            (rnd.randint(1, 500), 10 if rnd.random() < 0.99 else 3, f"2024-01-{1 + i % 28:02d} 10:00:{i % 60:02d}")
+            for i in range(linhas)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO logs(acao, usuario, detalhes, criado_em) VALUES ('ADICIONAR_ITEM', 'bench', ?, ?)",
+        ((f"detalhe {i}", f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} 12:{i % 60:02d}:00") for i in range(linhas)),
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+
+
+def medir(conn, repeticoes: int, linhas: int, seed: int) -> Dict[str, float]:
+    resultados = {}
+    for nome, sql, parametros in CONSULTAS:
+        rnd = random.Random(seed)
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            conn.execute(sql, parametros(rnd, linhas)).fetchall()
+        resultados[nome] = (time.perf_counter() - inicio) / repeticoes * 1000
+    return resultados
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = Path(tmp) / "bench.db"
+        db.init_db(caminho)
+        conn = db.get_connection(caminho)
+        db.aplicar_perfil(conn, "fast")
+        print(f"Populando {args.linhas} linhas por tabela...")
+        popular(conn, args.linhas, args.seed)
+
+        com_indices = medir(conn, args.repeticoes, args.linhas, args.seed)
+        for indice in INDICES:
+            conn.execute(f"DROP INDEX IF EXISTS {indice}")
+        conn.execute("ANALYZE")
+        sem_indices = medir(conn, args.repeticoes, args.linhas, args.seed)
+        db.close_pool(caminho)
+
+    print(f"\n{'Consulta':<32} {'sem índice (ms)':>16} {'com índice (ms)':>16} {'ganho':>8}")
+    for nome, _sql, _params in CONSULTAS:
+        antes, depois = sem_indices[nome], com_indices[nome]
+        ganho = antes / depois if depois else float("inf")
+        print(f"{nome:<32} {antes:>16.3f} {depois:>16.3f} {ganho:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
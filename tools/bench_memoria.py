@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Mede a memória por registro dos modelos de alto volume do PDV.
+
+Para cada modelo com ``slots=True`` em ``models.entities`` cria ``--linhas``
+instâncias da versão atual e de uma cópia sem slots (o formato anterior, com
+``__dict__`` por instância) e compara os bytes alocados por linha segundo o
+``tracemalloc``. Os valores dos campos são gerados fora da medição, então o
+número reflete só o custo dos objetos em si.
+
+Exemplo::
+
+    python tools/bench_memoria.py --linhas 200000
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import gc
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from models import DescontoLog, ItemComanda, LogEntry, MovimentoCaixa, PerdaEstoque, TipoMovimento  # noqa: E402
+
+INICIO = datetime(2024, 1, 1, 12, 0)
+
+# modelo -> gerador dos argumentos da linha ``i``
+MODELOS: List[Tuple[type, Callable[[int], Dict[str, Any]]]] = [
+    (
+        ItemComanda,
+        lambda i: dict(
+            id=i,
+            comanda_id=i // 8,
+            produto_codigo=f"{i % 500:03d}",
+            quantidade=1.0 + i % 3,
+            preco_unitario=12.5 + i % 7,
+        ),
+    ),
+    (
+        MovimentoCaixa,
+        lambda i: dict(
+            id=i,
+            caixa_id=i // 1000,
+            tipo=TipoMovimento.VENDA_DINHEIRO,
+            valor=10.0 + i % 90,
+            forma_pagamento="dinheiro",
+            descricao=f"Comanda {i}",
+            criado_em=INICIO + timedelta(minutes=i),
+            usuario="operador",
+            valor_dinheiro_impacto=10.0 + i % 90,
+        ),
+    ),
+    (
+        LogEntry,
+        lambda i: dict(
+            id=i,
+            acao="adicionar_item",
+            detalhes=f"Comanda {i // 8} adicionou 1x item",
+            usuario="operador",
+            criado_em=INICIO + timedelta(seconds=i),
+        ),
+    ),
+    (
+        DescontoLog,
+        lambda i: dict(
+            id=i,
+            comanda_id=i // 8,
+            item_id=i,
+            motivo_id=1,
+            usuario="gerente",
+            valor=1.5,
+            criado_em=INICIO + timedelta(minutes=i),
+        ),
+    ),
+    (
+        PerdaEstoque,
+        lambda i: dict(
+            id=i,
+            produto_codigo=f"{i % 500:03d}",
+            quantidade=0.5,
+            motivo_id=2,
+            usuario="cozinha",
+            valor_total=6.25,
+            criado_em=INICIO + timedelta(minutes=i),
+        ),
+    ),
+]
+
+
+def sem_slots(modelo: type) -> type:
+    """Cópia do dataclass ``modelo`` sem ``__slots__`` (formato anterior)."""
+    campos = [(c.name, c.type, c) for c in dataclasses.fields(modelo)]
+    return dataclasses.make_dataclass(f"{modelo.__name__}SemSlots", campos)
+
+
+def bytes_por_linha(classe: type, argumentos: List[Dict[str, Any]]) -> float:
+    gc.collect()
+    tracemalloc.start()
+    inicio = tracemalloc.get_traced_memory()[0]
+    instancias = [classe(**args) for args in argumentos]
+    usados = tracemalloc.get_traced_memory()[0] - inicio
+    tracemalloc.stop()
+    del instancias
+    return usados / len(argumentos)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    print(f"{'Modelo':<16} {'sem slots (B)':>14} {'com slots (B)':>14} {'economia':>9}")
+    for modelo, gerar in MODELOS:
+        argumentos = [gerar(i) for i in range(args.linhas)]
+        antes = bytes_por_linha(sem_slots(modelo), argumentos)
+        depois = bytes_por_linha(modelo, argumentos)
+        economia = 1 - depois / antes if antes else 0.0
+        print(f"{modelo.__name__:<16} {antes:>14.1f} {depois:>14.1f} {economia:>8.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
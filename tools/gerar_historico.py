@@ -0,0 +1,736 @@
+#!/usr/bin/env python3
+"""Gera um histórico sintético de operação do restaurante.
+
+Simula dia a dia o movimento da casa entre ``--inicio`` e ``--fim``: comandas
+por mesa com picos no almoço e no jantar, pratos, bebidas e itens por quilo,
+cancelamentos, descontos, lotes de produção com a sobra do dia lançada como
+perda, abertura e fechamento de caixa com suprimento, sangria e pequenas
+diferenças de contagem, além dos logs de cada operação.
+
+O mesmo histórico é gravado direto no arquivo do PDV (``--pdv``, esquema do
+``SQLiteDB``) e/ou no banco do núcleo (``--nucleo``, esquema do ``core.db``)
+com ``executemany``, sem passar pelos serviços, que fazem um commit por
+operação. A mesma ``--seed`` sempre gera o mesmo histórico.
+
+Exemplo::
+
+    python tools/gerar_historico.py --pdv data/pdv.sqlite --nucleo data/restaurante.db \\
+        --inicio 2024-01-01 --fim 2024-06-30 --comandas-por-dia 150 --seed 42
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as hora, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from core import db  # noqa: E402
+from models import (  # noqa: E402
+    Caixa,
+    Comanda,
+    DescontoLog,
+    ItemComanda,
+    LogEntry,
+    MotivoDesconto,
+    MotivoPerda,
+    MovimentoCaixa,
+    PerdaEstoque,
+    Produto,
+    StatusCaixa,
+    StatusComanda,
+    TipoMovimento,
+)
+from models.enums import CategoriaProduto, UnidadeProducao  # noqa: E402
+from services.database import _SERIALIZADORES, SQLiteDB, _sql_upsert  # noqa: E402
+
+MESAS = 20
+
+
+class ItemCardapio(NamedTuple):
+    codigo: str
+    nome: str
+    categoria: CategoriaProduto
+    preco: float  # por quilo quando ``por_quilo``
+
+    @property
+    def por_quilo(self) -> bool:
+        return self.categoria in (CategoriaProduto.SOBREMESA_PESO, CategoriaProduto.OPCIONAL_PESO)
+
+
+# Códigos na faixa 5xx para não colidir com o cadastro de demonstração do PDV.
+CARDAPIO = [
+    ItemCardapio("501", "Prato executivo", CategoriaProduto.PRATO_FIXO, 32.0),
+    ItemCardapio("502", "Feijoada", CategoriaProduto.PRATO_FIXO, 45.0),
+    ItemCardapio("503", "Filé à parmegiana", CategoriaProduto.PRATO_FIXO, 52.0),
+    ItemCardapio("504", "Salada da casa", CategoriaProduto.PRATO_FIXO, 28.0),
+    ItemCardapio("510", "Buffet por quilo", CategoriaProduto.OPCIONAL_PESO, 79.9),
+    ItemCardapio("511", "Sobremesa por quilo", CategoriaProduto.SOBREMESA_PESO, 59.9),
+    ItemCardapio("520", "Refrigerante lata", CategoriaProduto.BEBIDA, 7.0),
+    ItemCardapio("521", "Suco natural", CategoriaProduto.BEBIDA, 12.0),
+    ItemCardapio("522", "Água mineral", CategoriaProduto.BEBIDA, 5.0),
+    ItemCardapio("523", "Cerveja long neck", CategoriaProduto.BEBIDA, 14.0),
+    ItemCardapio("524", "Café expresso", CategoriaProduto.BEBIDA, 6.0),
+    ItemCardapio("530", "Batata frita", CategoriaProduto.ADICIONAL_FIXO, 18.0),
+    ItemCardapio("531", "Ovo frito", CategoriaProduto.ADICIONAL_FIXO, 4.0),
+]
+PRATOS = [i for i, p in enumerate(CARDAPIO) if p.categoria == CategoriaProduto.PRATO_FIXO]
+BUFFET = next(i for i, p in enumerate(CARDAPIO) if p.categoria == CategoriaProduto.OPCIONAL_PESO)
+SOBREMESA = next(i for i, p in enumerate(CARDAPIO) if p.categoria == CategoriaProduto.SOBREMESA_PESO)
+BEBIDAS = [i for i, p in enumerate(CARDAPIO) if p.categoria == CategoriaProduto.BEBIDA]
+ADICIONAIS = [i for i, p in enumerate(CARDAPIO) if p.categoria == CategoriaProduto.ADICIONAL_FIXO]
+PRODUZIDOS = PRATOS + [BUFFET, SOBREMESA]
+
+MOTIVOS_DESCONTO = ["Cortesia", "Reclamação do cliente", "Programa de fidelidade"]
+MOTIVOS_PERDA = ["Quebra", "Validade expirada", "Sobra do dia"]
+FORMAS = ["dinheiro", "debito", "credito", "pix"]
+PESOS_FORMAS = [20, 30, 30, 20]
+GARCONS = ["garcom1", "garcom2", "garcom3", "garcom4"]
+OPERADORES = ["caixa1", "caixa2"]
+GERENTE = "gerente"
+COZINHA = "cozinha"
+
+# movimento relativo por dia da semana (segunda = 0)
+FATOR_SEMANA = [0.7, 0.85, 0.9, 0.95, 1.15, 1.35, 1.3]
+
+
+# Histórico simulado ----------------------------------------------------------
+@dataclass
+class ItemSimulado:
+    produto: int  # posição em ``CARDAPIO``
+    quantidade: float  # porções, ou kg nos itens por quilo
+    criado_em: datetime
+    desconto: float = 0.0
+    motivo_desconto: Optional[int] = None
+    cancelado: bool = False
+
+    @property
+    def bruto(self) -> float:
+        return round(CARDAPIO[self.produto].preco * self.quantidade, 2)
+
+    @property
+    def liquido(self) -> float:
+        return 0.0 if self.cancelado else max(0.0, self.bruto - self.desconto)
+
+
+@dataclass
+class ComandaSimulada:
+    mesa: int
+    garcom: str
+    aberta_em: datetime
+    fechada_em: datetime
+    forma: str
+    itens: List[ItemSimulado] = field(default_factory=list)
+    desconto: float = 0.0
+    motivo_desconto: Optional[int] = None
+
+    @property
+    def total(self) -> float:
+        return round(max(0.0, sum(i.liquido for i in self.itens) - self.desconto), 2)
+
+
+@dataclass
+class LoteSimulado:
+    produto: int
+    quantidade: float
+    criado_em: datetime
+    vendido: float
+    perda: float = 0.0  # 0 no último dia: o lote segue aberto
+    perda_em: Optional[datetime] = None
+    motivo_perda: int = 2
+
+    @property
+    def unidade(self) -> UnidadeProducao:
+        return UnidadeProducao.KG if CARDAPIO[self.produto].por_quilo else UnidadeProducao.PORCAO
+
+
+@dataclass
+class DiaSimulado:
+    data: date
+    operador: str
+    aberto_em: datetime
+    fechado_em: datetime
+    valor_inicial: float
+    comandas: List[ComandaSimulada]
+    lotes: List[LoteSimulado]
+    suprimentos: List[Tuple[datetime, float]]
+    sangrias: List[Tuple[datetime, float]]
+    diferenca: float
+
+    @property
+    def esperado(self) -> float:
+        vendas = sum(c.total for c in self.comandas if c.forma == "dinheiro")
+        return round(
+            self.valor_inicial + vendas + sum(v for _, v in self.suprimentos) - sum(v for _, v in self.sangrias), 2
+        )
+
+
+def _horario_chegada(rnd: random.Random, dia: date) -> datetime:
+    """Chegadas concentradas no almoço (60%) e no jantar, entre 11h e 22h30."""
+    if rnd.random() < 0.6:
+        minutos = rnd.gauss(12 * 60 + 45, 45)
+    else:
+        minutos = rnd.gauss(20 * 60 + 30, 60)
+    minutos = min(max(minutos, 11 * 60), 22 * 60 + 30)
+    return datetime.combine(dia, hora()) + timedelta(minutes=minutos, seconds=rnd.randrange(60))
+
+
+def _simular_comanda(rnd: random.Random, mesa: int, chegada: datetime) -> ComandaSimulada:
+    comanda = ComandaSimulada(
+        mesa=mesa,
+        garcom=rnd.choice(GARCONS),
+        aberta_em=chegada,
+        fechada_em=chegada + timedelta(minutes=rnd.randint(35, 110)),
+        forma=rnd.choices(FORMAS, PESOS_FORMAS)[0],
+    )
+    pedido = chegada + timedelta(minutes=rnd.randint(2, 10))
+    for _ in range(rnd.choices((1, 2, 3, 4, 5), (25, 35, 15, 18, 7))[0]):
+        if rnd.random() < 0.45:
+            comanda.itens.append(ItemSimulado(BUFFET, round(rnd.uniform(0.3, 0.8), 3), pedido))
+        else:
+            comanda.itens.append(ItemSimulado(rnd.choice(PRATOS), 1, pedido))
+        if rnd.random() < 0.75:
+            comanda.itens.append(ItemSimulado(rnd.choice(BEBIDAS), rnd.choice((1, 1, 1, 2)), pedido))
+        if rnd.random() < 0.2:
+            comanda.itens.append(ItemSimulado(rnd.choice(ADICIONAIS), 1, pedido))
+        if rnd.random() < 0.3:
+            sobremesa = pedido + timedelta(minutes=rnd.randint(20, 30))
+            comanda.itens.append(ItemSimulado(SOBREMESA, round(rnd.uniform(0.1, 0.3), 3), sobremesa))
+    for item in comanda.itens:
+        sorteio = rnd.random()
+        if sorteio < 0.02:
+            item.cancelado = True
+        elif sorteio < 0.05:
+            item.desconto = round(item.bruto * rnd.choice((0.1, 0.2, 0.5, 1.0)), 2)
+            item.motivo_desconto = rnd.randrange(len(MOTIVOS_DESCONTO))
+    if rnd.random() < 0.04:
+        comanda.desconto = round(comanda.total * rnd.choice((0.05, 0.1, 0.15)), 2)
+        comanda.motivo_desconto = rnd.randrange(len(MOTIVOS_DESCONTO))
+    return comanda
+
+
+def _simular_dia(rnd: random.Random, dia: date, comandas_por_dia: int, ultimo: bool) -> DiaSimulado:
+    media = comandas_por_dia * FATOR_SEMANA[dia.weekday()]
+    chegadas = sorted(_horario_chegada(rnd, dia) for _ in range(max(0, round(rnd.gauss(media, media * 0.15)))))
+    livre_em: Dict[int, datetime] = {}
+    comandas = []
+    for chegada in chegadas:
+        livres = [m for m in range(1, MESAS + 1) if livre_em.get(m, chegada) <= chegada]
+        if not livres:  # casa cheia: o cliente desiste
+            continue
+        comanda = _simular_comanda(rnd, rnd.choice(livres), chegada)
+        livre_em[comanda.mesa] = comanda.fechada_em
+        comandas.append(comanda)
+
+    inicio = datetime.combine(dia, hora())
+    vendido = dict.fromkeys(PRODUZIDOS, 0.0)
+    for comanda in comandas:
+        for item in comanda.itens:
+            if item.produto in vendido and not item.cancelado:
+                vendido[item.produto] += item.quantidade
+    lotes = []
+    fim_do_dia = max([c.fechada_em for c in comandas], default=inicio + timedelta(hours=22)) + timedelta(minutes=20)
+    for produto, quantidade in vendido.items():
+        if CARDAPIO[produto].por_quilo:
+            produzido = round(max(quantidade * rnd.uniform(1.02, 1.12), 1.0), 1)
+        else:
+            produzido = float(max(math.ceil(quantidade * rnd.uniform(1.02, 1.12)), 5))
+        lote = LoteSimulado(
+            produto, produzido, inicio + timedelta(hours=9, minutes=rnd.randint(0, 90)), min(quantidade, produzido)
+        )
+        if not ultimo and lote.quantidade > lote.vendido:
+            lote.perda = round(lote.quantidade - lote.vendido, 3)
+            lote.perda_em = fim_do_dia
+            lote.motivo_perda = 0 if rnd.random() < 0.05 else 2
+        lotes.append(lote)
+
+    suprimentos = []
+    if rnd.random() < 0.3:
+        suprimentos.append((inicio + timedelta(hours=11, minutes=rnd.randint(0, 30)), float(rnd.choice((50, 100, 150)))))
+    dia_simulado = DiaSimulado(
+        data=dia,
+        operador=rnd.choice(OPERADORES),
+        aberto_em=inicio + timedelta(hours=10, minutes=30),
+        fechado_em=fim_do_dia,
+        valor_inicial=200.0,
+        comandas=comandas,
+        lotes=lotes,
+        suprimentos=suprimentos,
+        sangrias=[],
+        diferenca=0.0 if rnd.random() < 0.85 else round(rnd.gauss(0, 5), 2),
+    )
+    # sangria depois do almoço e outra antes de fechar quando há muito dinheiro na gaveta
+    for quando in (inicio + timedelta(hours=15, minutes=30), fim_do_dia - timedelta(minutes=5)):
+        em_caixa = dia_simulado.valor_inicial + sum(v for _, v in suprimentos) - sum(v for _, v in dia_simulado.sangrias)
+        em_caixa += sum(c.total for c in comandas if c.forma == "dinheiro" and c.fechada_em <= quando)
+        if em_caixa > 600:
+            dia_simulado.sangrias.append((quando, float((em_caixa - 200) // 50 * 50)))
+    return dia_simulado
+
+
+def simular(inicio: date, fim: date, comandas_por_dia: int, seed: int) -> Iterator[DiaSimulado]:
+    """Dias simulados de ``inicio`` a ``fim`` (inclusive), um de cada vez."""
+    rnd = random.Random(seed)
+    dia = inicio
+    while dia <= fim:
+        yield _simular_dia(rnd, dia, comandas_por_dia, ultimo=dia == fim)
+        dia += timedelta(days=1)
+
+
+# Gravação no PDV (``SQLiteDB``) -----------------------------------------------
+class GravadorPdv:
+    """Grava os dias simulados no esquema do ``SQLiteDB``, um ``executemany`` por tabela e dia."""
+
+    def __init__(self, caminho: Path) -> None:
+        base = SQLiteDB(caminho)  # cria o esquema e o cadastro inicial
+        self._seq = base.next_id()
+        motivos_desconto = {m.descricao: m.id for m in base.motivos_desconto}
+        motivos_perda = {m.descricao: m.id for m in base.motivos_perda}
+        del base
+        self.conn = sqlite3.connect(caminho)
+        db.aplicar_perfil(self.conn, "fast")
+        self.linhas = 0
+        novos_desconto = [MotivoDesconto(self._id(), d) for d in MOTIVOS_DESCONTO if d not in motivos_desconto]
+        novos_perda = [MotivoPerda(self._id(), d) for d in MOTIVOS_PERDA if d not in motivos_perda]
+        motivos_desconto.update((m.descricao, m.id) for m in novos_desconto)
+        motivos_perda.update((m.descricao, m.id) for m in novos_perda)
+        self._motivos_desconto = [motivos_desconto[d] for d in MOTIVOS_DESCONTO]
+        self._motivos_perda = [motivos_perda[d] for d in MOTIVOS_PERDA]
+        self._gravar(
+            {
+                "produtos": [Produto(p.codigo, p.nome, p.preco, p.por_quilo) for p in CARDAPIO],
+                "motivos_desconto": novos_desconto,
+                "motivos_perda": novos_perda,
+            }
+        )
+
+    def _id(self) -> int:
+        self._seq += 1
+        return self._seq - 1
+
+    def _gravar(self, tabelas: Dict[str, list]) -> None:
+        with self.conn:
+            for tabela, entidades in tabelas.items():
+                self.conn.executemany(_sql_upsert(tabela), map(_SERIALIZADORES[tabela], entidades))
+                self.linhas += len(entidades)
+            self.conn.execute("INSERT OR REPLACE INTO metadata (chave, valor) VALUES ('seq', ?)", (self._seq,))
+
+    def gravar(self, dia: DiaSimulado) -> None:
+        tabelas: Dict[str, list] = {
+            "comandas": [],
+            "itens": [],
+            "descontos_log": [],
+            "perdas_estoque": [],
+            "caixas": [],
+            "movimentos_caixa": [],
+            "logs": [],
+        }
+        logs = tabelas["logs"]
+
+        def log(quando: datetime, acao: str, detalhes: str, usuario: str) -> None:
+            logs.append(LogEntry(id=self._id(), acao=acao, detalhes=detalhes, usuario=usuario, criado_em=quando))
+
+        caixa = Caixa(
+            id=self._id(),
+            data_hora_abertura=dia.aberto_em,
+            usuario_abertura_id=dia.operador,
+            valor_inicial_dinheiro=dia.valor_inicial,
+            status=StatusCaixa.FECHADO,
+            data_hora_fechamento=dia.fechado_em,
+            usuario_fechamento_id=dia.operador,
+            valor_esperado_dinheiro_fechamento=dia.esperado,
+            valor_contado_dinheiro_fechamento=round(dia.esperado + dia.diferenca, 2),
+            diferenca_dinheiro=dia.diferenca,
+        )
+        tabelas["caixas"].append(caixa)
+        log(dia.aberto_em, "abrir_caixa", f"Caixa {caixa.id} aberto", dia.operador)
+
+        def movimento(quando: datetime, tipo: TipoMovimento, valor: float, forma, descricao: str, impacto: float):
+            tabelas["movimentos_caixa"].append(
+                MovimentoCaixa(
+                    id=self._id(),
+                    caixa_id=caixa.id,
+                    tipo=tipo,
+                    valor=valor,
+                    forma_pagamento=forma,
+                    descricao=descricao,
+                    criado_em=quando,
+                    usuario=dia.operador,
+                    valor_dinheiro_impacto=impacto,
+                )
+            )
+
+        for quando, valor in dia.suprimentos:
+            movimento(quando, TipoMovimento.SUPRIMENTO, valor, None, "Suprimento", valor)
+            log(quando, "suprimento", f"Caixa {caixa.id} suprimento {valor}", dia.operador)
+
+        for simulada in dia.comandas:
+            comanda = Comanda(id=self._id(), mesa=simulada.mesa, status=StatusComanda.FECHADA)
+            log(simulada.aberta_em, "abrir_comanda", f"Comanda {comanda.id} na mesa {simulada.mesa}", simulada.garcom)
+            for simulado in simulada.itens:
+                produto = CARDAPIO[simulado.produto]
+                item = ItemComanda(
+                    id=self._id(),
+                    comanda_id=comanda.id,
+                    produto_codigo=produto.codigo,
+                    quantidade=simulado.quantidade,
+                    preco_unitario=produto.preco,
+                    cancelado=simulado.cancelado,
+                    desconto=simulado.desconto,
+                    criado_em=simulado.criado_em,
+                )
+                comanda.itens.append(item.id)
+                tabelas["itens"].append(item)
+                log(
+                    simulado.criado_em,
+                    "adicionar_item",
+                    f"Comanda {comanda.id} adicionou {simulado.quantidade}x {produto.nome}",
+                    simulada.garcom,
+                )
+                if simulado.cancelado:
+                    log(simulado.criado_em, "cancelar_item", f"Item {produto.nome} cancelado: Erro de lançamento", GERENTE)
+                elif simulado.desconto:
+                    tabelas["descontos_log"].append(
+                        DescontoLog(
+                            id=self._id(),
+                            comanda_id=comanda.id,
+                            item_id=item.id,
+                            motivo_id=self._motivos_desconto[simulado.motivo_desconto],
+                            usuario=GERENTE,
+                            valor=simulado.desconto,
+                            criado_em=simulado.criado_em,
+                        )
+                    )
+                    log(simulado.criado_em, "desconto_item", f"Item {produto.nome} desconto {simulado.desconto:.2f}", GERENTE)
+            if simulada.desconto:
+                comanda.desconto_total = simulada.desconto
+                tabelas["descontos_log"].append(
+                    DescontoLog(
+                        id=self._id(),
+                        comanda_id=comanda.id,
+                        item_id=None,
+                        motivo_id=self._motivos_desconto[simulada.motivo_desconto],
+                        usuario=GERENTE,
+                        valor=simulada.desconto,
+                        criado_em=simulada.fechada_em,
+                    )
+                )
+                log(simulada.fechada_em, "desconto_comanda", f"Comanda {comanda.id} desconto {simulada.desconto:.2f}", GERENTE)
+            tabelas["comandas"].append(comanda)
+            dinheiro = simulada.forma == "dinheiro"
+            movimento(
+                simulada.fechada_em,
+                TipoMovimento.VENDA,
+                simulada.total,
+                simulada.forma,
+                f"Venda comanda {comanda.id}" + (" (dinheiro, troco 0.00)" if dinheiro else ""),
+                simulada.total if dinheiro else 0.0,
+            )
+            log(simulada.fechada_em, "venda", f"Comanda {comanda.id} paga em {simulada.forma}", dia.operador)
+            log(simulada.fechada_em, "fechar_comanda", f"Comanda {comanda.id} fechada", dia.operador)
+
+        for quando, valor in dia.sangrias:
+            movimento(quando, TipoMovimento.SANGRIA, valor, None, "Sangria", -valor)
+            log(quando, "sangria", f"Caixa {caixa.id} sangria {valor}", dia.operador)
+
+        for lote in dia.lotes:
+            if not lote.perda:
+                continue
+            produto = CARDAPIO[lote.produto]
+            tabelas["perdas_estoque"].append(
+                PerdaEstoque(
+                    id=self._id(),
+                    produto_codigo=produto.codigo,
+                    quantidade=lote.perda,
+                    motivo_id=self._motivos_perda[lote.motivo_perda],
+                    usuario=COZINHA,
+                    valor_total=round(lote.perda * produto.preco, 2),
+                    criado_em=lote.perda_em,
+                )
+            )
+            log(lote.perda_em, "perda", f"Perda {lote.perda} de {produto.nome}", COZINHA)
+        log(dia.fechado_em, "fechar_caixa", f"Caixa {caixa.id} fechado", dia.operador)
+        logs.sort(key=lambda entrada: entrada.criado_em)
+        self._gravar(tabelas)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+# Gravação no núcleo (``core.db``) ----------------------------------------------
+def _texto(quando: datetime) -> str:
+    return quando.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class GravadorNucleo:
+    """Grava os dias simulados no esquema do ``core.db`` com ids explícitos."""
+
+    _TABELAS = ("comandas", "itens_comanda", "lotes_producao", "perdas_estoque", "caixas", "movimentos_caixa", "logs")
+
+    def __init__(self, caminho: Path) -> None:
+        db.init_db(caminho)
+        db.close_pool(caminho)
+        self.conn = sqlite3.connect(caminho)
+        db.aplicar_perfil(self.conn, "fast")
+        with self.conn:
+            existentes = dict(self.conn.execute("SELECT nome, id FROM produtos"))
+            self.conn.executemany(
+                "INSERT INTO produtos(nome, categoria, preco, preco_por_kg) VALUES (?, ?, ?, ?)",
+                [
+                    (p.nome, p.categoria.value, p.preco, p.preco if p.por_quilo else None)
+                    for p in CARDAPIO
+                    if p.nome not in existentes
+                ],
+            )
+            produtos = dict(self.conn.execute("SELECT nome, id FROM produtos"))
+            self._produtos = [produtos[p.nome] for p in CARDAPIO]
+            self._mesas = dict(self.conn.execute("SELECT numero, id FROM mesas"))
+        self._proximo = {
+            tabela: self.conn.execute(f"SELECT IFNULL(MAX(id), 0) + 1 FROM {tabela}").fetchone()[0]
+            for tabela in self._TABELAS
+        }
+        self.linhas = 0
+
+    def _id(self, tabela: str) -> int:
+        self._proximo[tabela] += 1
+        return self._proximo[tabela] - 1
+
+    def gravar(self, dia: DiaSimulado) -> None:
+        linhas: Dict[str, list] = {tabela: [] for tabela in self._TABELAS}
+        logs = linhas["logs"]
+        caixa_id = self._id("caixas")
+        linhas["caixas"].append(
+            (
+                caixa_id,
+                dia.operador,
+                _texto(dia.aberto_em),
+                dia.valor_inicial,
+                _texto(dia.fechado_em),
+                dia.operador,
+                round(dia.esperado + dia.diferenca, 2),
+                dia.diferenca,
+            )
+        )
+        logs.append(("ABRIR_CAIXA", dia.operador, f"Caixa {caixa_id} aberto", _texto(dia.aberto_em)))
+        for tipo, movimentos in (("SUPRIMENTO", dia.suprimentos), ("SANGRIA", dia.sangrias)):
+            for quando, valor in movimentos:
+                linhas["movimentos_caixa"].append(
+                    (self._id("movimentos_caixa"), caixa_id, tipo, valor, None, None, dia.operador, _texto(quando))
+                )
+                logs.append((tipo, dia.operador, f"{tipo} de {valor} no caixa {caixa_id}", _texto(quando)))
+
+        lotes = {}
+        for lote in dia.lotes:
+            lote_id = lotes[lote.produto] = self._id("lotes_producao")
+            produto_id = self._produtos[lote.produto]
+            # a sobra lançada como perda também baixa o lote, que fecha no dia
+            consumido = lote.quantidade if lote.perda else lote.vendido
+            kg = lote.unidade == UnidadeProducao.KG
+            linhas["lotes_producao"].append(
+                (
+                    lote_id,
+                    produto_id,
+                    lote.quantidade,
+                    lote.unidade.value,
+                    None if kg else int(lote.quantidade),
+                    0 if kg else consumido,
+                    consumido if kg else 0,
+                    _texto(lote.criado_em),
+                )
+            )
+            logs.append(
+                (
+                    "CRIAR_LOTE",
+                    COZINHA,
+                    f"Lote criado para produto {produto_id} quantidade {lote.quantidade}{lote.unidade.value}",
+                    _texto(lote.criado_em),
+                )
+            )
+            if lote.perda:
+                motivo = MOTIVOS_PERDA[lote.motivo_perda]
+                linhas["perdas_estoque"].append(
+                    (
+                        self._id("perdas_estoque"),
+                        lote_id,
+                        produto_id,
+                        lote.perda,
+                        lote.unidade.value,
+                        motivo,
+                        COZINHA,
+                        _texto(lote.perda_em),
+                    )
+                )
+                logs.append(
+                    ("PERDA", COZINHA, f"Perda registrada produto {produto_id} motivo {motivo}", _texto(lote.perda_em))
+                )
+
+        for simulada in dia.comandas:
+            comanda_id = self._id("comandas")
+            aberta, fechada = _texto(simulada.aberta_em), _texto(simulada.fechada_em)
+            motivo = MOTIVOS_DESCONTO[simulada.motivo_desconto] if simulada.desconto else None
+            linhas["comandas"].append(
+                (
+                    comanda_id,
+                    self._mesas[simulada.mesa],
+                    simulada.garcom,
+                    simulada.desconto,
+                    motivo,
+                    GERENTE if motivo else None,
+                    "FECHADA",
+                    aberta,
+                    fechada,
+                )
+            )
+            logs.append(("ABRIR_COMANDA", simulada.garcom, f"Mesa {simulada.mesa} aberta", aberta))
+            for simulado in simulada.itens:
+                if simulado.cancelado:  # o núcleo não guarda itens cancelados
+                    continue
+                produto = CARDAPIO[simulado.produto]
+                produto_id = self._produtos[simulado.produto]
+                peso = round(simulado.quantidade * 1000, 1) if produto.por_quilo else None
+                motivo_item = MOTIVOS_DESCONTO[simulado.motivo_desconto] if simulado.desconto else None
+                criado = _texto(simulado.criado_em)
+                linhas["itens_comanda"].append(
+                    (
+                        self._id("itens_comanda"),
+                        comanda_id,
+                        produto_id,
+                        1 if peso else simulado.quantidade,
+                        peso,
+                        # por quilo o preço unitário já é o do peso servido
+                        simulado.bruto if peso else produto.preco,
+                        simulado.desconto,
+                        motivo_item,
+                        GERENTE if motivo_item else None,
+                        1,
+                        criado,
+                    )
+                )
+                logs.append(
+                    (
+                        "ADICIONAR_ITEM",
+                        simulada.garcom,
+                        f"Item {produto_id} adicionado na comanda {comanda_id} peso={peso} desconto={simulado.desconto}",
+                        criado,
+                    )
+                )
+            if motivo:
+                logs.append(
+                    (
+                        "DESCONTO_COMANDA",
+                        GERENTE,
+                        f"Desconto {simulada.desconto} aplicado na comanda {comanda_id} motivo {motivo}",
+                        fechada,
+                    )
+                )
+            forma = simulada.forma.upper()
+            linhas["movimentos_caixa"].append(
+                (
+                    self._id("movimentos_caixa"),
+                    caixa_id,
+                    "VENDA",
+                    simulada.total,
+                    forma,
+                    f"comanda {comanda_id}",
+                    dia.operador,
+                    fechada,
+                )
+            )
+            logs.append(("VENDA", dia.operador, f"Venda comanda {comanda_id} {forma} {simulada.total}", fechada))
+            logs.append(("FECHAR_COMANDA", dia.operador, f"Comanda {comanda_id} fechada", fechada))
+        logs.append(("FECHAR_CAIXA", dia.operador, f"Caixa {caixa_id} fechado", _texto(dia.fechado_em)))
+        logs.sort(key=lambda linha: linha[3])
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO caixas(id, aberto_por, aberto_em, valor_inicial, fechado_em, fechado_por,"
+                " valor_fechamento, diferenca) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas["caixas"],
+            )
+            self.conn.executemany(
+                "INSERT INTO comandas(id, mesa_id, aberta_por, desconto_total, motivo_desconto, autorizador,"
+                " status, criado_em, fechado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas["comandas"],
+            )
+            self.conn.executemany(
+                "INSERT INTO itens_comanda(id, comanda_id, produto_id, quantidade, peso_gramas, preco_unitario,"
+                " desconto_valor, motivo_desconto, autorizado_por, enviado_cozinha, criado_em)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas["itens_comanda"],
+            )
+            self.conn.executemany(
+                "INSERT INTO lotes_producao(id, produto_id, quantidade, unidade, estimativa_pratos,"
+                " consumido_porcoes, consumido_kg, criado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas["lotes_producao"],
+            )
+            self.conn.executemany(
+                "INSERT INTO perdas_estoque(id, lote_id, produto_id, quantidade, unidade, motivo, registrado_por,"
+                " registrado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas["perdas_estoque"],
+            )
+            self.conn.executemany(
+                "INSERT INTO movimentos_caixa(id, caixa_id, tipo, valor, forma_pagamento, referencia,"
+                " registrado_por, registrado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas["movimentos_caixa"],
+            )
+            self.conn.executemany("INSERT INTO logs(acao, usuario, detalhes, criado_em) VALUES (?, ?, ?, ?)", logs)
+        self.linhas += sum(len(valores) for valores in linhas.values())
+
+    def close(self) -> None:
+        self.conn.execute("ANALYZE")
+        self.conn.close()
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdv", type=Path, help="arquivo SQLite do PDV (SQLiteDB)")
+    parser.add_argument("--nucleo", type=Path, help="banco do núcleo (core.db)")
+    parser.add_argument("--inicio", type=date.fromisoformat, help="primeiro dia (padrão: --dias antes do fim)")
+    parser.add_argument("--fim", type=date.fromisoformat, default=date.today() - timedelta(days=1))
+    parser.add_argument("--dias", type=int, default=90)
+    parser.add_argument("--comandas-por-dia", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    if not args.pdv and not args.nucleo:
+        parser.error("informe --pdv e/ou --nucleo")
+    inicio = args.inicio or args.fim - timedelta(days=args.dias - 1)
+    if inicio > args.fim:
+        parser.error("--inicio depois de --fim")
+
+    gravadores = []
+    if args.pdv:
+        args.pdv.parent.mkdir(parents=True, exist_ok=True)
+        gravadores.append(("PDV", args.pdv, GravadorPdv(args.pdv)))
+    if args.nucleo:
+        args.nucleo.parent.mkdir(parents=True, exist_ok=True)
+        gravadores.append(("núcleo", args.nucleo, GravadorNucleo(args.nucleo)))
+
+    comeco = time.perf_counter()
+    dias = comandas = itens = 0
+    for dia in simular(inicio, args.fim, args.comandas_por_dia, args.seed):
+        for _nome, _caminho, gravador in gravadores:
+            gravador.gravar(dia)
+        dias += 1
+        comandas += len(dia.comandas)
+        itens += sum(len(c.itens) for c in dia.comandas)
+    for _nome, _caminho, gravador in gravadores:
+        gravador.close()
+
+    print(f"{dias} dias ({inicio} a {args.fim}), {comandas} comandas, {itens} itens")
+    for nome, caminho, gravador in gravadores:
+        print(f"  {nome}: {gravador.linhas} linhas em {caminho}")
+    print(f"Tempo total: {time.perf_counter() - comeco:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""Simula o pico do jantar com vários terminais lançando pedidos ao mesmo tempo.
+
+Cada terminal (um garçom) repete uma sessão roteirizada sobre a camada de
+serviços: abre a comanda, lança os itens, às vezes aplica desconto, paga,
+fecha e, a cada ``--relatorio-a-cada`` sessões, tira um relatório. Ao final
+mostra a vazão (operações/s), os percentis de latência por operação e os
+erros de concorrência (``SQLITE_BUSY``/``database is locked``, pool esgotado).
+
+Alvos:
+
+- ``nucleo``: funções de ``comanda_service``/``production_service`` sobre o
+  ``core.db``, com terminais em threads ou em processos (``--modo``). O
+  núcleo não tem funções de caixa, então o pagamento é medido como
+  ``totalizar`` seguido de ``fechar_comanda``.
+- ``pdv``: ``PdvService``/``CaixaService`` sobre um ``SQLiteDB``. O estado do
+  PDV fica em memória num único processo, então os terminais são threads que
+  se revezam numa trava, como os eventos da interface; ``--gravador`` tira a
+  gravação do caminho crítico com o ``GravadorAssincrono``.
+
+Sem ``--banco`` a simulação roda num arquivo temporário, com o cardápio de
+``tools/gerar_historico.py`` e ``--historico-dias`` de movimento prévio.
+
+Com ``--alvo nucleo --modo threads`` cada terminal usa a conexão fixa da sua
+thread (``get_connection()``), que não conta no limite do pool
+(``RESTAURANTE_DB_POOL_SIZE``, padrão 16). As conexões emprestadas com
+``conexao()`` (ex.: a gravação em lote da auditoria) contam, e o simulador
+aumenta o limite para ``--terminais + 1`` durante a execução. Assim a
+latência medida não inclui a espera de 5 s do pool, e ``pool_esgotado`` não
+aparece por causa do número de terminais.
+
+Exemplo::
+
+    python tools/simular_carga.py --alvo nucleo --terminais 16 --modo processos --duracao 60
+    python tools/simular_carga.py --alvo pdv --terminais 8 --sessoes 50 --gravador
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from core import db  # noqa: E402
+from models.enums import CategoriaProduto, UnidadeProducao  # noqa: E402
+from services import comanda_service, logging_service, production_service  # noqa: E402
+from services.caixa_service import CaixaService  # noqa: E402
+from services.database import SQLiteDB  # noqa: E402
+from services.pdv_service import PdvService  # noqa: E402
+from services.persistencia import GravadorAssincrono  # noqa: E402
+from tools.gerar_historico import CARDAPIO, MESAS, PRODUZIDOS, GravadorNucleo, GravadorPdv, simular  # noqa: E402
+
+PERCENTIS = (50, 95, 99)
+_CATEGORIAS_PESO = (CategoriaProduto.SOBREMESA_PESO.value, CategoriaProduto.OPCIONAL_PESO.value)
+
+
+def tipo_erro(exc: BaseException) -> str:
+    """Agrupa as falhas: contenção do SQLite, pool esgotado ou o nome da exceção."""
+    if isinstance(exc, db.PoolEsgotadoError):
+        return "pool_esgotado"
+    if isinstance(exc, sqlite3.OperationalError) and ("locked" in str(exc) or "busy" in str(exc)):
+        return "SQLITE_BUSY"
+    return type(exc).__name__
+
+
+class Resultado:
+    """Latências (ms) por operação e contagem de erros de um ou mais terminais."""
+
+    def __init__(self) -> None:
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self.erros: Counter = Counter()
+        self.sessoes = 0
+        self.sessoes_com_erro = 0
+        self.segundos = 0.0  # do terminal mais lento
+
+    def medir(self, operacao: str, funcao: Callable[..., Any], *args: Any) -> Any:
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args)
+        except Exception as exc:
+            self.erros[f"{operacao}: {tipo_erro(exc)}"] += 1
+            raise
+        finally:
+            self.latencias[operacao].append((time.perf_counter() - inicio) * 1000)
+
+    def juntar(self, outro: "Resultado") -> None:
+        for operacao, tempos in outro.latencias.items():
+            self.latencias[operacao].extend(tempos)
+        self.erros.update(outro.erros)
+        self.sessoes += outro.sessoes
+        self.sessoes_com_erro += outro.sessoes_com_erro
+        self.segundos = max(self.segundos, outro.segundos)
+
+    @property
+    def operacoes(self) -> int:
+        return sum(len(tempos) for tempos in self.latencias.values())
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    return ordenados[max(0, -(-len(ordenados) * p // 100) - 1)]
+
+
+# Alvos -------------------------------------------------------------------------
+class AlvoNucleo:
+    """Sessões de garçom sobre as funções de serviço do ``core.db``."""
+
+    def __init__(self, caminho: Path) -> None:
+        db.DB_PATH = caminho
+        linhas = db.get_connection(caminho).execute("SELECT id, categoria FROM produtos WHERE ativo = 1")
+        self.produtos = [(produto, 400 if categoria in _CATEGORIAS_PESO else None) for produto, categoria in linhas]
+
+    @staticmethod
+    def preparar(caminho: Path, dias: int, seed: int) -> None:
+        gravador = GravadorNucleo(caminho)
+        for dia in simular(date.today() - timedelta(days=dias), date.today() - timedelta(days=1), 120, seed):
+            gravador.gravar(dia)
+        gravador.close()
+        db.DB_PATH = caminho
+        ids = dict(db.get_connection(caminho).execute("SELECT nome, id FROM produtos"))
+        # produção do dia com folga para o pico inteiro
+        for indice in PRODUZIDOS:
+            produto = CARDAPIO[indice]
+            unidade = UnidadeProducao.KG if produto.por_quilo else UnidadeProducao.PORCAO
+            production_service.criar_lote(ids[produto.nome], 100_000, unidade, None, "cozinha")
+        db.close_pool(caminho)
+
+    def sessao(self, rnd: random.Random, terminal: int, numero: int, res: Resultado, opcoes) -> None:
+        usuario = f"garcom{terminal}"
+        comanda = res.medir("abrir_comanda", comanda_service.abrir_comanda, terminal % MESAS + 1, usuario)
+        for _ in range(rnd.randint(1, 2 * opcoes.itens - 1)):
+            pensar(opcoes)
+            produto_id, peso = rnd.choice(self.produtos)
+            res.medir("adicionar_item", comanda_service.adicionar_item, comanda, produto_id, 1, usuario, peso)
+        if rnd.random() < opcoes.descontos:
+            desconto = (comanda, 2.0, usuario, "Cortesia", "gerente")
+            res.medir("aplicar_desconto", comanda_service.aplicar_desconto_comanda, *desconto)
+        pensar(opcoes)
+        res.medir("totalizar", comanda_service.totalizar, comanda)
+        res.medir("fechar_comanda", comanda_service.fechar_comanda, comanda, usuario)
+        if numero % opcoes.relatorio_a_cada == 0:
+            res.medir("relatorio", production_service.relatorio_resumo)
+            res.medir("ultimos_logs", logging_service.listar, 100)
+
+    def encerrar(self) -> None:
+        logging_service.flush()
+        db.close_pool(db.DB_PATH)
+
+
+class AlvoPdv:
+    """Sessões de garçom sobre ``PdvService``/``CaixaService``, um ``SQLiteDB`` compartilhado."""
+
+    def __init__(self, caminho: Path, gravador: bool = False) -> None:
+        self.db = SQLiteDB(caminho)
+        self.gravador = GravadorAssincrono(self.db) if gravador else None
+        self.trava = threading.Lock()
+        caixa = self.db.caixa_aberto() or CaixaService(self.db, usuario="caixa1").abrir_caixa(200.0)
+        self.caixa_id = caixa.id
+        self.motivo_id = self.db.motivos_desconto[0].id if self.db.motivos_desconto else 0
+        self.produtos = [(p.codigo, 0.4 if p.por_quilo else 1) for p in self.db.produtos.values()]
+
+    @staticmethod
+    def preparar(caminho: Path, dias: int, seed: int) -> None:
+        gravador = GravadorPdv(caminho)
+        for dia in simular(date.today() - timedelta(days=dias), date.today() - timedelta(days=1), 120, seed):
+            gravador.gravar(dia)
+        gravador.close()
+
+    def _medir(self, res: Resultado, operacao: str, funcao: Callable[..., Any], *args: Any) -> Any:
+        # a espera pela trava entra na latência, como a fila de eventos da interface
+        def executar():
+            with self.trava:
+                return funcao(*args)
+
+        return res.medir(operacao, executar)
+
+    def sessao(self, rnd: random.Random, terminal: int, numero: int, res: Resultado, opcoes) -> None:
+        pdv = PdvService(self.db, usuario=f"garcom{terminal}")
+        comanda = self._medir(res, "abrir_comanda", pdv.abrir_comanda, terminal % MESAS + 1)
+        itens = []
+        for _ in range(rnd.randint(1, 2 * opcoes.itens - 1)):
+            pensar(opcoes)
+            itens.append(self._medir(res, "adicionar_item", pdv.adicionar_item, comanda.id, *rnd.choice(self.produtos)))
+        if rnd.random() < opcoes.descontos:
+            item = rnd.choice(itens)
+            self._medir(res, "aplicar_desconto", pdv.aplicar_desconto_item, comanda.id, item.id, 1.0, self.motivo_id)
+        pensar(opcoes)
+        total = self._medir(res, "total_comanda", pdv.total_comanda, comanda.id)
+        forma = rnd.choice(("dinheiro", "debito", "credito", "pix"))
+        self._medir(res, "registrar_venda", pdv.registrar_venda, self.caixa_id, total, forma, comanda.id)
+        self._medir(res, "fechar_comanda", pdv.fechar_comanda, comanda.id)
+        if numero % opcoes.relatorio_a_cada == 0:
+            caixa = CaixaService(self.db, usuario=pdv.usuario)
+            self._medir(res, "relatorio_vendas", pdv.relatorio_vendas)
+            self._medir(res, "movimentos_do_dia", caixa.movimentos_do_dia, date.today())
+
+    def encerrar(self) -> None:
+        if self.gravador is not None:
+            self.gravador.close()
+        else:
+            self.db.persist()
+
+
+# Execução ----------------------------------------------------------------------
+def pensar(opcoes) -> None:
+    """Pausa do garçom entre uma ação e outra."""
+    if opcoes.pensar_ms:
+        time.sleep(opcoes.pensar_ms / 1000)
+
+
+def executar_terminal(alvo, terminal: int, opcoes, largada: Optional[threading.Barrier] = None) -> Resultado:
+    """Repete a sessão até ``--sessoes`` ou ``--duracao``; sessões com erro são abandonadas."""
+    rnd = random.Random(opcoes.seed + terminal)
+    res = Resultado()
+    if largada is not None:
+        largada.wait()
+    inicio = time.perf_counter()
+    limite = time.monotonic() + opcoes.duracao if opcoes.duracao else None
+    numero = 0
+    while (time.monotonic() < limite) if limite is not None else numero < opcoes.sessoes:
+        numero += 1
+        try:
+            alvo.sessao(rnd, terminal, numero, res, opcoes)
+        except Exception:
+            res.sessoes_com_erro += 1
+        else:
+            res.sessoes += 1
+    res.segundos = time.perf_counter() - inicio
+    return res
+
+
+def _terminal_em_processo(caminho: Path, terminal: int, opcoes) -> Resultado:
+    alvo = AlvoNucleo(caminho)
+    try:
+        return executar_terminal(alvo, terminal, opcoes)
+    finally:
+        alvo.encerrar()
+
+
+def simular_carga(caminho: Path, opcoes) -> Tuple[Resultado, float]:
+    """Roda os terminais e devolve o resultado agregado e o tempo de parede (s)."""
+    total = Resultado()
+    terminais = range(1, opcoes.terminais + 1)
+    if opcoes.modo == "processos":
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(opcoes.terminais, mp_context=contexto) as executor:
+            futuros = [executor.submit(_terminal_em_processo, caminho, t, opcoes) for t in terminais]
+            resultados = [f.result() for f in futuros]
+        for resultado in resultados:
+            total.juntar(resultado)
+        # sem o tempo de subir os processos
+        return total, total.segundos
+    else:
+        if opcoes.alvo == "nucleo":
+            pool = db.get_pool(caminho)
+            pool.max_size = max(pool.max_size, opcoes.terminais + 1)
+        alvo = AlvoNucleo(caminho) if opcoes.alvo == "nucleo" else AlvoPdv(caminho, opcoes.gravador)
+        largada = threading.Barrier(opcoes.terminais + 1)
+        with ThreadPoolExecutor(opcoes.terminais) as executor:
+            futuros = [executor.submit(executar_terminal, alvo, t, opcoes, largada) for t in terminais]
+            largada.wait()
+            inicio = time.perf_counter()
+            resultados = [f.result() for f in futuros]
+            alvo.encerrar()  # inclui a gravação pendente no tempo medido
+        decorrido = time.perf_counter() - inicio
+    for resultado in resultados:
+        total.juntar(resultado)
+    return total, decorrido
+
+
+def resumo(res: Resultado, decorrido: float) -> Dict[str, Any]:
+    operacoes = {}
+    for operacao, tempos in sorted(res.latencias.items()):
+        ordenados = sorted(tempos)
+        operacoes[operacao] = {
+            "quantidade": len(ordenados),
+            "ops_s": len(ordenados) / decorrido if decorrido else 0.0,
+            **{f"p{p}_ms": percentil(ordenados, p) for p in PERCENTIS},
+            "max_ms": ordenados[-1],
+        }
+    return {
+        "segundos": decorrido,
+        "sessoes": res.sessoes,
+        "sessoes_com_erro": res.sessoes_com_erro,
+        "operacoes": res.operacoes,
+        "ops_s": res.operacoes / decorrido if decorrido else 0.0,
+        "por_operacao": operacoes,
+        "erros": dict(res.erros),
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alvo", choices=("nucleo", "pdv"), default="nucleo")
+    parser.add_argument("--modo", choices=("threads", "processos"), default="threads")
+    parser.add_argument(
+        "--terminais",
+        type=int,
+        default=8,
+        help="terminais simultâneos; no núcleo em threads o limite do pool sobe para terminais + 1",
+    )
+    parser.add_argument("--sessoes", type=int, default=20, help="sessões por terminal")
+    parser.add_argument("--duracao", type=float, help="segundos de carga (em vez de --sessoes)")
+    parser.add_argument("--itens", type=int, default=6, help="média de itens por comanda")
+    parser.add_argument("--descontos", type=float, default=0.1, help="fração das comandas com desconto")
+    parser.add_argument("--relatorio-a-cada", type=int, default=10)
+    parser.add_argument("--pensar-ms", type=float, default=0.0)
+    parser.add_argument("--banco", type=Path, help="arquivo existente (padrão: temporário)")
+    parser.add_argument("--historico-dias", type=int, default=30)
+    parser.add_argument("--gravador", action="store_true", help="pdv: grava em segundo plano")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", type=Path, help="grava o resumo em JSON")
+    opcoes = parser.parse_args(argv)
+    if opcoes.alvo == "pdv" and opcoes.modo == "processos":
+        parser.error("o PDV mantém o estado em memória num único processo; use --modo threads")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = opcoes.banco
+        if caminho is None:
+            caminho = Path(tmp) / ("pdv.sqlite" if opcoes.alvo == "pdv" else "restaurante.db")
+            print(f"Preparando {opcoes.historico_dias} dias de histórico em {caminho}...")
+            preparar = AlvoPdv.preparar if opcoes.alvo == "pdv" else AlvoNucleo.preparar
+            preparar(caminho, opcoes.historico_dias, opcoes.seed)
+        res, decorrido = simular_carga(caminho, opcoes)
+
+    dados = resumo(res, decorrido)
+    print(
+        f"\n{opcoes.terminais} terminais ({opcoes.alvo}, {opcoes.modo}) em {decorrido:.1f}s: "
+        f"{dados['sessoes']} sessões, {dados['operacoes']} operações, {dados['ops_s']:.1f} ops/s"
+    )
+    cabecalho = "".join(f"{f'p{p} (ms)':>10}" for p in PERCENTIS)
+    print(f"\n{'Operação':<20} {'qtd':>7} {'ops/s':>8}{cabecalho}{'máx (ms)':>10}")
+    for operacao, linha in dados["por_operacao"].items():
+        percentis = "".join(f"{linha[f'p{p}_ms']:>10.2f}" for p in PERCENTIS)
+        print(f"{operacao:<20} {linha['quantidade']:>7} {linha['ops_s']:>8.1f}{percentis}{linha['max_ms']:>10.2f}")
+    if dados["erros"]:
+        print(f"\nErros ({dados['sessoes_com_erro']} sessões abandonadas):")
+        for erro, quantidade in sorted(dados["erros"].items(), key=lambda e: -e[1]):
+            print(f"  {erro}: {quantidade}")
+    else:
+        print("\nNenhum erro de concorrência.")
+    if opcoes.saida:
+        opcoes.saida.write_text(json.dumps(dados, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 1 if res.sessoes_com_erro else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
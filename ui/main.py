@@ -30,8 +30,10 @@ except ImportError:  # pragma: no cover
 from models.enums import UserRole
 from services.caixa_service import CaixaService, CaixaError
 
+from services import metricas
 from services.database import MemoryDB, SQLiteDB
 from services.pdv_service import PdvService
+from services.persistencia import GravadorAssincrono
 from services.user_service import UserService, CredenciaisInvalidas, PermissaoNegada, UserError
 
 
@@ -91,11 +93,28 @@ class MainMenu:
         if not self.current_user:
             master.destroy()
             return
+        # gravação no SQLite fora da thread da interface; fechar a janela grava o que falta
+        self.gravador = GravadorAssincrono(self.db, widget=master, ao_falhar=self._falha_gravacao)
+        master.protocol("WM_DELETE_WINDOW", self._encerrar)
+        # latência dos serviços regravada periodicamente para acompanhamento fora da tela
+        arquivo = Path(metricas.ARQUIVO) if metricas.ARQUIVO else self.db.db_path.with_name("metricas.prom")
+        self.exportador_metricas = metricas.ExportadorMetricas(arquivo)
         self.service = PdvService(self.db, usuario=self.current_user.username)
         self.caixa_service = CaixaService(self.db, usuario=self.current_user.username)
 
         self._construir_layout()
 
+    def _falha_gravacao(self, erro: BaseException) -> None:
+        messagebox.showerror("Gravação", f"Não foi possível salvar os dados: {erro}")
+
+    def _encerrar(self) -> None:
+        try:
+            self.gravador.close()
+        except Exception as exc:
+            self._falha_gravacao(exc)
+        self.exportador_metricas.close()
+        self.master.destroy()
+
     def _construir_layout(self) -> None:
         titulo = tk.Label(self.master, text="Sistema do Restaurante", font=("Arial", 16, "bold"))
         titulo.pack(pady=12)
@@ -136,6 +155,9 @@ class MainMenu:
         tk.Button(botoes_frame, text="Usuários (admin)", width=20, command=self._abrir_usuarios).grid(
             row=2, column=0, padx=6, pady=6
         )
+        tk.Button(botoes_frame, text="Diagnóstico", width=20, command=self._abrir_diagnostico).grid(
+            row=2, column=1, padx=6, pady=6
+        )
 
     def _abrir_pdv(self) -> None:
         self.service.usuario = self.current_user.username
@@ -179,6 +201,11 @@ class MainMenu:
         janela.title("Usuários")
         UsuariosWindow(janela, self.user_service, self.current_user)
 
+    def _abrir_diagnostico(self) -> None:
+        janela = tk.Toplevel(self.master)
+        janela.title("Diagnóstico")
+        DiagnosticoWindow(janela, self.exportador_metricas)
+
     def _realizar_login(self) -> User | None:
         dialogo = LoginDialog(self.master, self.user_service)
         self.master.wait_window(dialogo.janela)
@@ -453,6 +480,84 @@ class RelatoriosWindow:
         self.texto.configure(state="disabled")
 
 
+class DiagnosticoWindow:
+    """Latência das operações dos serviços, atualizada a cada poucos segundos."""
+
+    INTERVALO_MS = 2000
+    COLUNAS = (
+        ("operacao", "Operação", 260),
+        ("quantidade", "Chamadas", 80),
+        ("erros", "Erros", 60),
+        ("p50", "p50 (ms)", 80),
+        ("p95", "p95 (ms)", 80),
+        ("p99", "p99 (ms)", 80),
+        ("max", "Máx (ms)", 80),
+    )
+
+    def __init__(self, master: tk.Toplevel, exportador: metricas.ExportadorMetricas):
+        self.master = master
+        self.exportador = exportador
+        self._agendado: str | None = None
+
+        self._construir_layout()
+        self.master.bind("<Destroy>", self._ao_fechar)
+        self._atualizar()
+
+    def _construir_layout(self) -> None:
+        self.tabela = ttk.Treeview(self.master, columns=[c[0] for c in self.COLUNAS], show="headings", height=20)
+        for coluna, titulo, largura in self.COLUNAS:
+            self.tabela.heading(coluna, text=titulo)
+            self.tabela.column(coluna, width=largura, anchor="w" if coluna == "operacao" else "e")
+        self.tabela.pack(fill="both", expand=True, padx=12, pady=(12, 6))
+
+        botoes = tk.Frame(self.master)
+        botoes.pack(fill="x", padx=12, pady=(0, 6))
+        tk.Button(botoes, text="Zerar", command=self._zerar).pack(side="left")
+        tk.Button(botoes, text="Exportar agora", command=self._exportar).pack(side="left", padx=6)
+
+        self.status = tk.Label(self.master, anchor="w")
+        self.status.pack(fill="x", padx=12, pady=(0, 10))
+
+    def _popular(self) -> None:
+        self.tabela.delete(*self.tabela.get_children())
+        resumo = metricas.registro.resumo()
+        # as mais lentas primeiro: é ali que aparece a operação que degradou
+        for nome, dados in sorted(resumo.items(), key=lambda item: -item[1]["p95_ms"]):
+            self.tabela.insert(
+                "",
+                tk.END,
+                values=(
+                    nome,
+                    dados["quantidade"],
+                    dados["erros"],
+                    f"{dados['p50_ms']:.2f}",
+                    f"{dados['p95_ms']:.2f}",
+                    f"{dados['p99_ms']:.2f}",
+                    f"{dados['max_ms']:.2f}",
+                ),
+            )
+        self.status.configure(
+            text=f"{len(resumo)} operações | atualizado às {datetime.now():%H:%M:%S} | arquivo {self.exportador.caminho}"
+        )
+
+    def _atualizar(self) -> None:
+        self._popular()
+        self._agendado = self.master.after(self.INTERVALO_MS, self._atualizar)
+
+    def _ao_fechar(self, evento: tk.Event) -> None:
+        if evento.widget is self.master and self._agendado is not None:
+            self.master.after_cancel(self._agendado)
+            self._agendado = None
+
+    def _zerar(self) -> None:
+        metricas.registro.limpar()
+        self._popular()
+
+    def _exportar(self) -> None:
+        self.exportador.exportar()
+        messagebox.showinfo("Diagnóstico", f"Métricas gravadas em {self.exportador.caminho}")
+
+
 class CaixaControleWindow:
     """Interface simples para controlar abertura, movimentações e fechamento do caixa."""
 
@@ -21,12 +21,21 @@ try:  # execução como script direto
     from services.caixa_service import CaixaError, CaixaService
     from services.database import MemoryDB, SQLiteDB
     from services.pdv_service import PdvService
+    from services.persistencia import GravadorAssincrono
+    from ui.viewmodel import Agendador, ListaIncremental
 except ImportError:  # fallback caso o Python ignore o sys.path anterior
     sys.path.insert(0, str(ROOT_DIR))
     from models import Comanda, ItemComanda, Produto
     from services.caixa_service import CaixaError, CaixaService
     from services.database import MemoryDB, SQLiteDB
     from services.pdv_service import PdvService
+    from services.persistencia import GravadorAssincrono
+    from ui.viewmodel import Agendador, ListaIncremental
+
+# sugestões exibidas por tecla; mais que isso não cabe na lista e só custa tempo
+LIMITE_SUGESTOES = 50
+# espera após a última tecla antes de buscar
+ATRASO_BUSCA_MS = 120
 
 
 class PdvApp:
@@ -38,7 +47,13 @@ class PdvApp:
         caixa_service: Optional[CaixaService] = None,
     ):
         self.master = master
-        self.db = db or SQLiteDB()
+        self.gravador: Optional[GravadorAssincrono] = None
+        if db is None:
+            db = SQLiteDB()
+            # banco próprio: grava em segundo plano e garante a gravação ao fechar
+            self.gravador = GravadorAssincrono(db, widget=master, ao_falhar=self._falha_gravacao)
+            master.protocol("WM_DELETE_WINDOW", self._encerrar)
+        self.db = db
         if not self.db.produtos:
             self.db.carregar_dados_demo()
         self.service = service or PdvService(self.db)
@@ -48,6 +63,7 @@ class PdvApp:
         self.mapa_itens_visiveis: List[int] = []
 
         self.master.title("PDV - Restaurante")
+        self._agendador = Agendador(self.master)
         self._construir_layout()
         self._bind_atalhos()
         self._garantir_comanda_atual(criar=False)
@@ -55,12 +71,23 @@ class PdvApp:
         self._atualizar_lista_itens()
         self._atualizar_sugestoes()
 
+    def _falha_gravacao(self, erro: BaseException) -> None:
+        messagebox.showerror("Gravação", f"Não foi possível salvar os dados: {erro}")
+
+    def _encerrar(self) -> None:
+        try:
+            self.gravador.close()
+        except Exception as exc:
+            self._falha_gravacao(exc)
+        self.master.destroy()
+
     # --- Layout ---
     def _construir_layout(self) -> None:
         painel_mesas = tk.Frame(self.master)
         painel_mesas.grid(row=0, column=0, rowspan=2, sticky="nsw", padx=8, pady=8)
         tk.Label(painel_mesas, text="Mesas/Balcão", font=("Arial", 11, "bold")).pack(anchor="w")
         self.lista_mesas = tk.Listbox(painel_mesas, height=22, exportselection=False)
+        self._mesas_vm = ListaIncremental(self.lista_mesas)
         self.lista_mesas.pack(fill="y", expand=True)
         self.lista_mesas.bind("<<ListboxSelect>>", lambda _e: self._trocar_mesa())
 
@@ -74,18 +101,20 @@ class PdvApp:
         tk.Label(barra_busca, text="Buscar (código ou descrição)").grid(row=0, column=0, sticky="w")
         self.busca_entry = tk.Entry(barra_busca)
         self.busca_entry.grid(row=1, column=0, sticky="ew", padx=(0, 8))
-        self.busca_entry.bind("<KeyRelease>", self._atualizar_sugestoes)
+        self.busca_entry.bind("<KeyRelease>", self._buscar_ao_digitar)
         self.busca_entry.bind("<Return>", lambda _e: self._adicionar_produto())
         barra_busca.grid_columnconfigure(0, weight=1)
         self.busca_entry.focus_set()
 
         self.sugestoes_box = tk.Listbox(barra_busca, height=5, exportselection=False)
+        self._sugestoes_vm = ListaIncremental(self.sugestoes_box)
         self.sugestoes_box.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(4, 0))
         self.sugestoes_box.bind("<Return>", lambda _e: self._confirmar_sugestao())
         self.sugestoes_box.bind("<Double-Button-1>", lambda _e: self._confirmar_sugestao())
 
         tk.Label(painel_itens, text="Itens da comanda", font=("Arial", 11, "bold")).pack(anchor="w", pady=(8, 0))
         self.lista_itens = tk.Listbox(painel_itens, height=12, exportselection=False)
+        self._itens_vm = ListaIncremental(self.lista_itens)
         self.lista_itens.pack(fill="both", expand=True, pady=(4, 0))
 
         self.total_label = tk.Label(painel_itens, text="Total: R$ 0,00", font=("Arial", 12, "bold"))
@@ -112,6 +141,7 @@ class PdvApp:
 
         tk.Label(painel_acoes, text="Logs", font=("Arial", 11, "bold")).pack(anchor="w", pady=(8, 0))
         self.log_box = tk.Listbox(painel_acoes, height=12)
+        self._logs_vm = ListaIncremental(self.log_box)
         self.log_box.pack(fill="both", expand=True)
 
     def _bind_atalhos(self) -> None:
@@ -173,6 +203,7 @@ class PdvApp:
         return None
 
     def _mover_sugestao(self, delta: int) -> bool:
+        self._agendador.executar_pendentes("sugestoes")
         if not self.sugestoes_box.size():
             return False
         sel = self.sugestoes_box.curselection()
@@ -184,6 +215,7 @@ class PdvApp:
         return True
 
     def _produto_selecionado(self) -> Optional[Produto]:
+        self._agendador.executar_pendentes("sugestoes")
         sel = self.sugestoes_box.curselection()
         if sel:
             codigo = self.sugestoes_box.get(sel[0]).split(" - ")[0]
@@ -222,26 +254,33 @@ class PdvApp:
         self.busca_entry.delete(0, tk.END)
         self.busca_entry.focus_set()
 
+    def _buscar_ao_digitar(self, event=None) -> None:
+        # setas e Enter não mudam o texto; não há o que buscar de novo
+        if event is not None and event.keysym in {"Up", "Down", "Return", "Escape"}:
+            return
+        self._agendador.adiar("sugestoes", self._atualizar_sugestoes, ATRASO_BUSCA_MS)
+
     def _atualizar_sugestoes(self, _event=None) -> None:
-        termo = self.busca_entry.get().lower().strip()
-        sugestoes = [p for p in self.db.produtos.values() if termo in p.codigo.lower() or termo in p.descricao.lower()]
-        sugestoes.sort(key=lambda p: p.codigo)
-        self.sugestoes_box.delete(0, tk.END)
+        sugestoes = self.db.buscar_produtos(self.busca_entry.get(), limite=LIMITE_SUGESTOES)
+        textos = []
         for prod in sugestoes:
             texto = f"{prod.codigo} - {prod.descricao} (R$ {prod.preco:.2f})"
             if prod.por_quilo:
                 texto += " - kg"
-            self.sugestoes_box.insert(tk.END, texto)
+            textos.append(texto)
+        self._sugestoes_vm.atualizar(textos)
+        self.sugestoes_box.selection_clear(0, tk.END)
         if sugestoes:
             self.sugestoes_box.selection_set(0)
 
     # --- Itens / descontos ---
     def _item_selecionado(self) -> Optional[ItemComanda]:
+        self._agendador.executar_pendentes("itens")
         sel = self.lista_itens.curselection()
         if not sel:
             return None
         item_id = self.mapa_itens_visiveis[sel[0]]
-        return next((i for i in self.db.itens if i.id == item_id), None)
+        return self.db.item_por_id(item_id)
 
     def _desconto_item(self) -> None:
         item = self._item_selecionado()
@@ -403,7 +442,7 @@ class PdvApp:
         if not comanda:
             messagebox.showwarning("Comanda", "Selecione uma comanda aberta para fechar.")
             return
-        total = comanda.total_liquido(self.db.itens)
+        total = comanda.total_liquido(self.db.itens_da_comanda(comanda.id))
         opcoes = {
             "1": "dinheiro",
             "2": "debito",
@@ -490,17 +529,30 @@ class PdvApp:
             return None
         return motivo_id
 
+    # --- Atualização da tela ---
+    # Os ``_atualizar_*`` só agendam: vários pedidos na mesma ação viram uma
+    # única redesenhada no próximo ciclo ocioso, que aplica apenas as linhas
+    # alteradas (``ListaIncremental``).
     def _atualizar_lista_itens(self) -> None:
+        self._agendador.agendar("itens", self._desenhar_lista_itens)
+        self._atualizar_logs()
+
+    def _atualizar_status_mesas(self) -> None:
+        self._agendador.agendar("mesas", self._desenhar_status_mesas)
+
+    def _atualizar_logs(self) -> None:
+        self._agendador.agendar("logs", self._desenhar_logs)
+
+    def _desenhar_lista_itens(self) -> None:
         comanda = self._garantir_comanda_atual(criar=False)
-        self.lista_itens.delete(0, tk.END)
-        self.mapa_itens_visiveis = []
+        textos: List[str] = []
+        mapa: List[int] = []
         if not comanda:
+            self._itens_vm.atualizar(textos)
+            self.mapa_itens_visiveis = mapa
             self.total_label.config(text="Total: R$ 0.00")
-            self._atualizar_logs()
             return
-        for item in self.db.itens:
-            if item.comanda_id != comanda.id:
-                continue
+        for item in self.db.itens_da_comanda(comanda.id):
             produto = self.db.produtos.get(item.produto_codigo)
             nome = f"{item.produto_codigo} - {produto.descricao}" if produto else item.produto_codigo
             texto = (
@@ -511,19 +563,18 @@ class PdvApp:
                 texto += f" (desc R$ {item.desconto:.2f})"
             if item.cancelado:
                 texto += " [CANCELADO]"
-            self.lista_itens.insert(tk.END, texto)
-            self.mapa_itens_visiveis.append(item.id)
-        total = comanda.total_liquido(self.db.itens)
+            textos.append(texto)
+            mapa.append(item.id)
+        self._itens_vm.atualizar(textos)
+        self.mapa_itens_visiveis = mapa
+        total = comanda.total_liquido(self.db.itens_da_comanda(comanda.id))
         self.total_label.config(text=f"Total: R$ {total:.2f}")
-        self._atualizar_logs()
-
-    def _atualizar_status_mesas(self) -> None:
-        self.lista_mesas.delete(0, tk.END)
 
+    def _desenhar_status_mesas(self) -> None:
         linhas: list[tuple[str, str]] = []
         if hasattr(self, "balcao_comanda_id") and self.balcao_comanda_id in self.db.comandas:
             comanda = self.db.comandas[self.balcao_comanda_id]
-            total = comanda.total_liquido(self.db.itens)
+            total = comanda.total_liquido(self.db.itens_da_comanda(comanda.id))
             linhas.append((f"Balcão | {comanda.status.value} | R$ {total:.2f}", comanda.status.value))
         else:
             linhas.append(("Balcão | livre", "livre"))
@@ -531,21 +582,17 @@ class PdvApp:
         for mesa in self.db.mesas:
             if mesa.comanda_id:
                 comanda = self.db.comandas[mesa.comanda_id]
-                total = comanda.total_liquido(self.db.itens)
+                total = comanda.total_liquido(self.db.itens_da_comanda(comanda.id))
                 linhas.append((f"Mesa {mesa.numero:02d} | {comanda.status.value} | R$ {total:.2f}", comanda.status.value))
             else:
                 linhas.append((f"Mesa {mesa.numero:02d} | livre", "livre"))
 
-        for idx, (texto, status) in enumerate(linhas):
-            self.lista_mesas.insert(tk.END, texto)
-            bg, fg = self._cores_status(status)
-            try:
-                self.lista_mesas.itemconfigure(idx, background=bg, foreground=fg)
-            except tk.TclError:
-                # itemconfigure may not be supported on some Tk variants; ignore coloring silently
-                pass
+        self._mesas_vm.atualizar(
+            [texto for texto, _status in linhas], [self._cores_status(status) for _texto, status in linhas]
+        )
 
         idx = self.mesa_selecionada or 0
+        self.lista_mesas.selection_clear(0, tk.END)
         self.lista_mesas.selection_set(idx)
         self.lista_mesas.see(idx)
 
@@ -557,10 +604,8 @@ class PdvApp:
         }
         return cores.get(status.lower(), ("#ffffff", "#000000"))
 
-    def _atualizar_logs(self) -> None:
-        self.log_box.delete(0, tk.END)
-        for log in self.db.logs[-50:]:
-            self.log_box.insert(tk.END, f"{log.criado_em:%H:%M} {log.acao}: {log.detalhes}")
+    def _desenhar_logs(self) -> None:
+        self._logs_vm.atualizar([f"{log.criado_em:%H:%M} {log.acao}: {log.detalhes}" for log in self.db.logs[-50:]])
 
 
 def carregar_produtos() -> Dict[str, Produto]:
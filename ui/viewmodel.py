@@ -0,0 +1,112 @@
+"""Atualização incremental das listas do PDV.
+
+``ListaIncremental`` guarda as linhas exibidas em um ``tk.Listbox`` e, a cada
+atualização, aplica só a diferença (linhas inseridas, removidas ou trocadas)
+em vez de apagar e reinserir tudo. ``Agendador`` junta vários pedidos de
+atualização em uma única execução no próximo ciclo ocioso do Tk e atrasa
+(debounce) as buscas disparadas a cada tecla.
+
+Não depende de ``tkinter`` diretamente: qualquer objeto com a mesma API de
+``Listbox`` (``insert``/``delete``/``itemconfigure``) ou de widget
+(``after``/``after_idle``/``after_cancel``) serve, o que facilita os testes.
+"""
+from __future__ import annotations
+
+from difflib import SequenceMatcher
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# (texto, (fundo, frente)) ou só o texto
+Linha = Tuple[str, Optional[Tuple[str, str]]]
+
+
+class ListaIncremental:
+    """Espelho das linhas de um ``Listbox`` que aplica apenas o que mudou."""
+
+    def __init__(self, listbox: Any) -> None:
+        self.listbox = listbox
+        self.linhas: List[Linha] = []
+
+    def atualizar(self, textos: Sequence[str], cores: Optional[Sequence[Tuple[str, str]]] = None) -> int:
+        """Sincroniza o ``Listbox`` com ``textos``; devolve quantas linhas foram tocadas."""
+        novas: List[Linha] = list(zip(textos, cores)) if cores is not None else [(t, None) for t in textos]
+        antigas = self.linhas
+        if novas == antigas:
+            return 0
+        tocadas = 0
+        colorir: List[Tuple[int, Tuple[str, str]]] = []
+        operacoes = SequenceMatcher(None, antigas, novas, autojunk=False).get_opcodes()
+        # de trás para frente, os índices das operações anteriores continuam válidos
+        for tag, i1, i2, j1, j2 in reversed(operacoes):
+            if tag == "equal":
+                continue
+            if i2 > i1:
+                self.listbox.delete(i1, i2 - 1)
+            if j2 > j1:
+                self.listbox.insert(i1, *(texto for texto, _cor in novas[j1:j2]))
+                colorir.extend((j, novas[j][1]) for j in range(j1, j2) if novas[j][1] is not None)
+            tocadas += max(i2 - i1, j2 - j1)
+        for indice, (fundo, frente) in colorir:
+            try:
+                self.listbox.itemconfigure(indice, background=fundo, foreground=frente)
+            except Exception:  # tk.TclError: algumas variantes do Tk não colorem itens
+                pass
+        self.linhas = novas
+        return tocadas
+
+
+class Agendador:
+    """Agrupa atualizações da tela por ciclo ocioso e aplica debounce."""
+
+    def __init__(self, widget: Any) -> None:
+        self.widget = widget
+        self._pendentes: Dict[str, Callable[[], None]] = {}
+        self._ocioso: Optional[str] = None
+        self._atrasados: Dict[str, Tuple[str, Callable[[], None]]] = {}
+
+    def agendar(self, chave: str, funcao: Callable[[], None]) -> None:
+        """Executa ``funcao`` uma vez no próximo ciclo ocioso, mesmo se pedida várias vezes."""
+        self._pendentes[chave] = funcao
+        if self._ocioso is None:
+            self._ocioso = self.widget.after_idle(self._executar_ociosos)
+
+    def adiar(self, chave: str, funcao: Callable[[], None], atraso_ms: int) -> None:
+        """Executa ``funcao`` só depois de ``atraso_ms`` sem novos pedidos da mesma ``chave``."""
+        anterior = self._atrasados.pop(chave, None)
+        if anterior is not None:
+            self.widget.after_cancel(anterior[0])
+        identificador = self.widget.after(atraso_ms, lambda: self._executar_atrasado(chave))
+        self._atrasados[chave] = (identificador, funcao)
+
+    def executar_pendentes(self, *chaves: str) -> None:
+        """Roda já o que está agendado (todas as chaves ou só as informadas).
+
+        Usado antes de ler o estado da tela (ex.: item selecionado), para não
+        agir sobre linhas desatualizadas.
+        """
+        for chave in chaves or list(self._atrasados):
+            atrasado = self._atrasados.get(chave)
+            if atrasado is not None:
+                self.widget.after_cancel(atrasado[0])
+                self._executar_atrasado(chave)
+        if chaves:
+            for chave in chaves:
+                funcao = self._pendentes.pop(chave, None)
+                if funcao is not None:
+                    funcao()
+        else:
+            self._executar_ociosos()
+
+    def _executar_atrasado(self, chave: str) -> None:
+        _identificador, funcao = self._atrasados.pop(chave)
+        funcao()
+
+    def _executar_ociosos(self) -> None:
+        if self._ocioso is not None:
+            self.widget.after_cancel(self._ocioso)
+            self._ocioso = None
+        pendentes, self._pendentes = self._pendentes, {}
+        for funcao in pendentes.values():
+            funcao()
+
+
+__all__ = ["Agendador", "ListaIncremental"]